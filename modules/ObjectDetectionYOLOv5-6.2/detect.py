@@ -1,27 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import gc
 import os
 from os.path import exists
 import sys
 import time
 from threading import Lock
 
+import numpy as np
 import torch
 from yolov5.models.common import DetectMultiBackend, AutoShape
-from PIL import UnidentifiedImageError
+from PIL import ImageOps, UnidentifiedImageError
 
 from codeproject_ai_sdk import LogMethod
 
+import model_export
+from model_export import load_onnx_detector, load_openvino_detector, load_torchscript_detector, \
+                         load_mmap_detector, int8_model_path, load_int8_report
+from replica_pool import ReplicaPool
+from tiling import make_tiles, merge_detections
 
-# Setup a global bucket of YOLO detectors. One for each model
+
+# Setup a global bucket of YOLO detectors. One pool of replicas for each model
 detectors   = {}  # We'll use this to cache the detectors based on models
+detector_backends = {}  # model name => the backend ("pytorch", "onnx", "onnx-int8", "openvino", "torchscript") its detector uses
+int8_reports      = {}  # model name => accuracy drift of its INT8 version vs FP32, from quantize.py
+unloaded_models   = {}  # model name => when it was unloaded for being idle
 ODYOLO_models_lock = Lock()
 
+# The size images are scaled to for inference. Exported models are fixed to it
+inference_size = 640
+
+# Runs the tiles of tiled detections in parallel. Threads are only created as
+# needed, and how many a detection uses is limited by its model's replicas
+tile_executor  = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="Tiles")
+
 def get_detector(module_runner, models_dir: str, model_name: str, resolution: int,
                  use_Cuda: bool, accel_device_name: int, use_MPS: bool,
-                 use_DirectML: bool, half_precision: str) -> any:
+                 use_DirectML: bool, half_precision: str, backend: str = "pytorch",
+                 performance_hint: str = "throughput", use_INT8: bool = False,
+                 replicas: int = 0) -> ReplicaPool:
 
     """
     We have a detector for each custom model. Lookup the detector, or if it's 
-    not found, create a new one and add it to our lookup.
+    not found, create a new one and add it to our lookup. The detector is a
+    ReplicaPool: replicas is the number of independent instances of the model
+    that can run at once, or 0 for a single instance shared by all requests.
     """
 
     detector = detectors.get(model_name, None)
@@ -86,17 +110,35 @@ def get_detector(module_runner, models_dir: str, model_name: str, resolution: in
                         # DetectionModel directly easily so we are leveraging the 
                         # DetectMultiBackend class. The magic sauce is to wrap that
                         # in AutoShape as that does the pre and post processing. 
-                        detector = DetectMultiBackend(model_path, device=device, fp16=half)
-                        detector = AutoShape(detector)
 
-                        detectors[model_name] = detector
+                        # OpenVINO runs parallel requests on one compiled model itself
+                        shared      = replicas <= 0 or backend == "openvino"
+                        concurrency = module_runner.parallelism if shared else replicas
+                        if not shared and device_type == "cpu":
+                            # PyTorch has one thread pool per process, so split it here
+                            torch.set_num_threads(max(1, (os.cpu_count() or 1) // replicas))
+
+                        first, backend = _create_detector(module_runner, model_name, model_path,
+                                                          device, device_type, use_DirectML, half,
+                                                          backend, performance_hint, use_INT8,
+                                                          concurrency)
+                        # Further replicas use whichever backend the first one ended up with
+                        create   = lambda: _create_detector(module_runner, model_name, model_path,
+                                                            device, device_type, use_DirectML, half,
+                                                            backend, performance_hint, use_INT8,
+                                                            concurrency)[0]
+                        detector = ReplicaPool(create, first, replicas, shared)
+
+                        detectors[model_name]         = detector
+                        detector_backends[model_name] = backend
+                        unloaded_models.pop(model_name, None)
 
                         module_runner.log(LogMethod.Server,
                         { 
                             "filename": __file__,
                             "method": sys._getframe().f_code.co_name,
                             "loglevel": "debug",
-                            "message": f"Model Path is {model_path}"
+                            "message": f"Model Path is {model_path}, using the {backend} backend"
                         })
 
                     except Exception as ex:
@@ -108,9 +150,172 @@ def get_detector(module_runner, models_dir: str, model_name: str, resolution: in
 
     return detector
 
+def _create_detector(module_runner, model_name: str, model_path: str, device: any,
+                     device_type: str, use_DirectML: bool, half: bool, backend: str,
+                     performance_hint: str, use_INT8: bool,
+                     concurrency: int) -> "tuple[AutoShape, str]":
+    """
+    Creates one instance of a detector for the given model. Returns a tuple of
+    (detector, the backend actually used). concurrency is the number of
+    inferences expected to be running at once, which sets each one's share of
+    the CPU threads.
+    """
+    detector = None
+
+    if backend in [ "onnx", "onnx-int8" ]:
+        detector = load_onnx_detector(module_runner, model_path, inference_size,
+                                      use_INT8, concurrency)
+        if detector is not None and use_INT8 and \
+           exists(int8_model_path(model_path, inference_size)):
+            backend = "onnx-int8"
+            int8_reports[model_name] = load_int8_report(model_path, inference_size)
+    elif backend == "openvino":
+        detector = load_openvino_detector(module_runner, model_path, inference_size,
+                                          performance_hint)
+    elif backend == "torchscript" and device_type in [ "cpu", "cuda" ] and not use_DirectML:
+        detector = load_torchscript_detector(module_runner, model_path, inference_size,
+                                             device, half)
+
+    if detector is None:    # PyTorch, or the export failed
+        backend  = "pytorch"
+        if model_export.mmap_weights and not use_DirectML:
+            detector = load_mmap_detector(module_runner, model_path, inference_size, device, half)
+
+    if detector is None:
+        detector = DetectMultiBackend(model_path, device=device, fp16=half)
+        detector = AutoShape(detector)
+
+    return detector, backend
+
+def unload_idle_detectors(module_runner, idle_secs: float, keep: "list[str]" = []) -> "list[str]":
+    """
+    Unloads the detectors of models that haven't been used for idle_secs,
+    other than those in keep, and returns their names. A model that's been
+    unloaded is simply loaded again on its next request.
+    """
+    with ODYOLO_models_lock:
+        idle = [ name for name, detector in detectors.items()
+                 if name not in keep and detector.idle_secs >= idle_secs ]
+        for name in idle:
+            del detectors[name]
+            unloaded_models[name] = time.time()
+
+    if idle:
+        release_memory()
+        module_runner.log(LogMethod.Info | LogMethod.Server,
+        {
+            "filename": __file__,
+            "method": sys._getframe().f_code.co_name,
+            "loglevel": "information",
+            "message": f"Unloaded idle models: {', '.join(idle)}"
+        })
+
+    return idle
+
+def release_memory() -> None:
+    """
+    Returns the memory of unloaded models to the system rather than leaving it
+    cached by Python, PyTorch and the C runtime for our own reuse
+    """
+    gc.collect()
+
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    if hasattr(torch, "mps") and hasattr(torch.mps, "empty_cache") and \
+       torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+
+    # glibc holds on to freed memory for reuse. Ask it to give it back
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except Exception:
+            pass
+
+def filtered_detector(replica: AutoShape, threshold: float, classes: "list[str]" = None,
+                      max_detections: int = 0) -> AutoShape:
+    """
+    Returns the replica set up so its NMS only keeps detections of the given
+    class names, at or above threshold, and at most max_detections of them.
+    Filtering in NMS saves both NMS work and building predictions that would
+    only be thrown away. The replica may be in use by other requests, so the
+    settings go on a shallow copy, which shares the model itself.
+    """
+    if classes is None and not max_detections and threshold <= replica.conf:
+        return replica
+
+    detector      = copy.copy(replica)
+    detector.conf = max(replica.conf, threshold)  # Never below the model's own cutoff
+
+    if classes is not None:
+        names  = replica.names.items() if isinstance(replica.names, dict) else enumerate(replica.names)
+        wanted = [ name.strip().lower() for name in classes ]
+        detector.classes = [ index for index, name in names if name.lower() in wanted ]
+    if max_detections:
+        detector.max_det = max_detections
+
+    return detector
+
+def detect_tiled(detector: ReplicaPool, img: any, threshold: float, batched: bool,
+                 overlap: float = 0.2, merge: str = "nms", classes: "list[str]" = None,
+                 max_detections: int = 0) -> "tuple[list, list]":
+    """
+    Detects objects in a (large) image by running the model over overlapping
+    tiles of it at the model's resolution, plus the whole image for objects
+    too big for a tile, so small objects aren't lost when the image is scaled
+    down. The tiles are split among the detector's replicas and run in
+    parallel. If batched, each replica runs its tiles as a single batch.
+    Returns a tuple of ([ x_min, y_min, x_max, y_max, confidence, class ]
+    for each object, class names).
+    """
+    image  = np.asarray(ImageOps.exif_transpose(img).convert("RGB"))
+    height, width = image.shape[:2]
+
+    crops  = [ (0, 0, image) ]
+    tiles  = make_tiles(width, height, inference_size, overlap)
+    if len(tiles) > 1:
+        crops += [ (x, y, image[y:y + h, x:x + w]) for x, y, w, h in tiles ]
+
+    def detect_crops(group: list) -> "tuple[list, list]":
+        with detector.checkout() as replica:
+            names   = replica.names
+            replica = filtered_detector(replica, threshold, classes, max_detections)
+            if batched:
+                results = replica([ crop for _, _, crop in group ], size=inference_size).xyxy
+            else:
+                results = [ replica(crop, size=inference_size).xyxy[0] for _, _, crop in group ]
+
+        # Each detection, followed by the bounds of the crop it was found in
+        found = []
+        for (x, y, crop), boxes in zip(group, results):
+            bounds = [ x, y, x + crop.shape[1], y + crop.shape[0] ]
+            found += [ [ x_min + x, y_min + y, x_max + x, y_max + y, conf, cls ] + bounds
+                       for x_min, y_min, x_max, y_max, conf, cls in boxes.tolist() if conf >= threshold ]
+        return found, names
+
+    # Deal the crops out to the replicas. This thread does the first group
+    workers = min(len(crops), detector.size)
+    groups  = [ crops[i::workers] for i in range(workers) ]
+    futures = [ tile_executor.submit(detect_crops, group) for group in groups[1:] ]
+
+    found, names = detect_crops(groups[0])
+    for future in futures:
+        found += future.result()[0]
+
+    found  = np.array(found, dtype=np.float64).reshape(-1, 10)
+    merged = merge_detections(found[:, :6], merge, crops=found[:, 6:], image_size=(width, height))
+    if max_detections:
+        merged = merged[:max_detections]
+    return merged.tolist(), names
+
 def do_detection(module_runner, models_dir: str, model_name: str, resolution: int,
                  use_Cuda: bool, accel_device_name: int, use_MPS: bool,
-                 use_DirectML: bool, half_precision: str, img: any, threshold: float):
+                 use_DirectML: bool, half_precision: str, img: any, threshold: float,
+                 backend: str = "pytorch", performance_hint: str = "throughput",
+                 use_INT8: bool = False, replicas: int = 0, tiled: bool = False,
+                 tile_overlap: float = 0.2, tile_merge: str = "nms", classes: "list[str]" = None,
+                 max_detections: int = 0):
     
     # We have a detector for each custom model. Lookup the detector, or if it's
     # not found, create a new one and add it to our lookup.
@@ -123,7 +328,8 @@ def do_detection(module_runner, models_dir: str, model_name: str, resolution: in
     try:
         detector = get_detector(module_runner, models_dir, model_name,
                                 resolution, use_Cuda, accel_device_name, use_MPS,
-                                use_DirectML, half_precision)
+                                use_DirectML, half_precision, backend, performance_hint,
+                                use_INT8, replicas)
     except Exception as ex:
         create_err_msg = f"{create_err_msg} ({str(ex)})"
 
@@ -137,20 +343,30 @@ def do_detection(module_runner, models_dir: str, model_name: str, resolution: in
         #  YoloV5?6 is 1280
 
         start_inference_time = time.perf_counter()
-        det                  = detector(img, size=640)
-        inferenceMs          = int((time.perf_counter() - start_inference_time) * 1000)
+        if tiled:
+            # PyTorch models take batches of any size. Exported models are fixed to 1
+            batched = detector_backends.get(model_name) == "pytorch"
+            found, names = detect_tiled(detector, img, threshold, batched, tile_overlap, tile_merge,
+                                        classes, max_detections)
+            found.reverse()
+        else:
+            with detector.checkout() as replica:
+                names = replica.names
+                det   = filtered_detector(replica, threshold, classes,
+                                          max_detections)(img, size=inference_size)
+            found = reversed(det.xyxy[0].tolist())
+        inferenceMs = int((time.perf_counter() - start_inference_time) * 1000)
 
         outputs = []
 
-        for *xyxy, conf, cls in reversed(det.xyxy[0]):
-            score = conf.item()
+        for *xyxy, score, cls in found:
             if score >= threshold:
-                x_min = xyxy[0].item()
-                y_min = xyxy[1].item()
-                x_max = xyxy[2].item()
-                y_max = xyxy[3].item()
+                x_min = xyxy[0]
+                y_min = xyxy[1]
+                x_max = xyxy[2]
+                y_max = xyxy[3]
 
-                label = detector.names[int(cls.item())]
+                label = names[int(cls)]
 
                 detection = {
                     "confidence": score,
@@ -2,6 +2,7 @@
 import os
 import sys
 import time
+from threading import Thread
 
 # For PyTorch on Apple silicon
 os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
@@ -16,13 +17,16 @@ os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
 # from module_runner import ModuleRunner
 # from module_logging import LogMethod, LogVerbosity
 
-from codeproject_ai_sdk import JSON, ModuleRunner, LogMethod, LogVerbosity, RequestData
+from codeproject_ai_sdk import JSON, ModuleRunner, LogMethod, LogVerbosity, RequestData, FrameSkipper, \
+                               ShardedCounters, ModelPreloader
 
 # Import the method of the module we're wrapping
 from PIL import Image
 from options import Options
 
-from detect import do_detection
+from detect import do_detection, get_detector, unload_idle_detectors, detectors, detector_backends, \
+                   int8_reports, unloaded_models
+import model_export
 
 
 class YOLO62_adapter(ModuleRunner):
@@ -33,10 +37,24 @@ class YOLO62_adapter(ModuleRunner):
         self.models_last_checked = None
         self.model_names         = []  # We'll use this to cache the available model names
 
+        # Detection is deterministic, so identical requests can share a response
+        # (and, if CPAI_MODULE_RESPONSE_CACHE_MB is set, reuse a recent one)
+        self.cacheable_commands  = [ "detect", "custom" ]
+
+        # For camera streams: reuse the last result if the scene hasn't changed
+        self.frame_skipper       = FrameSkipper(threshold=self.opts.frame_skip_threshold)
+
+        # Loads models in the background at startup so first requests don't wait
+        self.preloader           = ModelPreloader(self._preload_model, self._warm_up_model)
+
         # These will be adjusted based on the hardware / packages found
         self.use_CUDA       = self.opts.use_CUDA
         self.use_MPS        = self.opts.use_MPS
         self.use_DirectML   = self.opts.use_DirectML
+        self.backend        = self.opts.backend
+
+        model_export.cache_dir    = self.opts.model_cache_dir
+        model_export.mmap_weights = self.opts.mmap_weights
 
         if self.use_CUDA and self.half_precision == 'enable' and \
            not self.system_info.hasTorchHalfPrecision:
@@ -84,6 +102,31 @@ class YOLO62_adapter(ModuleRunner):
 
         self.can_use_GPU = self.system_info.hasTorchCuda or self.system_info.hasTorchMPS # or self.use_DirectML
 
+        # OpenVINO (on Intel) and ONNX Runtime are generally much faster than
+        # PyTorch on the CPU. Both run on the CPU only here.
+        if self.backend == "auto":
+            on_GPU = self.use_CUDA or self.use_MPS or self.use_DirectML
+            if on_GPU:
+                self.backend = "pytorch"
+            elif self.system_info.cpu_vendor == 'Intel' and self.system_info.hasOpenVINO \
+                 and not self.opts.use_INT8:
+                self.backend = "openvino"
+            elif self.system_info.hasONNXRuntime:
+                self.backend = "onnx"
+            else:
+                self.backend = "pytorch"
+        elif self.backend == "onnx" and not self.system_info.hasONNXRuntime:
+            self.report_error(None, __file__, "ONNX Runtime is not installed. Using PyTorch")
+            self.backend = "pytorch"
+        elif self.backend == "openvino" and not self.system_info.hasOpenVINO:
+            self.report_error(None, __file__, "OpenVINO is not installed. Using PyTorch")
+            self.backend = "pytorch"
+
+        if self.backend in [ "onnx", "openvino" ]:
+            self.use_CUDA     = False
+            self.use_MPS      = False
+            self.use_DirectML = False
+
         if self.use_CUDA:
             self.inference_device  = "GPU"
             self.inference_library = "CUDA"
@@ -93,9 +136,22 @@ class YOLO62_adapter(ModuleRunner):
         elif self.use_DirectML:
             self.inference_device  = "GPU"
             self.inference_library = "DirectML"
+        elif self.backend == "onnx":
+            self.inference_library = "ONNX Runtime"
+        elif self.backend == "openvino":
+            self.inference_library = "OpenVINO"
+
+        # label => count. process() runs on many threads at once, so these
+        # are sharded per thread rather than being a plain dict
+        self._histogram       = ShardedCounters()
+
+        # Now the device and backend are settled, get the models loaded
+        if self.opts.preload_models:
+            custom_models = [ self._custom_model_name(name) for name in self.opts.preload_custom_models ]
+            self.preloader.start([ self.opts.std_model_name ] + custom_models)
 
-        self._num_items_found = 0
-        self._histogram       = {}
+        if self.opts.idle_unload_mins > 0:
+            Thread(target=self._unload_idle_models, name="IdleModelUnloader", daemon=True).start()
 
         if self.log_verbosity == LogVerbosity.Loud:
             print(f"{self.module_id} init complete")
@@ -120,17 +176,33 @@ class YOLO62_adapter(ModuleRunner):
 
             threshold: float = float(data.get_value("min_confidence", "0.4"))
             img: Image       = data.get_image(0)
-
-            response = do_detection(self, self.opts.models_dir,
-                                    self.opts.std_model_name, self.opts.resolution_pixels,
-                                    self.use_CUDA, self.accel_device_name,
-                                    self.use_MPS, self.use_DirectML, self.half_precision,
-                                    img, threshold)
+            tiled: bool      = data.get_bool("tiled", False)
+            classes          = self._classes(data)
+            max_detections   = max(0, data.get_int("max_detections", 0))
+
+            stream_key          = self._stream_key(data, self.opts.std_model_name, threshold, tiled,
+                                                   classes, max_detections)
+            response, thumbnail = self.frame_skipper.check(stream_key, img)
+
+            if response is None:
+                response = do_detection(self, self.opts.models_dir,
+                                        self.opts.std_model_name, self.opts.resolution_pixels,
+                                        self.use_CUDA, self.accel_device_name,
+                                        self.use_MPS, self.use_DirectML, self.half_precision,
+                                        img, threshold, self.backend,
+                                        self.opts.performance_hint, self.opts.use_INT8,
+                                        self.opts.model_replicas, tiled, self.opts.tile_overlap,
+                                        self.opts.tile_merge, classes, max_detections)
+                if response["success"]:
+                    self.frame_skipper.update(stream_key, thumbnail, response)
 
         elif data.command == "custom":                  # Perform custom object detection
 
             threshold: float  = float(data.get_value("min_confidence", "0.4"))
             img: Image        = data.get_image(0)
+            tiled: bool       = data.get_bool("tiled", False)
+            classes           = self._classes(data)
+            max_detections    = max(0, data.get_int("max_detections", 0))
 
             # The route to here is /v1/vision/custom/<model-name>. if mode-name = general,
             # or no model provided, then a built-in general purpose mode will be used.
@@ -145,24 +217,34 @@ class YOLO62_adapter(ModuleRunner):
             #    model_dir  = opts.models_dir
             #    model_name = opts.std_model_name
 
-            if model_name == "general":                # Use the custom IP Cam general model
-                model_dir  = self.opts.custom_models_dir
-                model_name = "ipcam-general" 
-
-            self.log(LogMethod.Info | LogMethod.Server,
-            { 
-                "filename": __file__,
-                "loglevel": "information",
-                "method": sys._getframe().f_code.co_name,
-                "message": f"Detecting using {model_name}"
-            })
-
-            use_mX_GPU = False # self.opts.use_MPS   - Custom models don't currently work with pyTorch on MPS
-            response = do_detection(self, model_dir, model_name, 
-                                    self.opts.resolution_pixels, self.use_CUDA,
-                                    self.accel_device_name, use_mX_GPU,
-                                    self.use_DirectML, self.half_precision,
-                                    img, threshold)           
+            model_name = self._custom_model_name(model_name)
+
+            # Logged per request, so only if someone's listening
+            if self.is_log_enabled("debug"):
+                self.log(LogMethod.Info | LogMethod.Server,
+                { 
+                    "filename": __file__,
+                    "loglevel": "debug",
+                    "method": sys._getframe().f_code.co_name,
+                    "message": f"Detecting using {model_name}"
+                })
+
+            stream_key          = self._stream_key(data, model_name, threshold, tiled,
+                                                   classes, max_detections)
+            response, thumbnail = self.frame_skipper.check(stream_key, img)
+
+            if response is None:
+                use_mX_GPU = False # self.opts.use_MPS   - Custom models don't currently work with pyTorch on MPS
+                response = do_detection(self, model_dir, model_name, 
+                                        self.opts.resolution_pixels, self.use_CUDA,
+                                        self.accel_device_name, use_mX_GPU,
+                                        self.use_DirectML, self.half_precision,
+                                        img, threshold, self.backend,
+                                        self.opts.performance_hint, self.opts.use_INT8,
+                                        self.opts.model_replicas, tiled, self.opts.tile_overlap,
+                                        self.opts.tile_merge, classes, max_detections)
+                if response["success"]:
+                    self.frame_skipper.update(stream_key, thumbnail, response)
         else:
             response = { "success": False, "error": "unsupported command" }
             self.report_error(None, __file__, f"Unknown command {data.command}")
@@ -172,22 +254,26 @@ class YOLO62_adapter(ModuleRunner):
 
     def status(self) -> JSON:
         statusData = super().status()
-        statusData["numItemsFound"] = self._num_items_found
-        statusData["histogram"]     = self._histogram
+        statusData["numItemsFound"] = self._histogram.total()
+        statusData["histogram"]     = self._histogram.snapshot()
+        statusData["frameSkipping"] = self.frame_skipper.stats()
+        statusData["backend"]       = self.backend
+        statusData["modelBackends"] = dict(detector_backends)  # Differs if an export failed
+        statusData["replicaPools"]  = { name: pool.stats() for name, pool in list(detectors.items()) }
+        statusData["preload"]       = self.preloader.stats()
+        statusData["ready"]         = self.preloader.ready
+        statusData["residentModels"] = list(detectors)         # How long each has been idle is in replicaPools
+        statusData["unloadedModels"] = list(unloaded_models)   # Unloaded for being idle
+        if int8_reports:
+            statusData["int8AccuracyDrift"] = dict(int8_reports)
         return statusData
 
 
     def update_statistics(self, response):
         super().update_statistics(response)
         if "success" in response and response["success"] and "predictions" in response:
-            predictions = response["predictions"]
-            self._num_items_found += len(predictions) 
-            for prediction in predictions:
-                label = prediction["label"]
-                if label not in self._histogram:
-                    self._histogram[label] = 1
-                else:
-                    self._histogram[label] += 1
+            for prediction in response["predictions"]:
+                self._histogram.add(prediction["label"])
     
 
     def selftest(self) -> JSON:
@@ -207,6 +293,92 @@ class YOLO62_adapter(ModuleRunner):
         return { "success": result['success'], "message": "Object detection test successful" }
 
 
+    def _stream_key(self, data: RequestData, model_name: str, threshold: float, tiled: bool,
+                    classes: "list[str]", max_detections: int) -> str:
+        """
+        Returns the key under which frames for this request's camera / stream
+        are tracked, or None if the request isn't tagged with a stream. The
+        model and the detection settings are included since they change the
+        result.
+        """
+        stream_id = data.get_value("stream_id") or data.get_value("camera_id")
+        if not stream_id:
+            return None
+        return f"{stream_id}|{model_name}|{threshold}|{tiled}|{classes}|{max_detections}"
+
+
+    def _classes(self, data: RequestData) -> "list[str]":
+        """
+        Returns the list of labels from the request's comma separated 'classes'
+        value, or None if it didn't ask for particular classes
+        """
+        classes = data.get_value("classes")
+        if not classes:
+            return None
+        return [ label.strip() for label in classes.split(",") if label.strip() ]
+
+
+    def _custom_model_name(self, model_name: str) -> str:
+        """ Maps the "general" custom model to the custom IP Cam general model """
+        return "ipcam-general" if model_name == "general" else model_name
+
+
+    def _model_args(self, model_name: str) -> tuple:
+        """
+        Returns the (models dir, use MPS) to use for the given model, as the
+        detect and custom commands would
+        """
+        if model_name == self.opts.std_model_name:
+            return self.opts.models_dir, self.use_MPS
+        # Custom models don't currently work with PyTorch on MPS
+        return self.opts.custom_models_dir, False
+
+
+    def _preload_model(self, model_name: str) -> bool:
+        """ Loads a model, as its first request would. Called by the preloader """
+        models_dir, use_MPS = self._model_args(model_name)
+        detector = get_detector(self, models_dir, model_name, self.opts.resolution_pixels,
+                                self.use_CUDA, self.accel_device_name, use_MPS,
+                                self.use_DirectML, self.half_precision, self.backend,
+                                self.opts.performance_hint, self.opts.use_INT8,
+                                self.opts.model_replicas)
+        return detector is not None
+
+
+    def _warm_up_model(self, model_name: str) -> bool:
+        """
+        Runs a blank image through a loaded model, at the configured resolution,
+        so the first real request doesn't pay for memory allocation, kernel
+        selection, and the like. Called by the preloader
+        """
+        models_dir, use_MPS = self._model_args(model_name)
+        size     = self.opts.resolution_pixels
+        img      = Image.new("RGB", (size, size))
+        response = do_detection(self, models_dir, model_name, size, self.use_CUDA,
+                                self.accel_device_name, use_MPS, self.use_DirectML,
+                                self.half_precision, img, 1.0, self.backend,
+                                self.opts.performance_hint, self.opts.use_INT8,
+                                self.opts.model_replicas)
+        return response["success"]
+
+
+    def _unload_idle_models(self) -> None:
+        """
+        Periodically unloads the custom models that haven't been used for
+        IDLE_UNLOAD_MINS. The standard model, and any custom models we were
+        asked to preload, stay loaded.
+        """
+        idle_secs = self.opts.idle_unload_mins * 60
+        keep      = [ self.opts.std_model_name ] + \
+                    [ self._custom_model_name(name) for name in self.opts.preload_custom_models ]
+        while True:
+            time.sleep(min(60, max(1, idle_secs / 4)))
+            try:
+                unload_idle_detectors(self, idle_secs, keep)
+            except Exception as ex:
+                self.report_error(ex, __file__, f"Unable to unload idle models ({str(ex)})")
+
+
     def _list_models(self, models_path: str):
 
         """
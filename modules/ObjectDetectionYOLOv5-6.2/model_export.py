@@ -0,0 +1,511 @@
+import ast
+import glob
+import hashlib
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+from yolov5.models.common import DetectMultiBackend, AutoShape
+
+from codeproject_ai_sdk import LogMethod
+
+# Bump this if the way we export models changes, so existing exports are redone
+export_version = 1
+
+# Where exports are cached. None = next to the models they're exported from
+cache_dir = None
+
+# Whether the PyTorch backend loads models through a cache of their weights
+# that's memory mapped, rather than reading them into memory
+mmap_weights = True
+
+_model_hashes = {}   # (path, size, modified time) => hash
+
+# The model type flags DetectMultiBackend's forward() and AutoShape check
+_backend_flags = [ "pt", "jit", "onnx", "xml", "engine", "coreml", "saved_model", "pb",
+                   "tflite", "edgetpu", "tfjs", "paddle", "triton", "dnn", "fp16", "nhwc", "cuda" ]
+
+
+def model_hash(model_path: str) -> str:
+    """ Returns a hash of the contents of a model file """
+    stat = os.stat(model_path)
+    key  = (model_path, stat.st_size, stat.st_mtime)
+    if key not in _model_hashes:
+        sha1 = hashlib.sha1()
+        with open(model_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        _model_hashes[key] = sha1.hexdigest()
+    return _model_hashes[key]
+
+
+def export_key(model_path: str, format: str, size: int, options: str = "") -> str:
+    """
+    Returns the key identifying an export of a model, as <settings>-<source>.
+    The settings part changes with the export settings, and the source part if
+    the model, or the libraries doing the export, change. So a stale export is
+    never used, and the stale exports of the same settings can be found.
+    """
+    try:
+        import yolov5
+        yolo_version = yolov5.__version__
+    except Exception:
+        yolo_version = ""
+
+    settings = [ format, str(size), options ]
+    source   = [ model_hash(model_path), str(export_version), torch.__version__, yolo_version ]
+    return hashlib.sha1("|".join(settings).encode("utf-8")).hexdigest()[:8] + "-" + \
+           hashlib.sha1("|".join(source).encode("utf-8")).hexdigest()[:12]
+
+
+def exports_dir(model_path: str) -> str:
+    """ Returns the folder that exports of the given .pt model are cached in """
+    models_dir = os.path.dirname(model_path)
+    if not cache_dir:
+        return models_dir
+
+    # A folder per models folder, since models in different folders can share a name
+    return os.path.join(cache_dir, os.path.basename(os.path.normpath(models_dir)))
+
+
+def export_path(model_path: str, format: str, suffix: str, size: int, options: str = "") -> str:
+    """
+    Returns the path at which the export of the given .pt model, with the
+    given settings, is (or would be) cached
+    """
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    key        = export_key(model_path, format, size, options)
+    return os.path.join(exports_dir(model_path), f"{model_name}.{key}{suffix}")
+
+
+def remove_stale_exports(model_path: str, suffix: str, current_path: str) -> None:
+    """
+    Removes the exports of older versions of a model that were made with the
+    same settings as current_path, other than current_path. Exports with other
+    settings (a different size, say) may still be in use, so are left alone.
+    """
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    settings   = os.path.basename(current_path)[len(model_name) + 1:].split("-", 1)[0]
+    pattern    = f"{glob.escape(model_name)}.{glob.escape(settings)}-{'[0-9a-f]' * 12}{suffix}"
+
+    for old_export in glob.glob(os.path.join(exports_dir(model_path), pattern)):
+        if old_export != current_path:
+            try:
+                if os.path.isdir(old_export):
+                    shutil.rmtree(old_export)
+                else:
+                    os.remove(old_export)
+            except Exception:
+                pass
+
+
+def cached_export(module_runner, model_path: str, format: str, suffix: str, size: int,
+                  export, options: str = "") -> str:
+    """
+    Returns the path to an export of the given .pt model, exporting it first if
+    there's no up to date export in the cache. Exports are stored in
+    exports_dir as <model name>.<key><suffix>, where the key is from
+    export_key, and stale exports of the model with the same settings are
+    removed.
+    Param: format  - the name of the format (eg "onnx"). Used for logging
+    Param: suffix  - the suffix of the exported file or folder (eg ".onnx")
+    Param: export  - function(pt_path, size) that exports the .pt file at
+                     pt_path, returning the path of the file or folder created
+    Param: options - any export options that change the result
+    Returns None if the export failed.
+    """
+    model_name  = os.path.splitext(os.path.basename(model_path))[0]
+
+    cached_path = export_path(model_path, format, suffix, size, options)
+    if os.path.exists(cached_path):
+        return cached_path
+
+    module_runner.log(LogMethod.Info | LogMethod.Server,
+    {
+        "filename": __file__,
+        "method": sys._getframe().f_code.co_name,
+        "loglevel": "information",
+        "message": f"Exporting {model_name} to {format}. This happens once per model"
+    })
+
+    try:
+        # Exporters write their output next to the weights, so export a copy of
+        # the weights in a temp folder. That way we never overwrite someone's own
+        # exported files, and nothing can load a half written export.
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(cached_path)) as temp_dir:
+            pt_copy = os.path.join(temp_dir, model_name + ".pt")
+            shutil.copyfile(model_path, pt_copy)
+
+            exported = export(pt_copy, size)
+            if not exported or not os.path.exists(exported):
+                raise Exception(f"{format} export produced no output")
+
+            os.replace(exported, cached_path)
+
+    except Exception as ex:
+        module_runner.report_error(ex, __file__, f"Unable to export {model_name} to {format} ({str(ex)})")
+        return None
+
+    remove_stale_exports(model_path, suffix, cached_path)
+
+    return cached_path
+
+
+def export_onnx(pt_path: str, size: int) -> str:
+    """ Exports a YOLOv5 .pt model to ONNX, returning the path of the .onnx file """
+    from yolov5.export import run as export_run
+
+    exported = export_run(weights=pt_path, imgsz=(size, size), include=("onnx",),
+                          device="cpu", opset=12)
+    return exported[0] if exported else None
+
+
+def backend_detector(backend: str, stride: int, names, **members) -> DetectMultiBackend:
+    """
+    Returns a CPU DetectMultiBackend that runs a model we've already loaded
+    ourselves. DetectMultiBackend's constructor loads the model with default
+    settings, so building one normally and then swapping in a tuned session
+    would load every model twice.
+    Param: backend - the DetectMultiBackend type flag, eg "onnx" or "xml"
+    Param: members - what forward() uses to run that type, eg session and
+                     output_names for "onnx"
+    """
+    if not names:   # As DetectMultiBackend does for models without metadata
+        names = { i: f"class{i}" for i in range(999) }
+
+    detector = DetectMultiBackend.__new__(DetectMultiBackend)
+    torch.nn.Module.__init__(detector)
+    detector.__dict__.update({ flag: False for flag in _backend_flags })
+    detector.__dict__.update(members)
+    detector.__dict__.update({ backend: True, "device": torch.device("cpu"),
+                               "stride": int(stride or 32), "names": names })
+    return detector
+
+
+def create_onnx_session(onnx_path: str, parallelism: int):
+    """
+    Creates an ONNX Runtime CPU inference session, tuned for running alongside
+    the other parallel tasks of the module
+    """
+    import onnxruntime as ort
+
+    # Each of the module's parallel tasks may be running the model at once, so
+    # share the cores between them rather than having them fight over all cores
+    num_threads = max(1, (os.cpu_count() or 1) // max(1, parallelism))
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode           = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads     = num_threads
+    options.inter_op_num_threads     = 1
+    options.enable_mem_pattern       = True
+    options.enable_cpu_mem_arena     = True
+    if parallelism > 1:
+        # Spinning threads waiting for work only steal cores from other tasks
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+
+    return ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def int8_model_path(model_path: str, size: int) -> str:
+    """
+    Returns where the INT8 quantized ONNX version of the given .pt model is
+    stored. These are created by quantize.py, not on demand, since they need
+    calibration images. The accuracy report is stored alongside, as .json
+    """
+    return export_path(model_path, "onnx-int8", ".int8.onnx", size)
+
+
+def load_int8_report(model_path: str, size: int) -> dict:
+    """
+    Returns the accuracy drift (INT8 vs FP32) quantize.py measured for the
+    given model, or None if there isn't one
+    """
+    report_path = int8_model_path(model_path, size)[:-len(".onnx")] + ".json"
+    try:
+        with open(report_path, "r") as file:
+            return json.load(file)
+    except Exception:
+        return None
+
+
+def load_onnx_detector(module_runner, model_path: str, size: int,
+                       use_INT8: bool = False, concurrency: int = None) -> AutoShape:
+    """
+    Returns a detector that runs the given .pt model through ONNX Runtime,
+    exporting the model to ONNX first if need be. If use_INT8 then the INT8
+    quantized version of the model is used if it exists. concurrency is the
+    number of sessions expected to run at once, and defaults to the module's
+    parallelism. Returns None if the model couldn't be exported.
+    """
+    onnx_path = None
+    if use_INT8:
+        onnx_path = int8_model_path(model_path, size)
+        if not os.path.exists(onnx_path):
+            module_runner.log(LogMethod.Info | LogMethod.Server,
+            {
+                "filename": __file__,
+                "method": sys._getframe().f_code.co_name,
+                "loglevel": "warning",
+                "message": f"No INT8 version of {os.path.basename(model_path)}. Run quantize.py " +
+                            "to create it. Using FP32"
+            })
+            onnx_path = None
+
+    if not onnx_path:
+        onnx_path = cached_export(module_runner, model_path, "onnx", ".onnx", size, export_onnx)
+    if not onnx_path:
+        return None
+
+    # DetectMultiBackend runs the session, but doesn't let us tune it, so we
+    # create the session and read the class names and stride ourselves
+    session  = create_onnx_session(onnx_path, concurrency or module_runner.parallelism)
+    metadata = session.get_modelmeta().custom_metadata_map
+    names    = ast.literal_eval(metadata["names"]) if "names" in metadata else None
+    detector = backend_detector("onnx", metadata.get("stride"), names, session=session,
+                                output_names=[ output.name for output in session.get_outputs() ])
+
+    return AutoShape(detector)
+
+
+def export_openvino(pt_path: str, size: int) -> str:
+    """
+    Exports a YOLOv5 .pt model to OpenVINO IR (via ONNX), returning the path of
+    the <model>_openvino_model folder holding the .xml, .bin and the .yaml with
+    the class names and stride that DetectMultiBackend needs
+    """
+    import onnx
+    import yaml
+
+    onnx_path = export_onnx(pt_path, size)
+    if not onnx_path:
+        return None
+
+    model_name = os.path.splitext(os.path.basename(pt_path))[0]
+    model_dir  = os.path.join(os.path.dirname(pt_path), model_name + "_openvino_model")
+    xml_path   = os.path.join(model_dir, model_name + ".xml")
+    os.makedirs(model_dir, exist_ok=True)
+
+    try:    # OpenVINO 2023.1+
+        from openvino import convert_model, save_model
+        save_model(convert_model(onnx_path), xml_path, compress_to_fp16=False)
+    except ImportError:
+        from openvino.runtime import Core, serialize
+        serialize(Core().read_model(onnx_path), xml_path)
+
+    metadata = { prop.key: prop.value for prop in onnx.load(onnx_path).metadata_props }
+    with open(os.path.join(model_dir, model_name + ".yaml"), "w") as file:
+        yaml.safe_dump({ "stride": int(metadata["stride"]),
+                         "names":  ast.literal_eval(metadata["names"]) }, file, sort_keys=False)
+
+    return model_dir
+
+
+class OpenVINORequestPool:
+    """
+    Runs inference on an OpenVINO compiled model using a pool of asynchronous
+    infer requests, so the module's parallel tasks can share one compiled
+    model and run at the same time. Waiting on a request releases the GIL.
+    Called the same way as a compiled model: with a list of inputs, returning
+    a dict of output => result.
+    """
+
+    def __init__(self, compiled_model, num_requests: int):
+        self._outputs  = compiled_model.outputs
+        self._requests = queue.Queue()
+        for _ in range(max(1, num_requests)):
+            self._requests.put(compiled_model.create_infer_request())
+
+    def __call__(self, inputs):
+        request = self._requests.get()
+        try:
+            request.start_async(inputs)
+            request.wait()
+            # The request's tensors are reused, so copy the results out
+            return { output: request.get_tensor(output).data.copy() for output in self._outputs }
+        finally:
+            self._requests.put(request)
+
+
+def load_openvino_detector(module_runner, model_path: str, size: int,
+                           performance_hint: str = "throughput") -> AutoShape:
+    """
+    Returns a detector that runs the given .pt model through OpenVINO on the
+    CPU, converting the model to OpenVINO IR first if need be. Returns None if
+    the model couldn't be converted.
+    Param: performance_hint - "throughput" to get the most inferences per
+                              second across parallel requests, or "latency"
+                              to make each single inference as fast as possible
+    """
+    from openvino.runtime import Core
+
+    model_dir = cached_export(module_runner, model_path, "OpenVINO", "_openvino_model",
+                              size, export_openvino)
+    if not model_dir:
+        return None
+
+    # DetectMultiBackend runs the model, but compiles it with default settings
+    # and runs it with a single, blocking request. So we compile it ourselves
+    # and run it with a pool of requests
+    config = { "PERFORMANCE_HINT": "LATENCY" if performance_hint == "latency" else "THROUGHPUT" }
+    if performance_hint != "latency":
+        config["PERFORMANCE_HINT_NUM_REQUESTS"] = str(max(1, module_runner.parallelism))
+
+    xml_path       = glob.glob(os.path.join(model_dir, "*.xml"))[0]
+    compiled_model = Core().compile_model(xml_path, "CPU", config)
+    num_requests   = compiled_model.get_property("OPTIMAL_NUMBER_OF_INFER_REQUESTS")
+
+    request_pool   = OpenVINORequestPool(compiled_model,
+                                         min(num_requests, max(1, module_runner.parallelism)))
+
+    stride, names  = DetectMultiBackend._load_metadata(Path(xml_path).with_suffix(".yaml"))
+    detector       = backend_detector("xml", stride, names, executable_network=request_pool)
+
+    return AutoShape(detector)
+
+
+def export_torchscript(pt_path: str, size: int, device: torch.device, half: bool) -> str:
+    """
+    Traces a YOLOv5 .pt model (fused, on the given device and at the given
+    precision) to TorchScript, returning the path of the .torchscript file
+    """
+    from yolov5.export import run as export_run
+
+    device_name = str(device.index or 0) if device.type == "cuda" else "cpu"
+    exported    = export_run(weights=pt_path, imgsz=(size, size), include=("torchscript",),
+                             device=device_name, half=half)
+    return exported[0] if exported else None
+
+
+def load_torchscript_detector(module_runner, model_path: str, size: int,
+                              device: torch.device, half: bool) -> AutoShape:
+    """
+    Returns a detector that runs a TorchScript trace of the given .pt model,
+    tracing the model first if need be. The trace is specific to the device
+    type and precision, so each combination is cached separately. Returns None
+    if the model couldn't be traced.
+    """
+    options    = f"{device.type}|{'fp16' if half else 'fp32'}"
+    trace_path = cached_export(module_runner, model_path, "TorchScript", ".torchscript", size,
+                               lambda pt_path, size: export_torchscript(pt_path, size, device, half),
+                               options)
+    if not trace_path:
+        return None
+
+    detector = DetectMultiBackend(trace_path, device=device, fp16=half)
+
+    # Freezing inlines the weights as constants and lets TorchScript fold and
+    # fuse operations, which cuts the per-call overhead further
+    try:
+        if hasattr(torch.jit, "optimize_for_inference"):
+            detector.model = torch.jit.optimize_for_inference(torch.jit.freeze(detector.model.eval()))
+        elif hasattr(torch.jit, "freeze"):
+            detector.model = torch.jit.freeze(detector.model.eval())
+    except Exception:
+        pass    # Runs fine unfrozen
+
+    return AutoShape(detector)
+
+
+def export_mmap(pt_path: str, size: int) -> str:
+    """
+    Splits a YOLOv5 .pt model into a folder holding a <model>.pt with just the
+    structure of the (fused, FP32) model, a <model>.weights file with the raw
+    bytes of all its tensors, aligned so they can be used straight from a
+    memory map, and a <model>.json listing where each tensor is. Returns the
+    path of the folder.
+    """
+    from yolov5.models.experimental import attempt_load
+
+    model_name = os.path.splitext(os.path.basename(pt_path))[0]
+    model_dir  = os.path.join(os.path.dirname(pt_path), model_name + "_mmap")
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Fusing and converting to FP32 now means the loaded model uses the mapped
+    # tensors as they are, rather than making a private converted copy
+    model   = attempt_load(pt_path, device=torch.device("cpu"), inplace=True, fuse=True)
+    tensors = []
+    offset  = 0
+
+    with open(os.path.join(model_dir, model_name + ".weights"), "wb") as file:
+        for module_name, module in model.named_modules():
+            for kind, module_tensors in [ ("parameter", module._parameters), ("buffer", module._buffers) ]:
+                for name, tensor in list(module_tensors.items()):
+                    if tensor is None:
+                        continue
+
+                    padding = -offset % 64
+                    file.write(b"\0" * padding)
+                    offset += padding
+
+                    array = tensor.detach().cpu().contiguous().numpy()
+                    file.write(array.tobytes())
+                    tensors.append({ "module": module_name, "kind": kind, "name": name,
+                                     "dtype": array.dtype.str, "shape": list(array.shape),
+                                     "offset": offset })
+                    offset += array.nbytes
+
+                    # Leave an empty tensor of the right type in the structure
+                    empty = torch.empty(0, dtype=tensor.dtype)
+                    if kind == "parameter":
+                        module_tensors[name] = torch.nn.Parameter(empty, requires_grad=False)
+                    else:
+                        module_tensors[name] = empty
+
+    torch.save({ "model": model }, os.path.join(model_dir, model_name + ".pt"))
+    with open(os.path.join(model_dir, model_name + ".json"), "w") as file:
+        json.dump(tensors, file)
+
+    return model_dir
+
+
+def load_mmap_detector(module_runner, model_path: str, size: int,
+                       device: torch.device, half: bool) -> AutoShape:
+    """
+    Returns a detector for the given .pt model whose weights are memory mapped
+    from a cached copy of them, creating the cache first if need be. Loading
+    only reads the (small) structure of the model. The weights are paged in as
+    they're used and, on the CPU, are shared through the OS page cache by every
+    process that loads the same model, rather than each holding a private copy.
+    Returns None if the cache couldn't be created.
+    """
+    model_dir = cached_export(module_runner, model_path, "memory mapped weights", "_mmap", size,
+                              export_mmap)
+    if not model_dir:
+        return None
+
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    with open(os.path.join(model_dir, model_name + ".json"), "r") as file:
+        tensors = json.load(file)
+
+    # DetectMultiBackend loads the structure and moves it to the device, then
+    # we fill in the weights. Copy on write: the weights are never written, so
+    # the pages stay shared, but nothing can corrupt the cache if they are.
+    detector = DetectMultiBackend(os.path.join(model_dir, model_name + ".pt"), device=device, fp16=half)
+    weights  = np.memmap(os.path.join(model_dir, model_name + ".weights"), dtype=np.uint8, mode="c")
+
+    for info in tensors:
+        dtype  = np.dtype(info["dtype"])
+        count  = int(np.prod(info["shape"]))
+        array  = weights[info["offset"]:info["offset"] + count * dtype.itemsize]
+        tensor = torch.from_numpy(array.view(dtype).reshape(info["shape"]))
+
+        if detector.fp16 and tensor.is_floating_point():
+            tensor = tensor.half()
+        if device.type != "cpu":
+            tensor = tensor.to(device)
+
+        module = detector.model.get_submodule(info["module"])
+        if info["kind"] == "parameter":
+            module._parameters[info["name"]] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[info["name"]] = tensor
+
+    return AutoShape(detector)
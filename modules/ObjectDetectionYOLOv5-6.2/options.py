@@ -39,13 +39,101 @@ class Options:
         self.use_MPS            = True          # only if available...
         self.use_DirectML       = True          # only if available...
 
+        # How inference is run: pytorch (the default), torchscript (a cached
+        # trace of the model, CPU or CUDA), onnx (ONNX Runtime, CPU only),
+        # openvino (CPU only) or auto, which uses OpenVINO on Intel CPUs and
+        # ONNX Runtime on other CPUs, if installed. Anything but pytorch
+        # exports each model on its first use, so auto has to be chosen
+        self.backend            = ModuleOptions.getEnvVariable("INFERENCE_BACKEND", "pytorch")
+
+        # OpenVINO: throughput (most inferences / sec across parallel requests)
+        # or latency (fastest single inference)
+        self.performance_hint   = ModuleOptions.getEnvVariable("OPENVINO_PERFORMANCE_HINT", "throughput")
+
+        # ONNX Runtime: use the INT8 quantized models made by quantize.py, where
+        # they exist. Faster on the CPU, at some cost in accuracy
+        self.use_INT8           = ModuleOptions.getEnvVariable("USE_INT8", "False")     # True / False
+
+        # Where exported (ONNX, OpenVINO, INT8, TorchScript, memory mapped)
+        # models are cached. Empty = next to the models they're exported from
+        self.model_cache_dir    = ModuleOptions.getEnvVariable("MODEL_CACHE_DIR", "")
+
+        # PyTorch: load models from a cache of their weights that's memory
+        # mapped. Faster to load, and processes loading the same model share it
+        self.mmap_weights       = ModuleOptions.getEnvVariable("MMAP_WEIGHTS", "True")  # True / False
+
+        # The number of independent copies (replicas) of each model, so that
+        # parallel requests don't contend for one. Each gets a share of the CPU
+        # threads. 0 = a single copy shared by all requests
+        self.model_replicas     = ModuleOptions.getEnvVariable("MODEL_REPLICAS", "0")
+
+        # Load (and warm up) the standard model, and these comma separated
+        # custom models, in the background when the module starts rather than
+        # on their first request
+        self.preload_models     = ModuleOptions.getEnvVariable("PRELOAD_MODELS", "True")  # True / False
+        self.preload_custom_models = ModuleOptions.getEnvVariable("PRELOAD_CUSTOM_MODELS", "")
+
+        # Custom models not used for this many minutes are unloaded, to free
+        # their memory, and reloaded on their next request. 0 = never unload
+        self.idle_unload_mins   = ModuleOptions.getEnvVariable("IDLE_UNLOAD_MINS", "30")
+
+        # Requests with tiled=true are run over overlapping tiles of the image at
+        # the model's resolution. The fraction that tiles overlap, and how the
+        # detections from each tile are merged: nms (keep the most confident)
+        # or wbf (weighted boxes fusion: average the boxes)
+        self.tile_overlap       = ModuleOptions.getEnvVariable("TILE_OVERLAP", "0.2")
+        self.tile_merge         = ModuleOptions.getEnvVariable("TILE_MERGE", "nms")
+
+        # For requests tagged with a stream_id / camera_id: the fraction of a
+        # frame that must change before we re-run detection. 0 = always detect
+        self.frame_skip_threshold = ModuleOptions.getEnvVariable("FRAME_SKIP_THRESHOLD", "0.005")
+
         # Normalise input
         self.model_size         = self.model_size.lower()
         self.use_CUDA           = ModuleOptions.enable_GPU and self.use_CUDA.lower() == "true"
+        self.backend            = self.backend.lower()
+        self.performance_hint   = self.performance_hint.lower()
+        self.use_INT8           = self.use_INT8.lower() == "true"
+        self.model_cache_dir    = os.path.normpath(self.model_cache_dir) if self.model_cache_dir else None
+        self.mmap_weights       = self.mmap_weights.lower() == "true"
+        self.tile_merge         = self.tile_merge.lower()
+
+        self.preload_models     = self.preload_models.lower() == "true"
+        self.preload_custom_models = [ name.strip() for name in self.preload_custom_models.split(",")
+                                       if name.strip() ]
+
+        try:
+            self.model_replicas = max(0, int(self.model_replicas))
+        except ValueError:
+            self.model_replicas = 0
+
+        try:
+            self.idle_unload_mins = max(0.0, float(self.idle_unload_mins))
+        except ValueError:
+            self.idle_unload_mins = 30
+
+        try:
+            self.tile_overlap = min(0.9, max(0.0, float(self.tile_overlap)))
+        except ValueError:
+            self.tile_overlap = 0.2
+
+        try:
+            self.frame_skip_threshold = max(0.0, float(self.frame_skip_threshold))
+        except ValueError:
+            self.frame_skip_threshold = 0.005
 
         if self.model_size not in [ "tiny", "small", "medium", "large" ]:
             self.model_size = "medium"
 
+        if self.backend not in [ "auto", "pytorch", "torchscript", "onnx", "openvino" ]:
+            self.backend = "pytorch"
+
+        if self.performance_hint not in [ "throughput", "latency" ]:
+            self.performance_hint = "throughput"
+
+        if self.tile_merge not in [ "nms", "wbf" ]:
+            self.tile_merge = "nms"
+
         # Get settings
         settings = self.MODEL_SETTINGS[self.model_size]   
         self.resolution_pixels = settings.RESOLUTION
@@ -58,3 +146,4 @@ class Options:
             print(f"Debug: APPDIR:      {self.app_dir}")
             print(f"Debug: MODEL_SIZE:  {self.model_size}")
             print(f"Debug: MODELS_DIR:  {self.models_dir}")
+            print(f"Debug: BACKEND:     {self.backend}")
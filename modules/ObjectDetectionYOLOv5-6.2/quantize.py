@@ -0,0 +1,257 @@
+"""
+Creates INT8 quantized versions of the YOLOv5 models for the ONNX Runtime
+backend, calibrated on a folder of sample images, and reports how far the
+detections of each quantized model drift from those of the FP32 model on
+the same images. The module uses the quantized models when USE_INT8 is True
+and INFERENCE_BACKEND is onnx (or auto).
+
+Quantized models are stored next to the .pt files, keyed like the ONNX
+exports, so they're ignored (and the module falls back to FP32) if the model
+or the libraries change. Re-run this script after updating models.
+
+Example run: python3 quantize.py --images ../../src/demos/TestData
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from detect import inference_size
+import model_export
+from model_export import cached_export, export_onnx, int8_model_path, load_onnx_detector, \
+                         remove_stale_exports
+
+
+class ConsoleRunner:
+    """ Stands in for the ModuleRunner that the export functions report through """
+    parallelism = 1
+
+    def log(self, log_method, data) -> None:
+        print(data.get("message"))
+
+    def report_error(self, exception, filename: str, message: str = None) -> None:
+        print(f"Error: {message or exception}")
+
+
+def load_image(image_path: Path) -> np.ndarray:
+    """ Loads an image as an RGB HWC array, as AutoShape sees a PIL image """
+    with Image.open(image_path) as image:
+        return np.asarray(ImageOps.exif_transpose(image).convert("RGB"))
+
+
+def preprocess(image: np.ndarray, size: int) -> np.ndarray:
+    """ Letterboxes and normalises an image exactly as AutoShape does for a fixed size model """
+    from yolov5.utils.augmentations import letterbox
+
+    image = letterbox(image, (size, size), auto=False)[0]
+    image = image.transpose((2, 0, 1))[None].astype(np.float32) / 255
+    return np.ascontiguousarray(image)
+
+
+def detect_head_nodes(onnx_path: str) -> "list[str]":
+    """
+    Returns the names of the nodes that decode the model's output: everything
+    in the Detect layer after its final convolutions. These turn small values
+    into pixel coordinates, which INT8 can't represent accurately, and they
+    cost little to leave in FP32.
+    """
+    import onnx
+
+    graph     = onnx.load(onnx_path).graph
+    producers = { output: node for node in graph.node for output in node.output }
+
+    head    = set()
+    pending = [ output.name for output in graph.output ]
+    while pending:
+        node = producers.get(pending.pop())
+        if node is None or node.name in head or node.op_type == "Conv":
+            continue
+        head.add(node.name)
+        pending.extend(node.input)
+
+    return list(head)
+
+
+def quantize(fp32_path: str, int8_path: str, images: "list[Path]", size: int) -> None:
+    """ Creates the INT8 version of an FP32 ONNX model, calibrated on the given images """
+    from onnxruntime.quantization import CalibrationDataReader, CalibrationMethod, \
+                                         QuantFormat, QuantType, quantize_static
+
+    class CalibrationImages(CalibrationDataReader):
+        def __init__(self, input_name: str):
+            self._input_name = input_name
+            self._images     = iter(images)
+
+        def get_next(self):
+            image_path = next(self._images, None)
+            if image_path is None:
+                return None
+            return { self._input_name: preprocess(load_image(image_path), size) }
+
+    import onnx
+    input_name = onnx.load(fp32_path).graph.input[0].name
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(int8_path)) as temp_dir:
+        # Shape inference helps the quantizer. Not available in older versions
+        model_path = fp32_path
+        try:
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+            model_path = os.path.join(temp_dir, "preprocessed.onnx")
+            quant_pre_process(fp32_path, model_path)
+        except Exception:
+            model_path = fp32_path
+
+        # QDQ with unsigned activations and signed weights is the fastest
+        # combination on x86 (VNNI) and ARM (dot product) CPUs
+        temp_path = os.path.join(temp_dir, "quantized.onnx")
+        quantize_static(model_path, temp_path, CalibrationImages(input_name),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method=CalibrationMethod.MinMax,
+                        nodes_to_exclude=detect_head_nodes(fp32_path))
+
+        os.replace(temp_path, int8_path)
+
+
+def iou(box: "list[float]", other: "list[float]") -> float:
+    """ Returns the intersection over union of two x_min, y_min, x_max, y_max boxes """
+    width  = max(0.0, min(box[2], other[2]) - max(box[0], other[0]))
+    height = max(0.0, min(box[3], other[3]) - max(box[1], other[1]))
+    intersection = width * height
+    union = (box[2] - box[0]) * (box[3] - box[1]) + (other[2] - other[0]) * (other[3] - other[1]) \
+          - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def detect(detector, image: np.ndarray, size: int, threshold: float) -> "tuple[list, float]":
+    """ Returns a tuple of ([(class, confidence, box)], inference ms) """
+    start_time = time.perf_counter()
+    det        = detector(image, size=size)
+    ms         = (time.perf_counter() - start_time) * 1000
+
+    found = [ (int(cls), conf, box) for *box, conf, cls in det.xyxy[0].tolist() if conf >= threshold ]
+    return found, ms
+
+
+def compare(fp32_detector, int8_detector, images: "list[Path]", size: int,
+            threshold: float) -> dict:
+    """
+    Runs both detectors over the images and returns how the INT8 detections
+    differ from the FP32 detections, which are taken as the truth. A detection
+    matches if it's the same class and overlaps by at least 50%.
+    """
+    fp32_count = int8_count = matched = 0
+    fp32_ms    = int8_ms    = 0.0
+    ious, confidence_deltas = [], []
+
+    for image_path in images:
+        image = load_image(image_path)
+        fp32_found, ms = detect(fp32_detector, image, size, threshold)
+        fp32_ms += ms
+        int8_found, ms = detect(int8_detector, image, size, threshold)
+        int8_ms += ms
+
+        fp32_count += len(fp32_found)
+        int8_count += len(int8_found)
+
+        unmatched = list(int8_found)
+        for cls, conf, box in sorted(fp32_found, key=lambda found: found[1], reverse=True):
+            candidates = [ (iou(box, other[2]), other) for other in unmatched if other[0] == cls ]
+            if not candidates:
+                continue
+            overlap, best = max(candidates, key=lambda candidate: candidate[0])
+            if overlap >= 0.5:
+                matched += 1
+                unmatched.remove(best)
+                ious.append(overlap)
+                confidence_deltas.append(best[1] - conf)
+
+    return {
+        "images":              len(images),
+        "threshold":           threshold,
+        "fp32Detections":      fp32_count,
+        "int8Detections":      int8_count,
+        "recall":              round(matched / fp32_count, 4) if fp32_count else 1.0,
+        "precision":           round(matched / int8_count, 4) if int8_count else 1.0,
+        "meanIoU":             round(float(np.mean(ious)), 4) if ious else None,
+        "meanConfidenceDelta": round(float(np.mean(confidence_deltas)), 4) if confidence_deltas else None,
+        "fp32InferenceMs":     round(fp32_ms / max(1, len(images)), 1),
+        "int8InferenceMs":     round(int8_ms / max(1, len(images)), 1),
+        "created":             time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def main():
+
+    module_dir     = os.path.dirname(os.path.abspath(__file__))
+    default_images = os.path.normpath(os.path.join(module_dir, "../../src/demos/TestData"))
+
+    parser = argparse.ArgumentParser(description="Create INT8 quantized versions of the YOLOv5 models",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-i', '--images', type=str, default=default_images,
+                        help='Folder of sample images to calibrate with (searched recursively)')
+    parser.add_argument('-m', '--models', type=str, nargs='+',
+                        default=[ os.path.join(module_dir, "assets"), os.path.join(module_dir, "custom-models") ],
+                        help='Folders of .pt models to quantize')
+    parser.add_argument('-n', '--max-images', type=int, default=100, help='Max number of images to use')
+    parser.add_argument('-t', '--threshold', type=float, default=0.4,
+                        help='Min confidence of detections compared when measuring accuracy drift')
+    parser.add_argument('-c', '--cache-dir', type=str, default=os.getenv("MODEL_CACHE_DIR", ""),
+                        help='Where the module caches exported models (its MODEL_CACHE_DIR). ' +
+                             'Empty = next to the models')
+    args = parser.parse_args()
+
+    model_export.cache_dir = os.path.normpath(args.cache_dir) if args.cache_dir else None
+
+    images = sorted(path for path in Path(args.images).rglob("*")
+                    if path.suffix.lower() in [ ".jpg", ".jpeg", ".png" ])[:args.max_images]
+    if not images:
+        print(f"No images found in {args.images}")
+        return
+
+    print(f"Calibrating with {len(images)} images from {args.images}")
+
+    runner = ConsoleRunner()
+    size   = inference_size
+
+    for models_dir in args.models:
+        if not os.path.isdir(models_dir):
+            continue
+
+        for model_path in sorted(str(path) for path in Path(models_dir).glob("*.pt")):
+            model_name = os.path.basename(model_path)
+            print(f"\nQuantizing {model_name}")
+
+            fp32_path = cached_export(runner, model_path, "onnx", ".onnx", size, export_onnx)
+            if not fp32_path:
+                continue
+
+            int8_path   = int8_model_path(model_path, size)
+            report_path = int8_path[:-len(".onnx")] + ".json"
+            try:
+                quantize(fp32_path, int8_path, images, size)
+            except Exception as ex:
+                print(f"Error: Unable to quantize {model_name} ({str(ex)})")
+                continue
+
+            remove_stale_exports(model_path, ".int8.onnx", int8_path)
+            remove_stale_exports(model_path, ".int8.json", report_path)
+
+            report = compare(load_onnx_detector(runner, model_path, size),
+                             load_onnx_detector(runner, model_path, size, use_INT8=True),
+                             images, size, args.threshold)
+            with open(report_path, "w") as file:
+                json.dump(report, file, indent=2)
+
+            print(f"{model_name}: recall {report['recall']:.1%}, precision {report['precision']:.1%}, " +
+                  f"mean IoU {report['meanIoU']}, inference {report['fp32InferenceMs']}ms (FP32) " +
+                  f"vs {report['int8InferenceMs']}ms (INT8)")
+
+
+if __name__ == "__main__":
+    main()
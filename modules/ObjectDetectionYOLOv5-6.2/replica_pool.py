@@ -0,0 +1,122 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ReplicaPool:
+    """
+    A pool of independent instances (replicas) of a model. A request checks
+    out a free replica, waiting if they're all busy, so no replica is ever run
+    by two threads at once. Replicas are created on demand, up to size, so an
+    idle module only holds one.
+
+    A shared pool holds a single instance that every request uses at once.
+    This suits backends (eg OpenVINO) that manage their own concurrency, and is
+    how the module worked before replicas.
+    """
+
+    def __init__(self, create, first = None, size: int = 1, shared: bool = False):
+        """
+        Constructor.
+        Param: create - function that creates a new replica
+        Param: first  - an already created replica, if any. Otherwise one is
+                        created now, so a model that can't load fails here
+        Param: size   - the max number of replicas
+        Param: shared - if True, a single replica is used by all requests at once
+        """
+        self.size          = 1 if shared else max(1, size)
+        self.shared        = shared
+
+        self._create       = create
+        self._free         = [ first if first is not None else create() ]
+        self._count        = 1     # Replicas created, or being created
+        self._condition    = threading.Condition()
+
+        self._in_use       = 0
+        self._last_used    = time.monotonic()
+
+        self._checkouts    = 0
+        self._waits        = 0
+        self._total_wait   = 0.0
+        self._max_wait     = 0.0
+
+    @contextmanager
+    def checkout(self):
+        """
+        Checks out a replica for the duration of a with block:
+            with pool.checkout() as detector:
+                ...
+        """
+        if self.shared:
+            with self._condition:
+                self._checkouts += 1
+                self._in_use    += 1
+            try:
+                yield self._free[0]
+            finally:
+                with self._condition:
+                    self._in_use   -= 1
+                    self._last_used = time.monotonic()
+            return
+
+        replica    = None
+        waited     = False
+        start_time = time.perf_counter()
+
+        with self._condition:
+            self._checkouts += 1
+            self._in_use    += 1
+            while not self._free and self._count >= self.size:
+                waited = True
+                self._condition.wait()
+
+            if self._free:
+                replica = self._free.pop()
+            else:
+                self._count += 1    # Reserve the slot, then create outside the lock
+
+        if waited:
+            wait_secs = time.perf_counter() - start_time
+            with self._condition:
+                self._waits      += 1
+                self._total_wait += wait_secs
+                self._max_wait    = max(self._max_wait, wait_secs)
+
+        if replica is None:
+            try:
+                replica = self._create()
+            except:
+                with self._condition:
+                    self._count  -= 1
+                    self._in_use -= 1
+                    self._condition.notify()
+                raise
+
+        try:
+            yield replica
+        finally:
+            with self._condition:
+                self._free.append(replica)
+                self._in_use   -= 1
+                self._last_used = time.monotonic()
+                self._condition.notify()
+
+    @property
+    def idle_secs(self) -> float:
+        """ How long since the pool was last used. 0 if it's in use now """
+        with self._condition:
+            return 0 if self._in_use else time.monotonic() - self._last_used
+
+    def stats(self) -> dict:
+        """ Returns the pool's statistics, suitable for a status report """
+        with self._condition:
+            return {
+                "replicas":   self._count,
+                "size":       self.size,
+                "inUse":      self._in_use,
+                "checkouts":  self._checkouts,
+                "waits":      self._waits,
+                "avgWaitMs":  round(self._total_wait * 1000 / self._waits, 1) if self._waits else 0,
+                "maxWaitMs":  round(self._max_wait * 1000, 1),
+                "idleSecs":   0 if self._in_use else round(time.monotonic() - self._last_used)
+            }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The module's files aren't a package, so make them importable as the module does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
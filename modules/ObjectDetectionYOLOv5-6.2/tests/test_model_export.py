@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("yolov5")
+pytest.importorskip("codeproject_ai_sdk")
+
+import model_export
+from model_export import export_path, remove_stale_exports
+
+
+def make_export(path: str) -> str:
+    with open(path, "w") as file:
+        file.write("export")
+    return path
+
+
+def test_only_stale_exports_with_the_same_settings_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_export, "cache_dir", None)
+    model_path = str(tmp_path / "yolov5m.pt")
+    with open(model_path, "w") as file:
+        file.write("version 1")
+
+    old_640  = make_export(export_path(model_path, "onnx", ".onnx", 640))
+    old_320  = make_export(export_path(model_path, "onnx", ".onnx", 320))
+    old_half = make_export(export_path(model_path, "TorchScript", ".torchscript", 640, "half"))
+    # Another model's export with the same key
+    other    = make_export(str(tmp_path / os.path.basename(old_640).replace("yolov5m", "yolov5s")))
+
+    with open(model_path, "w") as file:
+        file.write("version 2")
+    os.utime(model_path, (1, 1))          # so the hash isn't taken from model_hash's cache
+    new_640 = make_export(export_path(model_path, "onnx", ".onnx", 640))
+    assert new_640 != old_640
+
+    remove_stale_exports(model_path, ".onnx", new_640)
+
+    assert not os.path.exists(old_640)
+    assert all(os.path.exists(path) for path in [ new_640, old_320, old_half, other ])
@@ -0,0 +1,107 @@
+import numpy as np
+
+from tiling import make_tiles, merge_detections
+
+
+def test_small_image_is_one_tile():
+    assert make_tiles(400, 300, 640) == [ (0, 0, 400, 300) ]
+
+
+def test_tiles_cover_the_image():
+    width, height, size = 1920, 1080, 640
+    tiles = make_tiles(width, height, size, overlap=0.2)
+
+    covered = np.zeros((height, width), dtype=bool)
+    for x, y, w, h in tiles:
+        assert (w, h) == (size, size)
+        assert 0 <= x and x + w <= width and 0 <= y and y + h <= height
+        covered[y:y + h, x:x + w] = True
+    assert covered.all()
+
+
+def test_tiles_overlap():
+    tiles = make_tiles(1280, 640, 640, overlap=0.2)
+    starts = sorted(x for x, _, _, _ in tiles)
+    assert starts == [ 0, 512, 640 ]
+
+
+def test_last_tile_ends_at_the_edge():
+    tiles = make_tiles(1000, 700, 640, overlap=0)
+    assert max(x + w for x, _, w, _ in tiles) == 1000
+    assert max(y + h for _, y, _, h in tiles) == 700
+
+
+def test_no_detections():
+    assert len(merge_detections(np.zeros((0, 6)))) == 0
+
+
+def test_nms_keeps_most_confident_duplicate():
+    detections = np.array([
+        [ 100, 100, 200, 200, 0.6, 0 ],
+        [ 102, 100, 200, 202, 0.9, 0 ],
+        [ 400, 400, 450, 450, 0.5, 0 ],
+    ])
+    merged = merge_detections(detections, "nms")
+    assert merged.tolist() == [ [ 102, 100, 200, 202, 0.9, 0 ], [ 400, 400, 450, 450, 0.5, 0 ] ]
+
+
+# A 1000 x 500 image, and the tile that covers its left half
+whole_image = [ 0, 0, 1000, 500 ]
+left_tile   = [ 0, 0, 500, 500 ]
+
+
+def test_box_cut_off_by_a_tile_merges_into_the_full_box():
+    detections = np.array([
+        [ 400, 100, 600, 300, 0.6, 0 ],     # The whole object, in the whole image
+        [ 400, 100, 500, 300, 0.9, 0 ],     # Its left half, cut off by the tile edge
+    ])
+    crops = np.array([ whole_image, left_tile ])
+
+    for method in [ "nms", "wbf" ]:
+        merged = merge_detections(detections, method, crops=crops, image_size=(1000, 500))
+        assert merged.tolist() == [ [ 400, 100, 600, 300, 0.9, 0 ] ]
+
+
+def test_small_object_inside_a_larger_one_survives():
+    detections = np.array([
+        [ 100, 100, 300, 400, 0.9, 0 ],     # A person...
+        [ 150, 150, 220, 300, 0.7, 0 ],     # ...and a person behind them
+    ])
+    crops = np.array([ left_tile, left_tile ])
+
+    merged = merge_detections(detections, crops=crops, image_size=(1000, 500))
+    assert len(merged) == 2
+    assert len(merge_detections(detections)) == 2
+
+
+def test_box_at_the_image_edge_is_not_cut_off():
+    detections = np.array([
+        [   0, 100, 300, 400, 0.9, 0 ],
+        [   0, 150,  80, 300, 0.7, 0 ],     # On the tile's left edge, but that's the image edge
+    ])
+    crops = np.array([ whole_image, left_tile ])
+
+    assert len(merge_detections(detections, crops=crops, image_size=(1000, 500))) == 2
+
+
+def test_different_classes_are_not_merged():
+    detections = np.array([
+        [ 100, 100, 200, 200, 0.6, 0 ],
+        [ 100, 100, 200, 200, 0.8, 1 ],
+    ])
+    assert len(merge_detections(detections)) == 2
+
+
+def test_wbf_averages_boxes_by_confidence():
+    detections = np.array([
+        [ 100, 100, 200, 200, 0.75, 2 ],
+        [ 110, 100, 210, 200, 0.25, 2 ],
+    ])
+    merged = merge_detections(detections, "wbf")
+    assert len(merged) == 1
+    assert np.allclose(merged[0], [ 102.5, 100, 202.5, 200, 0.75, 2 ])
+
+
+def test_zero_area_box_is_kept():
+    detections = np.array([ [ 100, 100, 100, 100, 0.5, 0 ] ])
+    assert len(merge_detections(detections)) == 1
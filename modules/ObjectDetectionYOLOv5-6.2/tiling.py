@@ -0,0 +1,120 @@
+import numpy as np
+
+
+def make_tiles(width: int, height: int, size: int, overlap: float = 0.2) -> "list[tuple]":
+    """
+    Returns the (x, y, width, height) of the overlapping tiles, each size x size
+    (or the whole image along a side that's smaller), that cover an image. The
+    last tile along each side is moved back to end at the image edge, so no
+    tile is partly empty.
+    """
+    def starts(length: int) -> "list[int]":
+        if length <= size:
+            return [ 0 ]
+        step = max(1, int(size * (1 - overlap)))
+        return list(range(0, length - size, step)) + [ length - size ]
+
+    return [ (x, y, min(size, width), min(size, height))
+             for y in starts(height) for x in starts(width) ]
+
+
+def merge_detections(detections: np.ndarray, method: str = "nms", threshold: float = 0.5,
+                     crops: np.ndarray = None, image_size: "tuple[int, int]" = None,
+                     margin: float = 4.0) -> np.ndarray:
+    """
+    Merges the duplicate detections of an object seen by more than one tile.
+    detections is an array of rows of x_min, y_min, x_max, y_max, confidence,
+    class, in full image coordinates. Two detections of the same class are
+    duplicates if their IoU is at least threshold, or if one lies (at least
+    threshold of it) inside the other and was cut off by an edge of its tile
+    that the other box extends past: a tile that cuts an object in half sees
+    a box inside the full box, which barely overlaps it by IoU. A cut off box
+    is never the box kept. A smaller object inside a larger one that wasn't
+    cut off (a person behind a person) is not a duplicate.
+    Param: method     - "nms" keeps the box of the most confident of each set
+                        of duplicates. "wbf" (weighted boxes fusion) averages
+                        their boxes, weighted by confidence. Both keep the
+                        highest confidence
+    Param: crops      - the x_min, y_min, x_max, y_max of the tile (or the
+                        whole image) each detection was found in. Without
+                        these, duplicates are only matched by IoU
+    Param: image_size - the image's (width, height). Tile edges on the image's
+                        edges don't cut anything off. Defaults to the extent
+                        of the crops
+    Param: margin     - how close (pixels) a box must be to a tile edge to
+                        count as cut off by it
+    Returns the merged detections, most confident first.
+    """
+    if len(detections) == 0:
+        return detections
+
+    cut = _cut_sides(detections, crops, image_size, margin)
+
+    merged = []
+    for cls in np.unique(detections[:, 5]):
+        in_class = detections[:, 5] == cls
+        order    = np.argsort(-detections[in_class, 4], kind="stable")
+        boxes    = detections[in_class][order]
+        box_cut  = cut[in_class][order]
+        areas    = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        remaining = np.arange(len(boxes))
+        while len(remaining):
+            best   = remaining[0]
+            width  = np.minimum(boxes[best, 2], boxes[remaining, 2]) - np.maximum(boxes[best, 0], boxes[remaining, 0])
+            height = np.minimum(boxes[best, 3], boxes[remaining, 3]) - np.maximum(boxes[best, 1], boxes[remaining, 1])
+            intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+            union        = np.maximum(areas[best] + areas[remaining] - intersection, 1e-9)
+
+            same    = intersection / union >= threshold
+            same[0] = True      # Even a zero area box matches itself
+            part    = _cut_off_inside(boxes, box_cut, areas, remaining, best, intersection, threshold, margin)
+            whole   = _cut_off_inside(boxes, box_cut, areas, best, remaining, intersection, threshold, margin)
+
+            # If the best box was cut off by its tile then the box comes from
+            # the (less confident) boxes it was cut off from
+            sources    = remaining[whole] if whole.any() else remaining[same]
+            remaining  = remaining[~(same | part | whole)]  # Still most confident first
+
+            box = boxes[best].copy()
+            if method == "wbf" and len(sources) > 1:
+                weights = boxes[sources, 4]
+                box[:4] = (boxes[sources, :4] * weights[:, None]).sum(axis=0) / weights.sum()
+            else:
+                box[:4] = boxes[sources[0], :4]
+            merged.append(box)
+
+    merged = np.array(merged)
+    return merged[np.argsort(-merged[:, 4], kind="stable")]
+
+
+def _cut_sides(detections: np.ndarray, crops: np.ndarray, image_size: "tuple[int, int]",
+               margin: float) -> np.ndarray:
+    """
+    Returns whether each detection's left, top, right and bottom side is on
+    an edge of its crop that's inside the image, ie the object may carry on
+    past it
+    """
+    if crops is None:
+        return np.zeros((len(detections), 4), dtype=bool)
+
+    width, height = image_size or (crops[:, 2].max(), crops[:, 3].max())
+    return np.stack([ (crops[:, 0] > 0)      & (detections[:, 0] <= crops[:, 0] + margin),
+                      (crops[:, 1] > 0)      & (detections[:, 1] <= crops[:, 1] + margin),
+                      (crops[:, 2] < width)  & (detections[:, 2] >= crops[:, 2] - margin),
+                      (crops[:, 3] < height) & (detections[:, 3] >= crops[:, 3] - margin) ], axis=1)
+
+
+def _cut_off_inside(boxes: np.ndarray, cut: np.ndarray, areas: np.ndarray, inner, outer,
+                    intersection: np.ndarray, threshold: float, margin: float) -> np.ndarray:
+    """
+    Returns whether the inner box(es) lie inside the outer box(es) and were
+    cut off by a tile edge that the outer box extends past. One of inner and
+    outer is a single index, the other an array of them
+    """
+    inside  = (intersection / np.maximum(areas[inner], 1e-9) >= threshold) & (areas[inner] < areas[outer])
+    extends = np.stack([ boxes[outer, 0] < boxes[inner, 0] - margin,
+                         boxes[outer, 1] < boxes[inner, 1] - margin,
+                         boxes[outer, 2] > boxes[inner, 2] + margin,
+                         boxes[outer, 3] > boxes[inner, 3] + margin ], axis=-1)
+    return inside & (extends & cut[inner]).any(axis=-1)
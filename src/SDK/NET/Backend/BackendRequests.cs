@@ -26,6 +26,21 @@ namespace CodeProject.AI.SDK.Backend
         /// </summary>
         [JsonInclude]
         public string? reqtype { get; protected set; }
+
+        /// <summary>
+        /// Gets the time this request was created, in milliseconds since the Unix epoch (UTC).
+        /// Modules use this, along with reqtimeout, to detect requests whose caller has already
+        /// given up waiting.
+        /// </summary>
+        [JsonInclude]
+        public long reqtime { get; private set; } = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds();
+
+        /// <summary>
+        /// Gets or sets the number of milliseconds, from reqtime, after which the server will no
+        /// longer wait for a response to this request. 0 means no timeout.
+        /// </summary>
+        [JsonInclude]
+        public long reqtimeout { get; set; }
     }
 
     /// <summary>
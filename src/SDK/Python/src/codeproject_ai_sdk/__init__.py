@@ -1,10 +1,65 @@
-from .common import JSON, timedelta_format, get_folder_size, shorten, dump_tensors
-from .module_logging import LogMethod, LogVerbosity
-from .module_options import ModuleOptions, _get_env_var
-from .module_runner import ModuleRunner
-from .request_data import RequestData
-from .system_info import SystemInfo
+# The startup profiler goes first so it can time everything imported after it
+from .startup_profiler import startup_profiler
 
-from .utils import *
+# Everything else is imported on first use. Every module imports the SDK at
+# startup, and many of the submodules pull in heavy packages (aiohttp, PIL,
+# cpuinfo) that a given module may never need.
+import importlib
+from typing import TYPE_CHECKING
 
+_lazy_imports = {
+    "JSON":              ".common",
+    "timedelta_format":  ".common",
+    "get_folder_size":   ".common",
+    "shorten":           ".common",
+    "dump_tensors":      ".common",
+    "FrameSkipper":      ".frame_skipper",
+    "LogMethod":         ".module_logging",
+    "LogVerbosity":      ".module_logging",
+    "LogOverflowPolicy": ".module_logging",
+    "ModelPreloader":    ".model_preloader",
+    "ModuleOptions":     ".module_options",
+    "_get_env_var":      ".module_options",
+    "ModuleRunner":      ".module_runner",
+    "RequestData":       ".request_data",
+    "ResponseCache":     ".response_cache",
+    "ShardedCounters":   ".sharded_counters",
+    "SystemInfo":        ".system_info",
 
+    "CPUInfoBase":       ".utils",
+    "LinuxCPUInfo":      ".utils",
+    "IRIXCPUInfo":       ".utils",
+    "DarwinCPUInfo":     ".utils",
+    "NetBSDCPUInfo":     ".utils",
+    "SunOSCPUInfo":      ".utils",
+    "Win32CPUInfo":      ".utils",
+}
+
+__all__ = list(_lazy_imports) + [ "startup_profiler" ]
+
+def __getattr__(name: str):
+    module_name = _lazy_imports.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value   # Next time, don't come back here
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+# So IDEs and type checkers still see everything
+if TYPE_CHECKING:
+    from .common import JSON, timedelta_format, get_folder_size, shorten, dump_tensors
+    from .frame_skipper import FrameSkipper
+    from .module_logging import LogMethod, LogVerbosity, LogOverflowPolicy
+    from .model_preloader import ModelPreloader
+    from .module_options import ModuleOptions, _get_env_var
+    from .module_runner import ModuleRunner
+    from .request_data import RequestData
+    from .response_cache import ResponseCache
+    from .sharded_counters import ShardedCounters
+    from .system_info import SystemInfo
+
+    from .utils import *
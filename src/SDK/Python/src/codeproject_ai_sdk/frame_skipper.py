@@ -0,0 +1,143 @@
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from PIL import Image, ImageChops
+
+from .common import JSON
+
+
+class FrameSkipper:
+    """
+    Remembers a small greyscale thumbnail of the last frame processed for each
+    camera / stream, along with the response that frame produced. If the next
+    frame from that stream is visually (almost) the same, the previous
+    response can be returned instead of running inference again. Static
+    scenes make up the bulk of CCTV traffic, so this saves a lot of work.
+
+    Frames are always compared against the last *processed* frame, so slow
+    changes accumulate until they cross the threshold. State is kept for at
+    most max_streams streams, least recently used being dropped first.
+
+    This is safe to call from multiple threads.
+    """
+
+    def __init__(self, threshold: float = 0.005, max_streams: int = 64,
+                 thumbnail_size: int = 64, pixel_tolerance: int = 16,
+                 max_age_secs: float = 30):
+        """
+        Constructor.
+        Param: threshold       - the fraction (0 - 1) of thumbnail pixels that
+                                 must change for a frame to count as different
+        Param: max_streams     - the max number of streams to remember
+        Param: thumbnail_size  - width and height of the thumbnail compared
+        Param: pixel_tolerance - how much (0 - 255) a thumbnail pixel must
+                                 change by to count as changed. Hides noise.
+        Param: max_age_secs    - a previous response is never reused if it's
+                                 older than this. 0 = no limit
+        """
+        self.threshold       = threshold
+        self.max_streams     = max_streams
+        self.thumbnail_size  = thumbnail_size
+        self.pixel_tolerance = pixel_tolerance
+        self.max_age_secs    = max_age_secs
+
+        self._streams        = OrderedDict()  # stream key => (timestamp, image size, thumbnail, response)
+        self._lock           = Lock()
+
+        self.frames_reused    = 0
+        self.frames_processed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.max_streams > 0
+
+    def thumbnail(self, image: Image) -> Image:
+        """ Creates the thumbnail used to compare frames """
+        size = (self.thumbnail_size, self.thumbnail_size)
+        # reducing_gap lets PIL do a fast integer reduce first. Half the cost
+        # on a 4K frame, and we don't need fidelity here
+        thumbnail = image.resize(size, Image.BOX, reducing_gap=2.0).convert("L")
+
+        # Predictions are in image coordinates, so a frame of a different size
+        # can never reuse them even if it looks the same
+        thumbnail.info["source_size"] = image.size
+        return thumbnail
+
+    def check(self, stream_key: str, image: Image) -> "tuple[JSON, Image]":
+        """
+        Compares the image to the last processed frame for this stream. Returns
+        a tuple of (previous response, thumbnail). The previous response is
+        None if the frame has changed (or we've no previous frame), in which
+        case the caller should process the frame and then call update with the
+        returned thumbnail.
+        """
+        if not self.enabled or not stream_key or image is None:
+            return None, None
+
+        thumbnail = self.thumbnail(image)
+
+        with self._lock:
+            entry = self._streams.get(stream_key)
+            if entry is not None:
+                self._streams.move_to_end(stream_key)
+
+        if entry is None:
+            return None, thumbnail
+
+        timestamp, image_size, last_thumbnail, last_response = entry
+        if image_size != image.size:
+            return None, thumbnail
+
+        if self.max_age_secs and time.monotonic() - timestamp > self.max_age_secs:
+            return None, thumbnail
+
+        if self.difference(thumbnail, last_thumbnail) >= self.threshold:
+            return None, thumbnail
+
+        with self._lock:
+            self.frames_reused += 1
+
+        response = dict(last_response)
+        response["reused"] = True
+        if "inferenceMs" in response:
+            response["inferenceMs"] = 0
+        return response, thumbnail
+
+    def update(self, stream_key: str, thumbnail: Image, response: JSON) -> None:
+        """
+        Stores the thumbnail and response of a frame that has just been
+        processed for the given stream
+        """
+        if not self.enabled or not stream_key or thumbnail is None:
+            return
+
+        with self._lock:
+            self.frames_processed += 1
+            self._streams[stream_key] = (time.monotonic(), thumbnail.info.get("source_size"),
+                                         thumbnail, dict(response))
+            self._streams.move_to_end(stream_key)
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+
+    def difference(self, thumbnail: Image, other: Image) -> float:
+        """
+        Returns the fraction of pixels (0 - 1) that differ by more than the
+        pixel tolerance between two thumbnails
+        """
+        if thumbnail.size != other.size:
+            return 1.0
+
+        histogram = ImageChops.difference(thumbnail, other).histogram()
+        changed   = sum(histogram[self.pixel_tolerance:])
+        return changed / (thumbnail.size[0] * thumbnail.size[1])
+
+    def stats(self) -> JSON:
+        """ Returns the frame skipping statistics, suitable for a status report """
+        with self._lock:
+            return {
+                "framesReused":    self.frames_reused,
+                "framesProcessed": self.frames_processed,
+                "streams":         len(self._streams)
+            }
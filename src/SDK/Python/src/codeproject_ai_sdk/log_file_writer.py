@@ -0,0 +1,218 @@
+from datetime import datetime
+import gzip
+import os
+import shutil
+import time
+
+import asyncio
+import aiofiles
+
+
+class LogFileWriter:
+    """
+    Writes log lines to a daily log file. The file is kept open between writes,
+    and lines are buffered and written in one go once the buffer is big enough
+    or the oldest line has waited long enough. Files are rotated at midnight
+    or when they reach max_file_MB, and the oldest log files are removed once
+    all logs together exceed max_total_MB. Rotated files can optionally be
+    gzipped.
+
+    The writer owns its directory's log files: give each process a directory
+    of its own (ModuleLogger uses logs/<module id>), otherwise processes will
+    append to, rotate and remove each other's files. Files in the directory
+    that aren't named like this writer's log files are left alone.
+
+    This is only ever accessed from the logging loop, so no locking is done.
+    """
+
+    def __init__(self, directory: str, buffer_size: int = 64 * 1024,
+                 flush_secs: float = 1.0, max_file_MB: int = 10,
+                 max_total_MB: int = 100, extension: str = ".txt",
+                 compress: bool = False):
+        """
+        Constructor.
+        Param: directory    - the directory in which to store the log files. If
+                              None, lines are discarded
+        Param: buffer_size  - write once this many characters are waiting
+        Param: flush_secs   - ...or once the oldest line is this old
+        Param: max_file_MB  - start a new file once the current is this big
+        Param: max_total_MB - the max size of all log files together
+        Param: extension    - the log file extension, eg ".txt" or ".jsonl"
+        Param: compress     - whether to gzip log files once rotated
+        """
+        self.directory       = directory
+        self.buffer_size     = buffer_size
+        self.flush_secs      = flush_secs
+        self.max_file_bytes  = max_file_MB * 1024 * 1024
+        self.max_total_bytes = max_total_MB * 1024 * 1024
+        self.extension       = extension
+        self.compress        = compress
+
+        self._file           = None
+        self._file_path      = None
+        self._file_date      = None
+        self._file_size      = 0
+
+        self._buffer         = []
+        self._buffer_len     = 0
+        self._buffer_started = None
+
+    def write(self, line: str) -> None:
+        """ Adds a line to the buffer. Call flush (or wait) to write it out """
+        if not self._buffer:
+            self._buffer_started = time.monotonic()
+        self._buffer.append(line)
+        self._buffer_len += len(line)
+
+    def time_until_flush(self) -> float:
+        """
+        Returns the secs until the buffer is due to be written, or None if
+        there's nothing to write
+        """
+        if not self._buffer:
+            return None
+        if self._buffer_len >= self.buffer_size:
+            return 0
+        elapsed = time.monotonic() - self._buffer_started
+        return max(0, self.flush_secs - elapsed)
+
+    def flush_due(self) -> bool:
+        """ Returns True if the buffer should be written now """
+        return self.time_until_flush() == 0
+
+    async def flush(self) -> bool:
+        """
+        Writes everything in the buffer to the current log file.
+        Returns True on success; False otherwise
+        """
+        if not self._buffer:
+            return True
+
+        data = "".join(self._buffer)
+        self._buffer         = []
+        self._buffer_len     = 0
+        self._buffer_started = None
+
+        if not self.directory:
+            return False
+
+        try:
+            await self._open_log_file()
+            await self._file.write(data)
+            await self._file.flush()
+            self._file_size += len(data)
+            return True
+
+        except OSError as os_error:
+            print(f"Unable to store log entry: {os_error.strerror}")
+            await self.close()
+            return False
+
+        except Exception as ex:
+            print(f"Unable to write to the file log: {str(ex)}")
+            await self.close()
+            return False
+
+    async def close(self) -> bool:
+        """
+        Closes the current log file. It will be reopened on the next flush.
+        Returns True if the file was closed cleanly; False otherwise
+        """
+        closed = True
+        if self._file:
+            try:
+                await self._file.close()
+            except Exception:
+                closed = False
+        self._file = None
+        return closed
+
+    async def _open_log_file(self) -> None:
+        """
+        Ensures the correct log file is open, rotating if the day has changed
+        or the current file has reached its max size
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self._file and (today != self._file_date or self._file_size >= self.max_file_bytes):
+            # Only compress a file we've fully written and closed
+            if await self.close() and self.compress:
+                # Off the event loop: this can take a while on a slow SD card
+                await asyncio.get_running_loop().run_in_executor(None, self._compress_file,
+                                                                 self._file_path)
+
+        if self._file:
+            return
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        self._file_path = self._next_file_path(today)
+        self._file_date = today
+        self._file      = await aiofiles.open(self._file_path, 'a')
+        self._file_size = os.path.getsize(self._file_path)
+
+        self._remove_old_logs()
+
+    def _next_file_path(self, date: str) -> str:
+        """
+        Returns the first file for the given date that still has room. The
+        first is log-<date>.txt, subsequent files are log-<date>.<n>.txt
+        (or whatever the extension is). Compressed files are always full.
+        """
+        index = 0
+        while True:
+            filename = f"log-{date}{self.extension}" if index == 0 \
+                       else f"log-{date}.{index}{self.extension}"
+            filepath = os.path.join(self.directory, filename)
+            if not os.path.exists(filepath + ".gz"):
+                if not os.path.exists(filepath) or os.path.getsize(filepath) < self.max_file_bytes:
+                    return filepath
+            index += 1
+
+    def _compress_file(self, filepath: str) -> None:
+        """
+        Gzips a rotated log file, removing the original. Only ever call this for
+        one of this writer's own files, once closed: anyone still appending to
+        it would lose what they write
+        """
+        if self._file and filepath == self._file_path:
+            return
+        if os.path.dirname(filepath) != self.directory or \
+           not os.path.basename(filepath).startswith("log-") or not filepath.endswith(self.extension):
+            return
+
+        try:
+            with open(filepath, "rb") as source, gzip.open(filepath + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(filepath)
+        except OSError as os_error:
+            print(f"Unable to compress log file {filepath}: {os_error.strerror}")
+
+    def _remove_old_logs(self) -> None:
+        """ Removes the oldest log files until all logs fit within max_total_MB """
+        if self.max_total_bytes <= 0:
+            return
+
+        try:
+            logs = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and self._is_log_file(entry.name):
+                    stat = entry.stat()
+                    logs.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_size = sum(size for _, size, _ in logs)
+            for _, size, path in sorted(logs):
+                if total_size <= self.max_total_bytes:
+                    break
+                if path == self._file_path:
+                    continue
+                os.remove(path)
+                total_size -= size
+
+        except OSError as os_error:
+            print(f"Unable to remove old log files: {os_error.strerror}")
+
+    def _is_log_file(self, filename: str) -> bool:
+        """ Returns True if the file is named like one of this writer's logs """
+        return filename.startswith("log-") and \
+               (filename.endswith(self.extension) or filename.endswith(self.extension + ".gz"))
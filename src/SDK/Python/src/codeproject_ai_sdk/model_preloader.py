@@ -0,0 +1,113 @@
+import time
+from threading import Lock, Thread
+from typing import Callable
+
+from .common import JSON
+
+
+class ModelPreloader:
+    """
+    Loads a module's models, and runs a warm-up inference through each, on a
+    background thread when the module starts. Without this a model is loaded
+    on its first request, so the first request after every restart takes
+    seconds (or times out at the client). Loading in the background lets the
+    module start taking requests straight away: requests for a model that's
+    still loading simply wait for it, as they would have anyway.
+
+    The module is 'ready' once every model has been loaded and warmed up (or
+    has failed to load).
+    """
+
+    def __init__(self, load: Callable[[str], bool], warm_up: Callable[[str], bool] = None):
+        """
+        Constructor.
+        Param: load    - function that loads the named model and returns True if
+                         it was loaded
+        Param: warm_up - function that runs an inference through the named
+                         (loaded) model and returns True if it succeeded
+        """
+        self._load       = load
+        self._warm_up    = warm_up
+        self._models     = {}     # name => { "status": ..., "loadMs": ..., "warmUpMs": ... }
+        self._lock       = Lock()
+        self._thread     = None
+        self._start_time = None
+        self._ready_time = None
+
+    def start(self, model_names: "list[str]") -> None:
+        """ Starts loading the given models, in order, on a background thread """
+        model_names = [ name for name in dict.fromkeys(model_names) if name ]
+
+        with self._lock:
+            for name in model_names:
+                self._models[name] = { "status": "pending" }
+            self._start_time = time.perf_counter()
+            self._ready_time = None
+
+        self._thread = Thread(target=self._preload, args=(model_names,),
+                              name="ModelPreloader", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        """ Whether all models have been loaded and warmed up (or failed to) """
+        with self._lock:
+            return all(model["status"] in [ "ready", "failed" ] for model in self._models.values())
+
+    def wait(self, timeout: float = None) -> bool:
+        """ Waits for preloading to complete. Returns whether it did """
+        if self._thread:
+            self._thread.join(timeout)
+        return self.ready
+
+    def stats(self) -> JSON:
+        """ Returns the preload status of each model, suitable for a status report """
+        with self._lock:
+            stats = {
+                "ready":  all(model["status"] in [ "ready", "failed" ] for model in self._models.values()),
+                "models": { name: dict(model) for name, model in self._models.items() }
+            }
+            if self._ready_time is not None:
+                stats["totalMs"] = round((self._ready_time - self._start_time) * 1000)
+            return stats
+
+    def _preload(self, model_names: "list[str]") -> None:
+        for name in model_names:
+            self._update(name, status="loading")
+
+            start_time = time.perf_counter()
+            try:
+                loaded = self._load(name)
+                error  = None if loaded else "Unable to load model"
+            except Exception as ex:
+                loaded = False
+                error  = str(ex)
+            load_ms = round((time.perf_counter() - start_time) * 1000)
+
+            if not loaded:
+                self._update(name, status="failed", loadMs=load_ms, error=error)
+                continue
+            self._update(name, status="warming up", loadMs=load_ms)
+
+            # A failed warm-up still leaves a loaded model, so isn't fatal
+            if self._warm_up:
+                start_time = time.perf_counter()
+                try:
+                    warmed = self._warm_up(name)
+                    error  = None if warmed else "Warm-up inference failed"
+                except Exception as ex:
+                    error  = str(ex)
+                warm_up_ms = round((time.perf_counter() - start_time) * 1000)
+                if error:
+                    self._update(name, warmUpMs=warm_up_ms, warmUpError=error)
+                else:
+                    self._update(name, warmUpMs=warm_up_ms)
+
+            self._update(name, status="ready")
+
+        with self._lock:
+            self._ready_time = time.perf_counter()
+
+    def _update(self, name: str, **values) -> None:
+        with self._lock:
+            self._models[name].update(values)
@@ -1,16 +1,18 @@
 
+from collections import deque
 from datetime import datetime
 from enum import Enum, Flag, unique
+import json
 import os
 import sys
-from threading import Lock
+import threading
+import time
 
 import asyncio
-from asyncio import Queue
 import aiohttp
-import aiofiles
 
 from .common import JSON
+from .log_file_writer import LogFileWriter
 
 
 class LogVerbosity(Enum):
@@ -20,6 +22,23 @@ class LogVerbosity(Enum):
     Info    = "info"   # Useful and interesting information
     Loud    = "loud"   # Everything that can be shown. 
 
+# Log levels in increasing order of importance. Anything not listed is always logged
+_log_level_ranks = {
+    "trace":       0,
+    "debug":       1,
+    "information": 2,
+    "info":        2,
+    "warning":     3,
+    "error":       4,
+    "critical":    5
+}
+
+class LogOverflowPolicy(Enum):
+    """ What to do with new log entries when the logging queue is full """
+    DropOldest = "drop_oldest"  # Make room by dropping the oldest queued entry
+    DropNewest = "drop_newest"  # Drop the new entry
+    Sample     = "sample"       # Keep 1 in every N new entries, dropping the oldest
+
 @unique
 class LogMethod(Flag):
     """ The types of logging that can be done"""
@@ -35,9 +54,27 @@ class LogItem:
         self.method = logMethod
         self.data   = data
 
+
+class _RepeatState:
+    """ Rate limiting state for one distinct log message """
+    __slots__ = ("tokens", "last_seen", "suppressed", "first_suppressed", "log_method", "data")
+
+    def __init__(self, tokens: float, now: float, log_method: LogMethod, data: JSON):
+        self.tokens           = tokens
+        self.last_seen        = now
+        self.suppressed       = 0
+        self.first_suppressed = 0.0
+        self.log_method       = log_method
+        self.data             = data
+
+
 class ModuleLogger():
 
-    def __init__(self, server_port: str, log_dir: str):
+    def __init__(self, server_port: str, log_dir: str,
+                 overflow_policy: LogOverflowPolicy = LogOverflowPolicy.DropOldest,
+                 verbosity: LogVerbosity = LogVerbosity.Quiet,
+                 file_format: str = "text", compress_logs: bool = False,
+                 module_id: str = None):
 
         """
         Constructor
@@ -46,14 +83,80 @@ class ModuleLogger():
         # Hardcoding localhost because the current plans are to never have
         # backend analysis servers NOT on the same machine as the server
         self.base_log_url         = f"http://localhost:{server_port}/v1/log/"
+        self.base_log_batch_url   = f"http://localhost:{server_port}/v1/log/batch"
         self.log_dir              = log_dir
         self.defaultLogging       = LogMethod.File | LogMethod.Info   # Always included
-        self._sync_log_lock       = Lock()
-        self._logging_queue       = Queue(1024)
         self._cancelled           = False
         self._server_healthy      = True # We'll be optimistic to start
         self.logging_loop_started = False
 
+        # Entries below this level are discarded before they're queued. Quiet
+        # means no trace or debug, Info adds debug and Loud adds trace
+        if verbosity == LogVerbosity.Loud:
+            self._min_level_rank  = _log_level_ranks["trace"]
+        elif verbosity == LogVerbosity.Info:
+            self._min_level_rank  = _log_level_ranks["debug"]
+        else:
+            self._min_level_rank  = _log_level_ranks["information"]
+
+        # call site => [calls, time last allowed]. See allow_call_site
+        self._call_sites          = {}
+
+        # Identical entries (eg "can't connect to server" from every polling
+        # task) are rate limited by a token bucket per message. What's
+        # suppressed is reported as a single "repeated N more times" entry.
+        # This is all done in the logging loop as entries are drained, so
+        # logging from any thread stays lock free.
+        self._repeat_burst        = 5     # Identical entries allowed in a burst
+        self._repeat_rate         = 0.2   # ...then this many per sec
+        self._repeat_window_secs  = 10    # Report suppressed repeats this often
+        self._max_repeat_keys     = 1024
+        self._repeats             = {}    # key => RepeatState
+        self._repeats_pending     = False # Are there suppressed repeats to report?
+        self._last_repeat_sweep   = 0.0
+
+        # Entries are logged from the event loop and from executor threads, so
+        # they go into a deque (whose append / popleft are atomic) and the
+        # logging loop is woken via call_soon_threadsafe. The queue size is
+        # checked before appending, so under contention it may briefly go a
+        # few entries over.
+        self._max_queue_size      = 1024
+        self._logging_queue       = deque()
+        self._overflow_policy     = overflow_policy
+        self._overflow_sample     = 10    # For Sample: keep 1 in this many entries
+        self._overflow_lock       = threading.Lock()  # Only taken when the queue is full
+        self._loop                = None
+        self._loop_thread_id      = None
+        self._wakeup              = None  # asyncio.Event, created in the logging loop
+        self._wakeup_pending      = False
+
+        # Entries for the server are sent in batches rather than one POST each
+        self._batch_max_entries   = 50    # Send once the batch has this many entries
+        self._batch_max_wait_secs = 0.5   # ...or once the oldest entry is this old
+        self._server_batch        = []    # Entries waiting to be sent to the server
+        self._server_batch_index  = {}    # (entry, category, label, level) => index in batch
+        self._batch_started       = None  # When the first entry in the batch was added
+        self._batch_supported     = True  # Older servers don't have /v1/log/batch
+
+        # Stats
+        self._dropped_entries     = 0     # Entries lost because the queue was full
+        self._overflow_entries    = 0     # Entries that arrived while the queue was full
+        self._sampled_out_entries = 0     # Entries skipped by call site sampling / rate limits
+        self._suppressed_entries  = 0     # Identical entries suppressed by rate limiting
+        self._merged_entries      = 0     # Duplicate entries merged into a single entry
+        self._server_entries_sent = 0
+
+        # "text" for the traditional log lines, or "json" for one JSON object
+        # per line, which is far cheaper to aggregate and analyse
+        self._json_file_log       = file_format == "json"
+
+        # Each module process gets its own log directory: the server's logs
+        # (and other modules') are written and pruned by their own writers
+        log_name                  = module_id or f"module-{os.getpid()}"
+        self._file_writer         = LogFileWriter(os.path.join(log_dir, 'logs', log_name) if log_dir else None,
+                                                  extension = ".jsonl" if self._json_file_log else ".txt",
+                                                  compress  = compress_logs)
+
 
     async def logging_loop(self):
 
@@ -61,6 +164,10 @@ class ModuleLogger():
         Runs the main logging loop which queries the logging queue and then
         forwards each logging request to the logging methods themselves.
         """
+        self._loop           = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._wakeup         = asyncio.Event()
+
         async with aiohttp.ClientSession() as session:
             self._request_session = session
 
@@ -68,16 +175,54 @@ class ModuleLogger():
                 self.logging_loop_started = True
 
                 try:
-                    log_item: LogItem = await self._logging_queue.get()
-                    await self.do_log(log_item.method, log_item.data)
+                    # If there's a batch waiting to go to the server, or lines
+                    # waiting to go to the log file, then only wait until they
+                    # are due, otherwise wait for the next entry
+                    if not self._logging_queue:
+                        try:
+                            await asyncio.wait_for(self._wakeup.wait(), self._time_until_flush())
+                        except asyncio.TimeoutError:
+                            pass
+
+                    # Clear the wakeup *before* draining so an entry added
+                    # while we drain will always wake us again
+                    self._wakeup.clear()
+                    self._wakeup_pending = False
+
+                    # Don't drain forever: batches and buffers still need to go
+                    for _ in range(self._batch_max_entries):
+                        try:
+                            log_item: LogItem = self._logging_queue.popleft()
+                        except IndexError:
+                            break
+                        data = self._limit_repeats(log_item.method, log_item.data)
+                        if data:
+                            await self.do_log(log_item.method, data)
+
+                    if self._batch_due():
+                        await self._flush_server_batch()
+                    if self._file_writer.flush_due():
+                        await self._file_writer.flush()
+                    if self._repeat_sweep_due():
+                        await self._report_repeats()
+
                 except asyncio.CancelledError:
                     # task was canceled
                     pass
                 except Exception as ex:
                     print(f"Exception while logging: {ex}")
 
+            try:
+                await self._report_repeats(force=True)
+                await self._flush_server_batch()
+                await self._file_writer.flush()
+                await self._file_writer.close()
+            except Exception:
+                pass
+
             self._request_session     = None
             self.logging_loop_started = False
+            self._loop                = None
 
 
     async def log_async (self, logMethod: LogMethod, data: JSON) -> None:
@@ -101,19 +246,19 @@ class ModuleLogger():
         # if not data or not data.get("message", ""):
         #    return
 
+        if not data or not self.is_enabled(data.get("loglevel")):
+            return
+
         # so we have basic logging before main loop starts
         if not self.logging_loop_started:
             try:
-                message = data.get("message", "")
+                message = self._resolve_message(data.get("message", ""))
                 if message and isinstance(message, str):
                     print(message)
             except:
                 pass
         else:
-            try:
-                await self._logging_queue.put(LogItem(logMethod, data))
-            except:
-                print("The logging queue is full: unable to accept any more log entries for now")
+            self._enqueue(LogItem(logMethod, data))
 
 
     def log(self, logMethod: LogMethod, data: JSON) -> None:
@@ -130,26 +275,228 @@ class ModuleLogger():
         # if not data or not data.get("message", ""):
         #     return
 
+        if not data or not self.is_enabled(data.get("loglevel")):
+            return
+
         # so we have basic logging before main loop starts
         if not self.logging_loop_started:
-            message = data.get("message", "")
             try:
+                message = self._resolve_message(data.get("message", ""))
                 if message and isinstance(message, str):
                     print(message)
             except: pass
         else:
-            # Being really paranoid. The documentation suggests the Queue is not
-            # thread safe but it appears to be ok without. Just to be safe ...    
-            with self._sync_log_lock:
-                try:
-                    self._logging_queue.put_nowait(LogItem(logMethod, data))
-                except:
-                    print("The logging queue is full: unable to accept any more log entries for now")
+            # This may well be called from an executor thread, which is fine
+            self._enqueue(LogItem(logMethod, data))
+
+
+    def is_enabled(self, loglevel: str) -> bool:
+        """
+        Returns True if entries of the given level will be logged. Use this to
+        avoid building a log entry that would only be thrown away.
+        """
+        if not loglevel:
+            return True
+        rank = _log_level_ranks.get(loglevel)
+        if rank is None:
+            rank = _log_level_ranks.get(loglevel.lower())
+        return rank is None or rank >= self._min_level_rank
+
+
+    def allow_call_site(self, call_site, every_n: int = 1,
+                        min_interval_secs: float = 0) -> bool:
+        """
+        Returns True if an entry from the given call site should be logged.
+        Param: call_site         - any hashable identifying where the log call
+                                   was made, eg (filename, line number)
+        Param: every_n           - only log 1 in every every_n calls
+        Param: min_interval_secs - log at most once in this many secs
+        This may be called from multiple threads. The odd race will only mean
+        an extra or a missing entry, so no locking is done.
+        """
+        state = self._call_sites.get(call_site)
+        if state is None:
+            state = self._call_sites.setdefault(call_site, [0, 0.0])
+
+        state[0] += 1
+        if every_n > 1 and (state[0] - 1) % every_n != 0:
+            self._sampled_out_entries += 1
+            return False
+
+        if min_interval_secs > 0:
+            now = time.monotonic()
+            if state[1] and now - state[1] < min_interval_secs:
+                self._sampled_out_entries += 1
+                return False
+            state[1] = now
+
+        return True
 
 
     def cancel_logging(self) -> None:
         """ Cancels the main logging loop"""
         self._cancelled = True;
+        self._wake_logging_loop()
+
+
+    def _limit_repeats(self, logMethod: LogMethod, data: JSON) -> JSON:
+        """
+        Applies the per-message token bucket. Returns the entry to log, which
+        may have a note of how many times it was suppressed, or None if this
+        entry should be suppressed. Only called from the logging loop.
+        """
+        message = data.get("message")
+        if not message or not isinstance(message, str):
+            return data     # Lazy messages aren't formatted yet, so can't be compared
+
+        # Per request entries share a message but each is about a different
+        # request, and their timings are the point of logging them
+        if data.get("request_id") or data.get("timings"):
+            return data
+
+        key = (message, data.get("loglevel"), data.get("process"), data.get("exception_type"))
+        now = time.monotonic()
+
+        state = self._repeats.get(key)
+        if state is None:
+            if len(self._repeats) < self._max_repeat_keys:
+                self._repeats[key] = _RepeatState(self._repeat_burst - 1, now, logMethod, data)
+            return data
+
+        state.tokens     = min(self._repeat_burst,
+                               state.tokens + (now - state.last_seen) * self._repeat_rate)
+        state.last_seen  = now
+        state.log_method = logMethod
+        state.data       = data
+
+        if state.tokens < 1:
+            if not state.suppressed:
+                state.first_suppressed = now
+            state.suppressed        += 1
+            self._suppressed_entries += 1
+            self._repeats_pending    = True
+            return None
+
+        state.tokens -= 1
+        if not state.suppressed:
+            return data
+
+        # Let this one through, noting what was suppressed before it
+        repeats          = state.suppressed
+        state.suppressed = 0
+
+        data = dict(data)
+        data["message"] = f"{message} (repeated {repeats} more times)"
+        return data
+
+
+    def _repeat_sweep_due(self) -> bool:
+        """ Returns True if suppressed repeats may be waiting to be reported """
+        return self._repeats_pending and \
+               time.monotonic() - self._last_repeat_sweep >= 1.0
+
+
+    async def _report_repeats(self, force: bool = False) -> None:
+        """
+        Logs a "repeated N more times" entry for each message that has had
+        entries suppressed for longer than the repeat window, and forgets
+        messages that have gone quiet. Called from the logging loop.
+        """
+        now     = time.monotonic()
+        reports = []
+
+        self._last_repeat_sweep = now
+        self._repeats_pending   = False
+        for key, state in list(self._repeats.items()):
+            if state.suppressed:
+                if force or now - state.first_suppressed >= self._repeat_window_secs:
+                    data = dict(state.data)
+                    data["message"] = f"{key[0]} (repeated {state.suppressed} more times)"
+                    reports.append((state.log_method, data))
+                    state.suppressed = 0
+                else:
+                    self._repeats_pending = True
+            elif now - state.last_seen > self._repeat_burst / self._repeat_rate:
+                del self._repeats[key]  # bucket would be full again anyway
+
+        for log_method, data in reports:
+            await self.do_log(log_method, data)
+
+
+    def _print_limited(self, message: str) -> None:
+        """
+        Prints a message to the console, suppressing identical messages in the
+        same way as log entries. Used, from the logging loop, when we can't
+        reach the server.
+        """
+        data = self._limit_repeats(LogMethod.Unknown, { "message": message })
+        if data:
+            print(f"{data['message']}\n")
+
+
+    def _enqueue(self, log_item: LogItem) -> None:
+        """
+        Adds an item to the logging queue and wakes the logging loop. Safe to
+        call from any thread, and never blocks for more than a moment.
+        """
+        if len(self._logging_queue) >= self._max_queue_size:
+            with self._overflow_lock:
+                self._overflow_entries += 1
+                drop_newest = self._overflow_policy == LogOverflowPolicy.DropNewest or \
+                              (self._overflow_policy == LogOverflowPolicy.Sample and \
+                               self._overflow_entries % self._overflow_sample != 0)
+                dropped = drop_newest
+                if not drop_newest:
+                    try:
+                        self._logging_queue.popleft()
+                        dropped = True
+                    except IndexError:
+                        pass    # The logging loop got there first
+
+                if dropped:
+                    self._dropped_entries += 1
+                if dropped and self._dropped_entries == 1:
+                    print("The logging queue is full: log entries are being dropped")
+
+            if drop_newest:
+                return
+
+        self._logging_queue.append(log_item)
+        self._wake_logging_loop()
+
+
+    def _wake_logging_loop(self) -> None:
+        """
+        Wakes the logging loop if it's waiting. Only the first entry added
+        after the loop last woke needs to do this.
+        """
+        if self._wakeup_pending or self._loop is None:
+            return
+
+        self._wakeup_pending = True
+        if threading.get_ident() == self._loop_thread_id:
+            self._wakeup.set()
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass # loop has closed
+
+
+    def stats(self) -> JSON:
+        """ Returns statistics on the logger, suitable for a status report """
+        return {
+            "queueDepth":        len(self._logging_queue),
+            "overflowPolicy":    self._overflow_policy.value,
+            "overflowEntries":   self._overflow_entries,
+            "pendingServerLogs": len(self._server_batch),
+            "serverLogsSent":    self._server_entries_sent,
+            "mergedEntries":     self._merged_entries,
+            "droppedEntries":    self._dropped_entries,
+            "sampledOutEntries": self._sampled_out_entries,
+            "suppressedRepeats": self._suppressed_entries,
+            "serverHealthy":     self._server_healthy
+        }
 
 
     async def do_log(self, logMethod: LogMethod, data: JSON) -> None:
@@ -166,7 +513,9 @@ class ModuleLogger():
               "label": "my label",
               "loglevel": "information", 
               "message": "The message to log",
-              "exception_type": "Exception Type"
+              "exception_type": "Exception Type",
+              "request_id": "the ID of the request being processed",
+              "timings": { "stageMs": 12, ... }
            }
 
         Only "message" is required.
@@ -174,13 +523,15 @@ class ModuleLogger():
 
         entry     = ""
 
-        message   = data.get("message", "")
+        message   = self._resolve_message(data.get("message", ""))
         process   = data.get("process", "")
         label     = data.get("label",   "")
         loglevel  = data.get("loglevel", "information")
-        method    = data.get("method", ""),
-        filename  = data.get("filename", ""),
+        method    = data.get("method", "")
+        filename  = data.get("filename", "")
         exception = data.get("exception_type", "")
+        req_id    = data.get("request_id", "")
+        timings   = data.get("timings")
 
         # checks
         message   = message   if message   and isinstance(message, str)   else ""
@@ -190,6 +541,8 @@ class ModuleLogger():
         method    = method    if method    and isinstance(method, str)    else ""
         filename  = filename  if filename  and isinstance(filename, str)  else ""
         exception = exception if exception and isinstance(exception, str) else ""
+        req_id    = req_id    if req_id    and isinstance(req_id, str)    else ""
+        timings   = timings   if timings   and isinstance(timings, dict)  else None
 
         # if exception == "Exception":
         #    exception = "(General Exception)"
@@ -218,9 +571,11 @@ class ModuleLogger():
         loggingTasks = []
 
         if logMethod & LogMethod.Server or self.defaultLogging & LogMethod.Server:
-            log_task = asyncio.create_task(self._server_log(entry, process, 
-                                                            label, loglevel))
-            loggingTasks.append(log_task)
+            # If the server's healthy this entry only goes to the console and
+            # file if it can't be sent (see _flush_server_batch). Otherwise
+            # it's logged to both now.
+            fallback = (logMethod & ~LogMethod.Server, data) if self._server_healthy else None
+            self._add_to_server_batch(entry, process, label, loglevel, fallback)
 
             # Note that the error may not actually be logged to server. Check 
             # self._server_healthy as well as logged_to_server to be sure.
@@ -257,12 +612,198 @@ class ModuleLogger():
             if no_server_log and (logMethod & LogMethod.File or self.defaultLogging & LogMethod.File):
                 loggingTasks.append( asyncio.create_task(self._file_log(process, method, 
                                                                         filename, message,
-                                                                        exception)) )
+                                                                        exception, loglevel,
+                                                                        label, req_id,
+                                                                        timings)) )
    
         # Wait for all the tasks that have now on the list of logging tasks
         [await task for task in loggingTasks]
 
 
+    def _resolve_message(self, message):
+        """
+        A message may be a callable (eg a lambda) that returns the message, so
+        that formatting is only done if the entry is actually logged. Note that
+        it's called on the logging loop, not at the time log() was called.
+        """
+        if not callable(message):
+            return message
+        try:
+            return message()
+        except Exception as ex:
+            return f"Unable to format log message: {str(ex)}"
+
+
+    def _add_to_server_batch(self, entry : str, category: str, label: str, loglevel: str,
+                             fallback: "tuple[LogMethod, JSON]" = None) -> None:
+        """
+        Adds a log entry to the batch that will next be sent to the server. An
+        entry identical to one already in the batch is merged with it.
+        Param: fallback - the (log method, data) to log locally instead if the
+                          entry can't be sent to the server
+        """
+        key   = (entry, category, label, loglevel)
+        index = self._server_batch_index.get(key)
+        if index is not None:
+            self._server_batch[index]["count"] += 1
+            self._merged_entries += 1
+            return
+
+        if not self._server_batch:
+            self._batch_started = time.monotonic()
+
+        self._server_batch_index[key] = len(self._server_batch)
+        self._server_batch.append({
+           "entry":     entry,
+           "category":  category,
+           "label":     label,
+           "log_level": loglevel,
+           "count":     1,
+           "fallback":  fallback
+        })
+
+
+    def _batch_time_remaining(self) -> float:
+        """
+        Returns the secs until the current server batch is due to be sent, or
+        None if there's nothing waiting to be sent
+        """
+        if not self._server_batch:
+            return None
+        elapsed = time.monotonic() - self._batch_started
+        return max(0, self._batch_max_wait_secs - elapsed)
+
+
+    def _time_until_flush(self) -> float:
+        """
+        Returns the secs until the server batch, the file log buffer or the
+        suppressed repeats are next due to be written, or None if nothing is
+        waiting
+        """
+        repeat_sweep = None
+        if self._repeats_pending:
+            repeat_sweep = max(0, 1.0 - (time.monotonic() - self._last_repeat_sweep))
+
+        timeouts = [ timeout for timeout in (self._batch_time_remaining(),
+                                             self._file_writer.time_until_flush(),
+                                             repeat_sweep)
+                     if timeout is not None ]
+        return min(timeouts) if timeouts else None
+
+
+    def _batch_due(self) -> bool:
+        """ Returns True if the current server batch should be sent now """
+        if not self._server_batch:
+            return False
+        return len(self._server_batch) >= self._batch_max_entries or \
+               time.monotonic() - self._batch_started >= self._batch_max_wait_secs
+
+
+    async def _flush_server_batch(self) -> bool:
+        """
+        Sends all entries in the current batch to the server in a single call.
+        If the server doesn't support batches, each entry is sent separately.
+        Entries that can't be sent are logged to the console and file instead.
+        Returns True on success; False otherwise
+        """
+        if not self._server_batch:
+            return True
+
+        batch = self._server_batch
+        self._server_batch       = []
+        self._server_batch_index = {}
+        self._batch_started      = None
+
+        fallbacks = []
+        for item in batch:
+            fallbacks.append((item.pop("fallback"), item["count"]))
+            if item["count"] > 1:
+                item["entry"] += f" (repeated {item['count']} times)"
+            del item["count"]
+
+        if self._batch_supported:
+            success = await self._server_log_batch(batch)
+            if success:
+                self._server_entries_sent += len(batch)
+            if self._batch_supported:
+                if not success:
+                    await self._log_locally(fallbacks)
+                return success
+
+        # Fallback for servers that predate the batch endpoint
+        success = True
+        for item, fallback in zip(batch, fallbacks):
+            if await self._server_log(item["entry"], item["category"], item["label"], item["log_level"]):
+                self._server_entries_sent += 1
+            else:
+                await self._log_locally([ fallback ])
+                success = False
+        return success
+
+
+    async def _log_locally(self, fallbacks: "list[tuple]") -> None:
+        """
+        Logs entries that couldn't be sent to the server to the console and
+        file instead, so they aren't lost just when the server is in trouble.
+        Param: fallbacks - a list of ((log method, data), count) for each entry
+                           (None if the entry was already logged locally)
+        """
+        for fallback, count in fallbacks:
+            if not fallback:
+                continue
+            log_method, data = fallback
+            if count > 1:
+                data    = dict(data)
+                message = self._resolve_message(data.get("message", ""))
+                data["message"] = f"{message} (repeated {count} times)"
+            await self.do_log(log_method, data)
+
+
+    async def _server_log_batch(self, batch: "list[JSON]") -> bool:
+        """
+        Sends a batch of log entries to the API server in a single call
+        Param: batch - The list of entries, each a dict of entry, category,
+                       label and log_level
+        Returns True on success; False otherwise
+        """
+        payload = { "entries": json.dumps(batch) }
+
+        try:
+            async with self._request_session.post(self.base_log_batch_url, 
+                                                  data = payload,
+                                                  timeout = 1) as resp:
+                if resp.status == 404 or resp.status == 405:
+                    self._batch_supported = False
+                    return False
+                self._server_healthy = resp.status == 200
+
+            return self._server_healthy
+
+        except TimeoutError:
+            self._server_healthy = False
+            return False
+
+        except Exception as ex:
+            exception_type = ex.__class__.__name__
+            if hasattr(ex, "os_error") and isinstance(ex.os_error, ConnectionRefusedError):
+                err_msg              = f"Server connection refused. Is the server running, and can you connect to the server?"
+                self._server_healthy = False
+            elif exception_type == "ClientConnectorError":
+                err_msg              = f"Server connection error. Is the server URL correct?"
+                self._server_healthy = False
+            elif exception_type == "TimeoutError":
+                err_msg              = f"Timeout connecting to the server"
+                self._server_healthy = False
+            elif exception_type == "CancelledError":
+                err_msg        = f"HTTP post to server log API was cancelled"
+            else:
+                err_msg = f"Error posting log batch [{exception_type}]: {str(ex)}"
+
+            self._print_limited(err_msg)
+
+            return False
+
+
     async def _server_log(self, entry : str, category: str, label: str, loglevel: str) -> bool:
 
         """
@@ -312,13 +853,14 @@ class ModuleLogger():
             else:
                 err_msg = f"Error posting log [{exception_type}]: {str(ex)}"
 
-            print(f"{err_msg}\n")
+            self._print_limited(err_msg)
 
             return False
 
 
     async def _file_log(self, process: str, method: str, filename: str, message: str,
-                        exception_type: str) -> bool:
+                        exception_type: str, loglevel: str = "", label: str = "",
+                        request_id: str = "", timings: JSON = None) -> bool:
         """
         Logs an error to a file. In a perfect world we'd send all logs to the default system logger
         and the server would catch these and process them. Or we'd send logs to the server directly
@@ -331,36 +873,39 @@ class ModuleLogger():
         Param: message - The message to log
         Param: exception_type - The exception type if this logging is the result
                                 of an exception
+        Param: loglevel - The log level (only stored in JSON logs)
+        Param: label - The label for the entry (only stored in JSON logs)
+        Param: request_id - The ID of the request being processed (JSON logs)
+        Param: timings - A dict of stage name => ms (JSON logs)
         """
 
-        line = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if len(exception_type) > 0:
-            line += ' [' + exception_type + ']'      
-        line += ': ' + message
-       
-        if len(filename) > 0:
-            line += '(file: ' + filename
-            if len(process) > 0:
-                line += ' in ' + process + "." + method
-            line += ')'
-
-        line += '\n'
-
-        try:
-            directory = self.log_dir + os.sep + 'logs'
-            if not os.path.isdir(directory):
-                os.mkdir(directory)
+        if self._json_file_log:
+            record = { "time": datetime.now().isoformat(timespec="milliseconds") }
+            fields = (("process", process), ("method", method), ("filename", filename),
+                      ("loglevel", loglevel), ("label", label),
+                      ("exception_type", exception_type), ("request_id", request_id),
+                      ("timings", timings), ("message", message))
+            record.update((name, value) for name, value in fields if value)
+            line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
 
-            filepath = directory + os.sep + 'log-' + datetime.now().strftime("%Y-%m-%d") + '.txt'
-            async with aiofiles.open(filepath, 'a') as file_object:
-                await file_object.write(line)
-
-            return True
-
-        except OSError as os_error:
-            print(f"Unable to store log entry: {os_error.strerror}")
-            return False
+        else:
+            line = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if len(exception_type) > 0:
+                line += ' [' + exception_type + ']'      
+            line += ': ' + message
+           
+            if len(filename) > 0:
+                line += '(file: ' + filename
+                if len(process) > 0:
+                    line += ' in ' + process + "." + method
+                line += ')'
+
+            line += '\n'
+
+        # Lines are buffered and written by the logging loop, but exceptions
+        # are written straight away in case the process is about to die
+        self._file_writer.write(line)
+        if len(exception_type) > 0:
+            return await self._file_writer.flush()
 
-        except Exception as ex:
-            print(f"Unable to write to the file log: {str(ex)}")
-            return False
\ No newline at end of file
+        return True
\ No newline at end of file
@@ -2,7 +2,7 @@
 import os
 import sys
 
-from .module_logging import LogVerbosity
+from .module_logging import LogVerbosity, LogOverflowPolicy
 
 def _get_env_var(name: str, default: any = "") -> any:
     value = os.getenv(name, "")
@@ -87,6 +87,21 @@ class ModuleOptions:
     # How much RAM is needed to perform tasks in this module?
     required_MB         = _get_env_var("CPAI_MODULE_REQUIRED_MB", "0");
 
+    # Max number of requests to process at once before we start shedding load.
+    # 0 = Default = parallelism, which never sheds since each of the
+    # 'parallelism' tasks only handles one request at a time
+    max_in_flight       = _get_env_var("CPAI_MODULE_MAX_INFLIGHT", "0");
+
+    # Shed load when available RAM drops below this. 0 = Default = off
+    memory_watermark_MB = _get_env_var("CPAI_MODULE_MEMORY_WATERMARK_MB", "0");
+
+    # Size (MB) of the cache of responses to identical requests, and how long
+    # (secs) a response can be reused for. Only used for commands a module
+    # declares as cacheable, and only if a module opts in by setting a size.
+    # 0 = Default = disabled
+    response_cache_MB   = _get_env_var("CPAI_MODULE_RESPONSE_CACHE_MB",  "0");
+    response_cache_secs = _get_env_var("CPAI_MODULE_RESPONSE_CACHE_TTL", "30");
+
     # Whether to *allow* support for GPU. Doesn't mean it's possibly it can or will
     # support GPU. More often used to disable GPU when a GPU causes problems
     enable_GPU         = _get_env_var("CPAI_MODULE_ENABLE_GPU",   "True")
@@ -102,6 +117,19 @@ class ModuleOptions:
     # Can be Quiet, Info or Loud. Module specific, requires module implementation
     log_verbosity       = _get_env_var("CPAI_LOG_VERBOSITY",      LogVerbosity.Quiet)
 
+    # What to do when log entries arrive faster than they can be written. Can
+    # be drop_oldest, drop_newest or sample
+    log_overflow_policy = _get_env_var("CPAI_LOG_OVERFLOW_POLICY", LogOverflowPolicy.DropOldest)
+
+    # The format of the module's own log files: "text" or "json" (JSON lines),
+    # and whether rotated log files should be gzipped
+    log_file_format     = _get_env_var("CPAI_LOG_FILE_FORMAT",    "text")
+    compress_logs       = _get_env_var("CPAI_LOG_COMPRESS",       "false")
+
+    # Where the results of the (slow) hardware probes are cached. Shared by all
+    # modules. Defaults to the runtimes folder in the server's root
+    hardware_cache_dir  = _get_env_var("CPAI_HARDWARE_CACHE_DIR", None)
+
     # General purpose flags. These aren't currently supported as common flags
     # use_CUDA          = False
     # use_ROCm          = False
@@ -119,7 +147,13 @@ class ModuleOptions:
     launched_by_server  = str(launched_by_server).lower() == "true"
     port                = int(port) if str(port).isnumeric() else 32168
     enable_GPU          = str(enable_GPU).lower() == "true"
+    log_file_format     = "json" if str(log_file_format).lower() in [ "json", "jsonl" ] else "text"
+    compress_logs       = str(compress_logs).lower() == "true"
     required_MB         = int(required_MB) if str(required_MB).isnumeric() else 0
+    max_in_flight       = int(max_in_flight) if str(max_in_flight).isnumeric() else 0
+    memory_watermark_MB = int(memory_watermark_MB) if str(memory_watermark_MB).isnumeric() else 0
+    response_cache_MB   = int(response_cache_MB) if str(response_cache_MB).isnumeric() else 0
+    response_cache_secs = int(response_cache_secs) if str(response_cache_secs).isnumeric() else 0
     parallelism         = int(parallelism) if str(parallelism).isnumeric() else 0
 
     # If a value was found but it was incorrect, ignore it
@@ -133,6 +167,15 @@ class ModuleOptions:
     if not log_verbosity:
         log_verbosity = LogVerbosity.Quiet
 
+    if isinstance(log_overflow_policy, str):
+        try:
+            log_overflow_policy = LogOverflowPolicy(log_overflow_policy.lower())
+        except ValueError:
+            log_overflow_policy = LogOverflowPolicy.DropOldest
+
+    if not hardware_cache_dir and server_root_path:
+        hardware_cache_dir = os.path.join(server_root_path, "runtimes")
+
     if parallelism <= 0:
         if (sys.version_info.major >= 3 and sys.version_info.minor >= 13):
             parallelism = os.process_cpu_count() // 2
@@ -35,6 +35,9 @@ from .system_info    import SystemInfo
 from .module_logging import LogMethod, ModuleLogger, LogVerbosity
 from .request_data   import RequestData
 from .module_options import ModuleOptions
+from .response_cache import ResponseCache
+from .sharded_counters import ShardedCounters
+from .startup_profiler import startup_profiler
 # from utils.environment_check import check_requirements
 
 
@@ -82,7 +85,7 @@ class ModuleRunner:
         """
         Deprecated: this is here purely for backwards compatibility. Added v2.5.5
         """
-        return self.module_status(self)
+        return self.module_status()
     
     def module_status(self) -> JSON:
         """ Overridable:
@@ -110,13 +113,14 @@ class ModuleRunner:
         """ Overridable:
         Called after `process` is called in order to update the stats on the 
         number of successful and failed calls as well as average inference time.
+        Not called for responses marked "reused", which ran no inference.
         """
         if "success" in response and response["success"] == True:
-            self._successful_inferences += 1
+            self._inference_stats.add("successful")
             if "inferenceMs" in response:
-                self._total_inference_time_ms += int(response["inferenceMs"])
+                self._inference_stats.add("totalInferenceMs", int(response["inferenceMs"]))
         else:
-            self._failed_inferences += 1
+            self._inference_stats.add("failed")
 
     def selftest(self) -> JSON:
         """ Overridable:
@@ -139,7 +143,9 @@ class ModuleRunner:
         Constructor. 
         """
 
-        self.system_info = SystemInfo()
+        startup_profiler.mark("Imports")
+
+        self.system_info = SystemInfo(ModuleOptions.hardware_cache_dir)
 
         # Constants ------------------------------------------------------------
 
@@ -148,11 +154,24 @@ class ModuleRunner:
         self._wait_for_command_secs    = 15.0  # Time to wait for a command before cancelling and retrying
         self._response_timeout_secs    = 10    # For sending info to the server
         self._status_sleep_time        = 2.0  # Time to wait between status updates
+        self._status_heartbeat_secs    = 30.0 # Send the full status at least this often
+        self._status_max_dict_items    = 25   # Bigger dicts (eg histograms) are summarised
 
         self._error_pause_secs         = 1.0   # For general errors
         self._conn_error_pause_secs    = 5.0   # for connection / timeout errors
         self._log_timing_events        = True
 
+        # Requests whose deadline has passed are answered with an error rather
+        # than processed, since nobody is waiting for the result.
+        self._drop_expired_requests    = True
+        self._expiry_margin_secs       = 0.05  # Treat as expired if this close to the deadline
+
+        # Admission control. When at capacity we stop polling for new requests,
+        # and any request that does arrive is answered with a "busy" response.
+        self._admission_pause_secs     = 0.1   # Time between capacity checks while not polling
+        self._max_admission_wait_secs  = 5.0   # Poll anyway after this long (and shed if still busy)
+        self._memory_check_secs        = 1.0   # How often to re-check available memory
+
         # Some commands are just annoying in the logs
         self._ignore_timing_commands   = [ 
             "list-custom",
@@ -166,9 +185,24 @@ class ModuleRunner:
         self._current_error_pause_secs = 0
         self._performing_self_test     = False
 
-        self._successful_inferences    = 0
-        self._total_inference_time_ms  = 0
-        self._failed_inferences        = 0
+        # successful, failed, totalInferenceMs. Safe to update from any thread
+        self._inference_stats          = ShardedCounters()
+        self._expired_requests         = 0
+        self._shed_requests            = 0
+        self._in_flight                = 0
+        self._low_memory               = False
+        self._last_memory_check        = 0
+
+        self._coalesced_requests       = 0
+        self._shared_requests          = {}    # fingerprint => Future holding the shared response
+
+        self._status_dirty             = True  # Has anything happened that may change the status?
+        self._last_status_sent         = None  # key => JSON of each status property last sent
+        self._last_full_status_time    = 0
+        self._status_deltas_supported  = True
+
+        self._response_cache           = ResponseCache(ModuleOptions.response_cache_MB * 1024 * 1024,
+                                                       ModuleOptions.response_cache_secs)
 
         # Public fields --------------------------------------------------------
 
@@ -199,12 +233,24 @@ class ModuleRunner:
         self.launched_by_server  = ModuleOptions.launched_by_server    # Was this module launched by the server (or launched separately?)
         self.selftest_check_pkgs = True
 
+        # Commands whose responses can be reused for an identical request (same
+        # image, command and values). Modules opt in by adding commands here
+        self.cacheable_commands   = []
+        self.cache_ignored_values = [ "timeout_ms" ]                   # Values that don't affect the result
+
         # Hardware / accelerator info
         self.required_MB         = int(ModuleOptions.required_MB or 0) # Min RAM needed to launch this module
         self.accel_device_name   = ModuleOptions.accel_device_name     # eg CUDA:0, usb:0. Module/library specific
         self.parallelism         = ModuleOptions.parallelism           # Number of parallel instances launched at runtime
         self.enable_GPU          = ModuleOptions.enable_GPU            # Whether to use GPU support if available
 
+        # Load shedding limits. Each main_loop task works on one request at a
+        # time, so the default max_in_flight (parallelism) never sheds by
+        # itself: set CPAI_MODULE_MAX_INFLIGHT below parallelism to shed load
+        # rather than queue it.
+        self.max_in_flight       = max(1, ModuleOptions.max_in_flight or self.parallelism)   # Max requests processed at once
+        self.memory_watermark_MB = ModuleOptions.memory_watermark_MB    # Shed load if free RAM drops below this. 0 = off
+
         self.inference_device    = "CPU"                               # The processor type reported as being used (CPU, GPU, TPU etc)
         self.inference_library   = ""                                  # The inference library in use (CUDA, Tensorflow, DirectML, Paddle)
         self.can_use_GPU         = False                               # Whether this module can support the current hardware
@@ -243,6 +289,8 @@ class ModuleRunner:
         if self.enable_GPU and self.system_info.hasTorchMPS:
             os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
 
+        startup_profiler.mark("ModuleRunner setup (hardware probes)")
+
 
     def start_loop(self) -> None:
         """
@@ -265,12 +313,19 @@ class ModuleRunner:
         # *end* of their __init__ call, rather than at the start, and that's
         # just fragile.
 
+        startup_profiler.mark("Module constructor")
+
         if len(sys.argv) > 1 and sys.argv[1] == "--selftest":
             
             if self.log_verbosity == LogVerbosity.Loud:
                 print(f"{self.module_id} self-test called")
 
-            self._logger = ModuleLogger(self.port, self.server_root_path)
+            self._logger = ModuleLogger(self.port, self.server_root_path,
+                                        ModuleOptions.log_overflow_policy,
+                                        self.log_verbosity,
+                                        ModuleOptions.log_file_format,
+                                        ModuleOptions.compress_logs,
+                                        self.module_id)
             self._performing_self_test = True
             
             # We allow 'initialize' and 'initialise'. Find which was overridden
@@ -279,6 +334,10 @@ class ModuleRunner:
             else:
                 self.initialize()
 
+            if startup_profiler.enabled:
+                startup_profiler.mark("Module initialise")
+                print(startup_profiler.report(probe_timings=self.system_info.probe_timings))
+
             if self.selftest_check_pkgs:
                 self.check_packages()
             result = self.selftest()
@@ -366,7 +425,12 @@ class ModuleRunner:
                 print(f"{self.module_id} starting logging_loop")
 
             # Start with just running one logging loop
-            self._logger = ModuleLogger(self.port, self.server_root_path)
+            self._logger = ModuleLogger(self.port, self.server_root_path,
+                                        ModuleOptions.log_overflow_policy,
+                                        self.log_verbosity,
+                                        ModuleOptions.log_file_format,
+                                        ModuleOptions.compress_logs,
+                                        self.module_id)
 
             self._logger.log(LogMethod.Info | LogMethod.Server,
             { 
@@ -400,6 +464,10 @@ class ModuleRunner:
                 await init_task
             except Exception as ex:
                 print(f"An exception occurred initialising the module: {str(ex)}")    
+
+            if startup_profiler.enabled:
+                startup_profiler.mark("Module initialise")
+                print(startup_profiler.report(probe_timings=self.system_info.probe_timings))
                 
             if self.log_verbosity == LogVerbosity.Loud:
                 print(f"{self.module_id} module init complete")
@@ -450,21 +518,99 @@ class ModuleRunner:
             
         self.status_loop_started = True
         while not self._cancelled:
-            
-            status_object = self._get_module_status()
-            statusData = { "statusData": json.dumps(status_object) }
 
-            try:
-                await self.call_api(f"queue/updatemodulestatus/{self.module_id}",
-                                    None, statusData)
-            except Exception as ex:
-                print(f"An exception occurred updating the module status: {str(ex)}")    
+            # Status only really changes when requests are processed, so only
+            # rebuild it then, or when it's time for a heartbeat. Otherwise
+            # only send what has changed since last time.
+            heartbeat_due = time.monotonic() - self._last_full_status_time >= self._status_heartbeat_secs
+            if self._status_dirty or heartbeat_due:
+                self._status_dirty = False
+                try:
+                    status_object = self._summarise_status(self._get_module_status())
+                    await self._send_status(status_object, heartbeat_due)
+                except Exception as ex:
+                    print(f"An exception occurred updating the module status: {str(ex)}")    
             
             await asyncio.sleep(self._status_sleep_time)
                 
         self.status_loop_started = False
 
 
+    def _summarise_status(self, status: JSON) -> JSON:
+        """
+        Replaces any large dict of counts in the status (eg a histogram of
+        every label ever detected) with the top counts plus a total for the
+        rest, so the status stays a sensible size
+        """
+        max_items = self._status_max_dict_items
+        for key, value in status.items():
+            if isinstance(value, dict) and len(value) > max_items and \
+               all(isinstance(count, (int, float)) for count in value.values()):
+                counts  = sorted(value.items(), key=lambda item: item[1], reverse=True)
+                summary = dict(counts[:max_items - 1])
+                summary["(other)"] = sum(count for _, count in counts[max_items - 1:])
+                status[key] = summary
+        return status
+
+
+    async def _send_status(self, status: JSON, full: bool) -> None:
+        """
+        Sends the status to the server. The full status is sent if requested,
+        or the first time, otherwise only the top level properties that have
+        changed since the last update are sent (removed properties as null).
+        If a partial update fails the full status is sent instead, and partial
+        updates carry on. This includes 409, which the server returns when it
+        has no full status to apply a partial update to (eg it restarted).
+        Servers that don't understand partial updates (400 or 405, or 404 when
+        a full update then works) are only ever sent the full status.
+        """
+        encoded = { key: json.dumps(value, sort_keys=True, default=str)
+                    for key, value in status.items() }
+
+        delta_not_found = False
+        if not full and self._last_status_sent is not None and self._status_deltas_supported:
+            delta = { key: status[key] for key, value in encoded.items()
+                      if self._last_status_sent.get(key) != value }
+            delta.update({ key: None for key in self._last_status_sent if key not in encoded })
+            if not delta:
+                return
+
+            status_code = await self._post_status({ "statusDelta": json.dumps(delta, default=str) })
+            if status_code == 200:
+                self._last_status_sent = encoded
+                return
+
+            # Any other failure (a timeout, a 409 after a server restart) just
+            # means we resync with a full update below and carry on with
+            # partial ones
+            if status_code in [ 400, 405 ]:
+                self._status_deltas_supported = False
+            delta_not_found = status_code == 404
+
+        if await self._post_status({ "statusData": json.dumps(status, default=str) }) == 200:
+            # A 404 for a partial update but not a full one: the server doesn't
+            # know about partial updates. (It's a 404 for both if the server
+            # doesn't know this module yet)
+            if delta_not_found:
+                self._status_deltas_supported = False
+            self._last_status_sent      = encoded
+            self._last_full_status_time = time.monotonic()
+
+
+    async def _post_status(self, payload: JSON) -> int:
+        """
+        Posts a status update to the server. Returns the HTTP status code, or
+        None if the server couldn't be reached
+        """
+        url = self.base_api_url + f"queue/updatemodulestatus/{self.module_id}"
+        try:
+            async with self._request_session.post(url, data = payload,
+                                                  timeout = self._response_timeout_secs) as resp:
+                return resp.status
+        except Exception:
+            return None
+
+
     # Main loop
     async def main_loop(self, task_id) -> None:
         """
@@ -553,7 +699,53 @@ class ModuleRunner:
                     if command in self._ignore_timing_commands:
                         update_statistics = False
 
+                # Don't waste time decoding and running inference on a request
+                # whose caller has already timed out. Just fail it, fast.
+                if method_to_call == self.process and self._drop_expired_requests and \
+                   data.is_expired(self._expiry_margin_secs):
+                    update_statistics = False
+                    method_to_call    = self._expired_request
+
+                # If we've recently answered this exact same request, and the
+                # module says that's OK, reuse that answer. No decode, no inference
+                cache_key       = None
+                cached_response = None
+                if method_to_call == self.process and data.command in self.cacheable_commands:
+                    cache_key = data.fingerprint(self.cache_ignored_values)
+                    if self._response_cache.enabled:
+                        cached_response = self._response_cache.get(cache_key)
+                    if cached_response is not None:
+                        update_statistics = False
+                        method_to_call    = None
+
+                # If this exact same request is being processed by another task
+                # right now, wait for that result rather than doing it all again
+                shared_response = None
+                if method_to_call == self.process and cache_key:
+                    shared_response = self._shared_requests.get(cache_key)
+                    if shared_response is not None:
+                        update_statistics = False
+                        method_to_call    = None
+                        self._coalesced_requests += 1
+
+                # If we're at capacity then say so quickly, rather than making
+                # the caller wait for a timeout
+                if method_to_call == self.process and self._at_capacity():
+                    update_statistics = False
+                    method_to_call    = self._busy_request
+
+                # We're doing the work, so let identical requests wait on us
+                shared_future = None
+                if method_to_call == self.process and cache_key:
+                    shared_future = asyncio.get_running_loop().create_future()
+                    self._shared_requests[cache_key] = shared_future
+
+                counts_in_flight = method_to_call == self.process
+
                 output: JSON = {}
+                if counts_in_flight:
+                    self._in_flight += 1
+                process_start = time.perf_counter()
                 try:
                     # Overriding issue here: We need to await self.process in the
                     # asyncio loop. This means we can't just 'await self.process'
@@ -561,25 +753,33 @@ class ModuleRunner:
                     if self.log_verbosity == LogVerbosity.Loud:
                         print(f"{self.module_id} calling process with '{command}' for task {task_id}")
 
-                    if asyncio.iscoroutinefunction(method_to_call):
-                        # if process is async, then it's a coroutine. In this
-                        # case we create an awaitable asyncio task to execute
-                        # this method.
-                        callbacktask = asyncio.create_task(method_to_call(data))
+                    if cached_response is not None:
+                        output = cached_response
+                    elif shared_response is not None:
+                        # Shield the shared future so cancelling this task doesn't
+                        # cancel it for the task doing the work.
+                        output = dict(await asyncio.shield(shared_response))
                     else:
-                        # If the method is not async, then we wrap it in an
-                        # awaitable method which we will await.
-                        loop = asyncio.get_running_loop()
-                        callbacktask = loop.run_in_executor(None, method_to_call, data)
+                        if asyncio.iscoroutinefunction(method_to_call):
+                            # if process is async, then it's a coroutine. In this
+                            # case we create an awaitable asyncio task to execute
+                            # this method.
+                            callbacktask = asyncio.create_task(method_to_call(data))
+                        else:
+                            # If the method is not async, then we wrap it in an
+                            # awaitable method which we will await.
+                            loop = asyncio.get_running_loop()
+                            callbacktask = loop.run_in_executor(None, method_to_call, data)
 
-                    # Await 
-                    output = await callbacktask
+                        # Await 
+                        output = await callbacktask
 
                     # if a coroutine was returned then this is a "long process"
                     # call. We'll run the coroutine (the long process) in the
                     # background and return a message to the server. Only one
                     # long running command can be in progress at a time
-                    if asyncio.iscoroutinefunction(output) or callable(output):
+                    long_process = asyncio.iscoroutinefunction(output) or callable(output)
+                    if long_process:
                         
                         if self.long_running_command_task and not self.long_running_command_task.done():
                             output = {
@@ -614,7 +814,16 @@ class ModuleRunner:
                                 "commandStatus": "running"
                             }
 
-                    if update_statistics:
+                    # Store a copy before the envelope (requestId etc) is added.
+                    # Only final results: a long process's "running" message
+                    # isn't an answer to the request
+                    if cache_key and cached_response is None and not long_process and \
+                       isinstance(output, dict) and output.get("success"):
+                        self._response_cache.put(cache_key, output)
+
+                    # A response reused from a previous, unchanged frame (see
+                    # FrameSkipper) ran no inference, so it's counted there only
+                    if update_statistics and not (isinstance(output, dict) and output.get("reused")):
                         self.update_statistics(output)
 
                     if self.log_verbosity == LogVerbosity.Loud:
@@ -642,6 +851,20 @@ class ModuleRunner:
                     })
 
                 finally:
+                    if counts_in_flight:
+                        self._in_flight -= 1
+                    self._status_dirty = True
+
+                    # Hand a copy of our result to anyone waiting on this request
+                    if shared_future is not None:
+                        del self._shared_requests[cache_key]
+                        if not shared_future.done():
+                            shared_future.set_result(dict(output))
+
+                    if data.command not in self._ignore_timing_commands and \
+                       self.is_log_enabled("trace"):
+                        await self._log_request_timings(data, output, process_start)
+
                     try:
                         if send_response_task != None:
                             if self.log_verbosity == LogVerbosity.Loud:
@@ -677,6 +900,99 @@ class ModuleRunner:
             print(f"{self.module_id} task {task_id} complete.")
 
 
+    async def _log_request_timings(self, data: RequestData, output: JSON,
+                                   process_start: float) -> None:
+        """
+        Logs how long each stage of a request took, tagged with the request ID
+        so it can be matched up with the server's logs
+        """
+        timings = {}
+        if data.request_time:
+            timings["queueMs"] = int((time.time() - data.request_time) * 1000)
+        timings["handlerMs"] = int((time.perf_counter() - process_start) * 1000)
+        if isinstance(output, dict):
+            # As reported by the module itself
+            for stage in ("processMs", "inferenceMs"):
+                if stage in output:
+                    timings[stage] = output[stage]
+
+        await self.log_async(LogMethod.File, {
+            "filename":   __file__,
+            "method":     "main_loop",
+            "loglevel":   "trace",
+            "request_id": data.request_id or "",
+            "timings":    timings,
+            "message":    f"Completed {data.command} (success: {output.get('success') if isinstance(output, dict) else False})"
+        })
+
+
+    async def _expired_request(self, data: RequestData) -> JSON:
+        """
+        Called in place of process for a request whose deadline has already
+        passed.
+        """
+        self._expired_requests += 1
+
+        if self.log_verbosity == LogVerbosity.Loud:
+            print(f"{self.module_id} dropping expired request {data.command} (#reqid {data.request_id})")
+
+        return {
+            "success": False,
+            "error":   f"The request expired before it could be processed (#reqid {data.request_id})"
+        }
+
+
+    async def _busy_request(self, data: RequestData) -> JSON:
+        """
+        Called in place of process for a request that arrived while this module
+        was at capacity (too many requests in flight, or too little memory).
+        """
+        self._shed_requests += 1
+
+        reason         = "low on memory" if self._low_memory else "at capacity"
+        inference_stats = self._inference_stats.snapshot()
+        successful      = inference_stats.get("successful", 0)
+        retry_after_ms  = int(inference_stats.get("totalInferenceMs", 0) / successful) \
+                          if successful else 500
+        if self._low_memory:
+            retry_after_ms = max(retry_after_ms, int(self._memory_check_secs * 1000))
+
+        if self.log_verbosity == LogVerbosity.Loud:
+            print(f"{self.module_id} is {reason}. Shedding request {data.command} (#reqid {data.request_id})")
+
+        return {
+            "success":      False,
+            "busy":         True,
+            "error":        f"The module is {reason}. Please retry shortly (#reqid {data.request_id})",
+            "retryAfterMs": max(retry_after_ms, 1)
+        }
+
+
+    def _at_capacity(self) -> bool:
+        """
+        Returns True if this module shouldn't take on any more requests right
+        now, either because too many are in flight or memory is running low.
+        """
+        return self._in_flight >= self.max_in_flight or self._low_on_memory()
+
+
+    def _low_on_memory(self) -> bool:
+        """
+        Returns True if available memory is below the watermark. The actual
+        check is only done every _memory_check_secs.
+        """
+        if not self.memory_watermark_MB:
+            return False
+
+        now = time.perf_counter()
+        if now - self._last_memory_check >= self._memory_check_secs:
+            self._last_memory_check = now
+            available_MB     = self.system_info.available_memory_MB
+            self._low_memory = available_MB is not None and available_MB < self.memory_watermark_MB
+
+        return self._low_memory
+
+
     def _get_command_status(self, data: RequestData) -> JSON:
         """
         Called when this module has been asked to provide the response to a long
@@ -769,22 +1085,43 @@ class ModuleRunner:
         """
         Called when this module has been asked to provide its overall status
         """
-        status = self.module_status()
+        # Older modules override the deprecated 'status' rather than 'module_status'
+        if self.module_status.__qualname__ == "ModuleRunner.module_status" and \
+           self.status.__qualname__ != "ModuleRunner.status":
+            status = self.status()
+        else:
+            status = self.module_status()
         if status is None:
             status = {}
-            
+
+        inference_stats = self._inference_stats.snapshot()
+        successful      = inference_stats.get("successful", 0)
+        failed          = inference_stats.get("failed", 0)
+
         status.update({
             "inferenceDevice"      : self.inference_device,
             "inferenceLibrary"     : self.inference_library,
             "canUseGPU"            : str(self.can_use_GPU).lower(),
 
-            "successfulInferences" : self._successful_inferences,
-            "failedInferences"     : self._failed_inferences,
-            "numInferences"        : self._successful_inferences + self._failed_inferences,
-            "averageInferenceMs"   : 0 if not self._successful_inferences 
-                                     else self._total_inference_time_ms / self._successful_inferences,
+            "successfulInferences" : successful,
+            "failedInferences"     : failed,
+            "numInferences"        : successful + failed,
+            "averageInferenceMs"   : 0 if not successful 
+                                     else inference_stats.get("totalInferenceMs", 0) / successful,
+            "expiredRequests"      : self._expired_requests,
+            "shedRequests"         : self._shed_requests,
+            "inFlightRequests"     : self._in_flight,
+            "coalescedRequests"    : self._coalesced_requests,
         })
 
+        if self.cacheable_commands and self._response_cache.enabled:
+            status["responseCache"] = self._response_cache.stats()
+
+        if self._logger:
+            status["logging"] = self._logger.stats()
+
+        status["hardwareProbes"] = self.system_info.probe_timings
+
         # HACK: For old modules. Remove server version 2.6
         if hasattr(self, "execution_provider"):
             if self.execution_provider == "CPU":
@@ -905,19 +1242,57 @@ class ModuleRunner:
 
     # Service Commands and Responses ==========================================
 
-    async def log_async(self, log_method: LogMethod, data: JSON) -> None:
+    def is_log_enabled(self, loglevel: str) -> bool:
+        """
+        Returns True if log entries of the given level ("trace", "debug",
+        "information" etc) will actually be logged. Check this before building
+        an expensive log entry.
+        """
+        return self._logger is not None and self._logger.is_enabled(loglevel)
+
+    async def log_async(self, log_method: LogMethod, data: JSON, every_n: int = 1,
+                        min_interval_secs: float = 0) -> None:
+        """
+        Logs an entry. data["message"] can be a callable returning the message,
+        in which case it's only called if the entry is logged. every_n and
+        min_interval_secs limit how often entries from this call site are logged
+        """
         if not data or not self._logger:
             return
 
+        if not self._logger.is_enabled(data.get("loglevel")):
+            return
+
+        if every_n > 1 or min_interval_secs > 0:
+            caller = sys._getframe(1)
+            if not self._logger.allow_call_site((caller.f_code.co_filename, caller.f_lineno),
+                                                every_n, min_interval_secs):
+                return
+
         if not data.get("process"):
             data["process"] = self.module_name 
                             
         await self._logger.log_async(log_method, data)
 
-    def log(self, log_method: LogMethod, data: JSON) -> None:
+    def log(self, log_method: LogMethod, data: JSON, every_n: int = 1,
+            min_interval_secs: float = 0) -> None:
+        """
+        Logs an entry. data["message"] can be a callable returning the message,
+        in which case it's only called if the entry is logged. every_n and
+        min_interval_secs limit how often entries from this call site are logged
+        """
         if not data or not self._logger:
             return
 
+        if not self._logger.is_enabled(data.get("loglevel")):
+            return
+
+        if every_n > 1 or min_interval_secs > 0:
+            caller = sys._getframe(1)
+            if not self._logger.allow_call_site((caller.f_code.co_filename, caller.f_lineno),
+                                                every_n, min_interval_secs):
+                return
+
         if not data.get("process"):
             data["process"] = self.module_name 
 
@@ -950,6 +1325,14 @@ class ModuleRunner:
         if self.log_verbosity == LogVerbosity.Loud:
             print(f"{self.module_id} in get_command for task {task_id}")
 
+        # While we're at capacity, leave requests in the server's queue rather
+        # than pulling them here only to have them wait
+        waited_secs = 0
+        while not self._cancelled and self._at_capacity() and \
+              waited_secs < self._max_admission_wait_secs:
+            await asyncio.sleep(self._admission_pause_secs)
+            waited_secs += self._admission_pause_secs
+
         if not self._request_session or self._request_session.closed:
             await self.log_async(LogMethod.Error, {
                 "message": f"No open session available for {self.module_id} to connect to the server.",
@@ -986,7 +1369,8 @@ class ModuleRunner:
 
                         data = RequestData(content)
                         # HACK: logging this command is just annoying to everyone concerned.                        
-                        if data.command not in self._ignore_timing_commands:
+                        if data.command not in self._ignore_timing_commands and \
+                           self.is_log_enabled("debug"):
                             await self.log_async(LogMethod.Info|LogMethod.Server, {
                                 "message": f"Retrieved {self.queue_name} command '{data.command}'",
                                 "loglevel": "debug"
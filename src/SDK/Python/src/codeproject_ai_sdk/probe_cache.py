@@ -0,0 +1,319 @@
+
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+
+class ProbeCache:
+    """
+    An on-disk cache of the results of the (slow) hardware and library probes
+    made by SystemInfo: spawning rocminfo, importing PyTorch to ask about CUDA,
+    querying the CPU etc. Each module process would otherwise repeat these
+    every time it starts.
+
+    Results are keyed by a fingerprint of the hardware (including which GPUs
+    are installed), OS, Python interpreter, the environment variables that
+    select devices, and the versions of the packages that are probed, so a
+    cached result is ignored as soon as any of those change. Negative results
+    (no GPU found, say) are only kept for a short while, since a driver or
+    runtime being installed doesn't always change the fingerprint. The file is shared by all modules,
+    each of which will generally have its own fingerprint (different venvs,
+    different packages), so it holds an entry per fingerprint.
+
+    The fingerprint is built only from things that are cheap to read: no
+    subprocesses, and no importing of the packages being probed.
+    """
+
+    file_name        = "hardware_probes.json"
+    format_version   = 2
+    max_entries      = 32                 # Fingerprints kept in the file
+    max_age_secs     = 7 * 24 * 3600      # Re-probe weekly anyway, to be safe
+    negative_max_age_secs = 5 * 60        # Long enough to cover all modules starting
+
+    # Environment variables that change which devices, drivers or runtimes the
+    # probes see
+    probed_env_vars  = [ "CUDA_VISIBLE_DEVICES", "CUDA_DEVICE_ORDER", "CUDA_PATH",
+                         "NVIDIA_VISIBLE_DEVICES", "HIP_VISIBLE_DEVICES", "ROCR_VISIBLE_DEVICES",
+                         "GPU_DEVICE_ORDINAL", "HSA_OVERRIDE_GFX_VERSION", "ROCM_PATH",
+                         "INTEL_OPENVINO_DIR", "PATH", "LD_LIBRARY_PATH", "DYLD_LIBRARY_PATH" ]
+
+    # Distribution names (lower case, with '-' as '_') of the packages whose
+    # version affects what the probes return
+    probed_packages  = [ "torch", "torch_directml", "tensorflow", "tensorflow_gpu",
+                         "onnxruntime", "onnxruntime_gpu", "onnxruntime_directml",
+                         "openvino", "paddlepaddle", "paddlepaddle_gpu", "pycoral",
+                         "tflite_runtime", "fastdeploy", "fastdeploy_python", "py_cpuinfo" ]
+
+    def __init__(self, cache_dir: str = None):
+        """
+        Constructor.
+        Param: cache_dir - the folder holding the cache file. If None, the
+                           system temp folder is used
+        """
+        if not cache_dir:
+            cache_dir = os.path.join(tempfile.gettempdir(), "CodeProject.AI")
+
+        self.file_path    = os.path.join(cache_dir, self.file_name)
+        self.fingerprint  = None
+        self._probes      = {}     # name => { "value": ..., "ms": ... } for our fingerprint
+        self._loaded      = False
+
+    def get(self, name: str) -> "tuple[bool, any, float]":
+        """
+        Returns a tuple of (found, value, ms) for the given probe, where ms is
+        how long the probe originally took
+        """
+        self._load()
+        entry = self._probes.get(name)
+        if entry is None:
+            return False, None, 0
+        if "max_age" in entry and time.time() - entry.get("created", 0) >= entry["max_age"]:
+            return False, None, 0
+        return True, entry.get("value"), entry.get("ms", 0)
+
+    def put(self, name: str, value: any, ms: float, max_age_secs: float = None) -> None:
+        """
+        Stores the result of a probe, and how long it took, and saves the cache
+        Param: max_age_secs - how long this result is good for, if less than
+                              the lifetime of the whole cache entry
+        """
+        self._load()
+        probe = { "value": value, "ms": round(ms, 1), "created": time.time() }
+        if max_age_secs is not None:
+            probe["max_age"] = max_age_secs
+        self._probes[name] = probe
+        self._save()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+
+        self.fingerprint = self._make_fingerprint()
+        entry = self._read_file().get(self.fingerprint)
+        if entry and time.time() - entry.get("created", 0) < self.max_age_secs:
+            self._probes = dict(entry.get("probes", {}))
+
+    def _save(self) -> None:
+        """
+        Merges our probes into the file. Other modules may be writing this file
+        at the same time, so we re-read it just before writing, and write via
+        a temp file so no one ever reads a half written file. At worst two
+        modules starting at the same instant lose one of their updates, which
+        only means a probe is run again next time.
+        """
+        try:
+            entries = self._read_file()
+            now     = time.time()
+
+            entry   = entries.get(self.fingerprint)
+            if not entry or now - entry.get("created", 0) >= self.max_age_secs:
+                entry = { "created": now, "probes": {} }
+            entry["probes"].update(self._probes)
+            entry["updated"] = now
+            entries[self.fingerprint] = entry
+
+            if len(entries) > self.max_entries:
+                newest  = sorted(entries.items(), key=lambda item: item[1].get("updated", 0),
+                                 reverse=True)
+                entries = dict(newest[:self.max_entries])
+
+            directory = os.path.dirname(self.file_path)
+            os.makedirs(directory, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=directory, prefix=self.file_name, suffix=".tmp")
+            try:
+                with os.fdopen(handle, "w") as file:
+                    json.dump({ "version": self.format_version, "entries": entries }, file)
+                os.replace(temp_path, self.file_path)
+            except:
+                os.remove(temp_path)
+                raise
+
+        except Exception:
+            pass    # Not being able to cache is no reason to fail
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.file_path, "r") as file:
+                contents = json.load(file)
+            if contents.get("version") == self.format_version:
+                return contents.get("entries", {})
+        except Exception:
+            pass
+        return {}
+
+    def _make_fingerprint(self) -> str:
+        """
+        Returns a hash of everything that, if changed, could change the result
+        of a probe
+        """
+        system_name = platform.system()
+        uname       = platform.uname()
+
+        parts = [
+            str(self.format_version),
+            uname.system, uname.node, uname.release, uname.version, uname.machine,
+            sys.executable, sys.version,
+            str(os.cpu_count())
+        ]
+        parts += [ f"{name}={os.environ.get(name, '')}" for name in self.probed_env_vars ]
+        parts += self._package_versions()
+
+        if system_name == "Linux":
+            parts.append(self._read_cpuinfo())
+            for path in [ "/sys/firmware/devicetree/base/model", "/proc/device-tree/model",
+                          "/proc/driver/nvidia/version" ]:
+                parts.append(self._read_text(path))
+
+            # GPU, NPU and TPU device nodes (NVIDIA, AMD ROCm, PCIe Coral,
+            # Rockchip, WSL's GPU passthrough)
+            try:
+                parts += sorted(name for name in os.listdir("/dev")
+                                if name.startswith(("nvidia", "kfd", "apex", "rknpu", "dri", "dxg")))
+            except Exception:
+                pass
+
+            # Which GPUs are installed, so swapping a card (eg for one that can
+            # or can't do half precision) is noticed. Under WSL the GPUs aren't
+            # on the PCI bus, but the driver the Windows host provides is here
+            parts += self._pci_gpu_ids()
+            parts.append(self._file_signature("/usr/lib/wsl/lib/libcuda.so"))
+            try:
+                for gpu in sorted(os.listdir("/proc/driver/nvidia/gpus")):
+                    parts.append(self._read_text(os.path.join("/proc/driver/nvidia/gpus", gpu,
+                                                              "information")))
+            except Exception:
+                pass
+
+            # USB devices, so we notice a Coral USB stick being plugged in
+            parts += self._usb_device_ids()
+
+        elif system_name == "Windows":
+            # Driver updates replace these
+            system32 = os.path.join(os.environ.get("SystemRoot", "C:\\Windows"), "System32")
+            for dll in [ "nvcuda.dll", "amdhip64.dll", "DirectML.dll", "edgetpu.dll" ]:
+                parts.append(self._file_signature(os.path.join(system32, dll)))
+            parts += self._windows_display_adapters()
+
+        elif system_name == "Darwin":
+            parts.append(platform.mac_ver()[0])
+
+        return hashlib.sha1("\n".join(parts).encode("utf-8", "replace")).hexdigest()
+
+    def _package_versions(self) -> "list[str]":
+        """
+        Returns the names of the dist-info folders (which include the version)
+        of the probed packages found on sys.path. Listing a folder is far
+        cheaper than asking importlib.metadata for each package.
+        """
+        found = []
+        for path in sys.path:
+            if not path or not os.path.isdir(path):
+                continue
+            try:
+                names = os.listdir(path)
+            except Exception:
+                continue
+
+            for name in names:
+                if not name.endswith((".dist-info", ".egg-info")):
+                    continue
+                package = name.split("-", 1)[0].lower().replace("-", "_").replace(".", "_")
+                if package in self.probed_packages:
+                    found.append(os.path.join(path, name))
+
+        return sorted(found)
+
+    def _read_cpuinfo(self) -> str:
+        # Only the lines that identify the CPU. Things like the current clock
+        # speed change all the time.
+        keys  = ("model name", "hardware", "model", "cpu part", "flags", "features")
+        lines = set()
+        try:
+            with open("/proc/cpuinfo", "r") as file:
+                for line in file:
+                    key = line.split(":", 1)[0].strip().lower()
+                    if key in keys:
+                        lines.add(line.strip())
+        except Exception:
+            pass
+        return "\n".join(sorted(lines))
+
+    def _usb_device_ids(self) -> "list[str]":
+        ids  = set()
+        root = "/sys/bus/usb/devices"
+        try:
+            for device in os.listdir(root):
+                vendor = self._read_text(os.path.join(root, device, "idVendor"))
+                if vendor:
+                    product = self._read_text(os.path.join(root, device, "idProduct"))
+                    ids.add(f"usb:{vendor}:{product}")
+        except Exception:
+            pass
+        return sorted(ids)
+
+    def _pci_gpu_ids(self) -> "list[str]":
+        # Display controllers (PCI class 0x03) and processing accelerators
+        # (0x12), by slot, vendor and device id
+        ids  = set()
+        root = "/sys/bus/pci/devices"
+        try:
+            for device in os.listdir(root):
+                pci_class = self._read_text(os.path.join(root, device, "class"))
+                if pci_class.startswith(("0x03", "0x12")):
+                    vendor    = self._read_text(os.path.join(root, device, "vendor"))
+                    device_id = self._read_text(os.path.join(root, device, "device"))
+                    ids.add(f"pci:{device}:{vendor}:{device_id}")
+        except Exception:
+            pass
+        return sorted(ids)
+
+    def _windows_display_adapters(self) -> "list[str]":
+        # The name, PCI id and driver version of each display adapter, from the
+        # registry rather than spawning anything to ask
+        adapters = []
+        try:
+            import winreg
+            class_path = r"SYSTEM\CurrentControlSet\Control\Class\{4d36e968-e325-11ce-bfc1-08002be10318}"
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, class_path) as display_class:
+                index = 0
+                while True:
+                    try:
+                        name = winreg.EnumKey(display_class, index)
+                    except OSError:
+                        break
+                    index += 1
+
+                    values = []
+                    try:
+                        with winreg.OpenKey(display_class, name) as adapter:
+                            for value_name in [ "DriverDesc", "MatchingDeviceId", "DriverVersion" ]:
+                                try:
+                                    values.append(str(winreg.QueryValueEx(adapter, value_name)[0]))
+                                except OSError:
+                                    values.append("")
+                    except OSError:
+                        pass
+                    if any(values):
+                        adapters.append(":".join(values))
+        except Exception:
+            pass
+        return sorted(adapters)
+
+    def _read_text(self, path: str) -> str:
+        try:
+            with open(path, "r") as file:
+                return file.read().strip()
+        except Exception:
+            return ""
+
+    def _file_signature(self, path: str) -> str:
+        try:
+            stat = os.stat(path)
+            return f"{path}:{stat.st_size}:{stat.st_mtime}"
+        except Exception:
+            return ""
@@ -1,7 +1,9 @@
 
 import base64
+import hashlib
 import io
 import sys
+import time
 from io import BytesIO
 import wave
 import json
@@ -10,12 +12,20 @@ from PIL import Image
 from .common import JSON
 # from logging import LogMethod
 
-try:
-    # pip install opencv-python-headless recommended
-    import cv2 as cv
-    import numpy as np
-except ImportError:
-    print("Info: Using PIL for image manipulation (Either OpenCV or numpy not available for this module)")
+# OpenCV and numpy are slow to import and only needed if a module asks for
+# images as numpy arrays, so they're imported on first use.
+_cv = None
+_np = None
+
+def _import_opencv():
+    """ Imports (once) and returns OpenCV and numpy. Raises ImportError if not available """
+    global _cv, _np
+    if _cv is None:
+        # pip install opencv-python-headless recommended
+        import cv2
+        import numpy
+        _cv, _np = cv2, numpy
+    return _cv, _np
 
 class RequestData:
     """
@@ -28,10 +38,22 @@ class RequestData:
 
         self._verbose_exceptions = True
 
+        # The time (secs since epoch) the server created this request, and how
+        # long (secs) the server will wait for a response. None = unknown
+        self.request_time    = None
+        self.timeout_secs    = None
+
         if json_request_data:    
             request_data    = json.JSONDecoder().decode(json_request_data)
             self.request_id = request_data.get("reqid", "")
             self.payload    = request_data["payload"]
+
+            request_time_ms = request_data.get("reqtime", 0)
+            timeout_ms      = request_data.get("reqtimeout", 0)
+            if request_time_ms:
+                self.request_time = request_time_ms / 1000.0
+            if timeout_ms and timeout_ms > 0:     # -1 = the server waits forever
+                self.timeout_secs = timeout_ms / 1000.0
         else:
             self.request_id = ""
 
@@ -49,6 +71,14 @@ class RequestData:
         self._command    = self.payload.get("command",     None)
         self.value_list  = self.payload.get("values",      None)
         self.files       = self.payload.get("files",       None)
+
+        # A client may ask for a shorter deadline than the server's timeout.
+        # eg. a camera that only cares about a frame for the next 2 seconds
+        client_timeout_ms = self.get_int("timeout_ms", 0)
+        if client_timeout_ms > 0:
+            client_timeout_secs = client_timeout_ms / 1000.0
+            if not self.timeout_secs or client_timeout_secs < self.timeout_secs:
+                self.timeout_secs = client_timeout_secs
        
     @staticmethod
     def clamp(value, min_value, max_value) -> any:
@@ -125,6 +155,70 @@ class RequestData:
         self._segments = segments
         self.payload["urlSegments"] = segments
 
+    @property
+    def deadline(self) -> float:
+        """
+        Gets the time (secs since epoch) after which nobody will be waiting for
+        the response to this request, or None if there is no deadline
+        """
+        if not self.request_time or not self.timeout_secs:
+            return None
+        return self.request_time + self.timeout_secs
+
+    def time_remaining(self) -> float:
+        """
+        Gets the number of seconds left before this request's deadline passes,
+        or None if there is no deadline. Will be negative if the request has
+        expired
+        """
+        deadline = self.deadline
+        if deadline is None:
+            return None
+        return deadline - time.time()
+
+    def is_expired(self, margin_secs: float = 0) -> bool:
+        """
+        Returns True if this request's deadline has passed (or will pass within
+        margin_secs), meaning the response would arrive after the client has
+        given up.
+        """
+        remaining = self.time_remaining()
+        return remaining is not None and remaining <= margin_secs
+
+    def fingerprint(self, ignore_keys: "list[str]" = None) -> str:
+        """
+        Returns a hash that identifies the content of this request: the command,
+        URL segments, values and files. Two requests with the same fingerprint
+        will produce the same result from a deterministic module. The request ID
+        and timing info are not included.
+        Param: ignore_keys - names of values that don't affect the result and
+                             so shouldn't be included (eg. "timeout_ms")
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+
+        hasher.update(str(self._command).encode("utf-8"))
+        hasher.update(b"\0")
+        if self._segments:
+            hasher.update("/".join(str(segment) for segment in self._segments).encode("utf-8"))
+        hasher.update(b"\0")
+
+        if self.value_list:
+            values = [(value.get("key", ""), value.get("value")) for value in self.value_list
+                      if not ignore_keys or value.get("key") not in ignore_keys]
+            values.sort(key=lambda item: str(item[0]))
+            hasher.update(json.dumps(values, default=str).encode("utf-8"))
+        hasher.update(b"\0")
+
+        # Hashing the base64 text identifies the content just as well as hashing
+        # the decoded bytes, and avoids the cost of decoding it
+        if self.files:
+            for file_data in self.files:
+                data = file_data.get("data") or ""
+                hasher.update(data.encode("ascii") if isinstance(data, str) else bytes(data))
+                hasher.update(b"\0")
+
+        return hasher.hexdigest()
+
     def json(self) -> JSON:
         json_request_data = {
             "reqid": "",
@@ -168,9 +262,9 @@ class RequestData:
             # massive speed increase. Check if this has been requested and do
             # this first
             if module == 'opencv':
-                # Do a hard check rather than fail-to-PIL because the caller will
-                # be expecting a np.ndarray object
-                assert 'cv' in sys.modules and 'np' in sys.modules
+                # Don't fall back to PIL because the caller will be expecting
+                # a np.ndarray object
+                cv, np = _import_opencv()
                 return cv.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv.IMREAD_COLOR)
 
             with io.BytesIO(img_bytes) as img_stream:
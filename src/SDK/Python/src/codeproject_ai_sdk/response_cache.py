@@ -0,0 +1,108 @@
+
+import json
+import time
+from collections import OrderedDict
+
+from .common import JSON
+
+
+class ResponseCache:
+    """
+    A small in-memory cache of responses to requests, keyed by a fingerprint
+    of the request (see RequestData.fingerprint). Entries are evicted least
+    recently used first once either the entry count or the total size budget
+    is exceeded, and are never returned once older than the time-to-live.
+
+    This is only ever accessed from the asyncio loop in ModuleRunner, so no
+    locking is done.
+    """
+
+    def __init__(self, max_bytes: int, ttl_secs: float, max_entries: int = 1024):
+        """
+        Constructor.
+        Param: max_bytes   - The total (approximate) size of all cached responses
+        Param: ttl_secs    - How long a response can be reused for
+        Param: max_entries - The max number of responses to hold
+        """
+        self.max_bytes   = max_bytes
+        self.ttl_secs    = ttl_secs
+        self.max_entries = max_entries
+
+        self._entries    = OrderedDict()  # key => (expiry time, size, response)
+        self._size_bytes = 0
+
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl_secs > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> JSON:
+        """
+        Returns a copy of the cached response for the given key, or None if
+        there is no (unexpired) response
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expiry, size, response = entry
+        if expiry < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        # Callers add their own envelope (requestId etc) so hand back a copy
+        return dict(response)
+
+    def put(self, key: str, response: JSON) -> None:
+        """ Adds (a copy of) a response to the cache """
+        if not self.enabled or not key or not isinstance(response, dict):
+            return
+
+        try:
+            size = len(json.dumps(response))
+        except Exception:
+            return  # Not serialisable, so not something we'd be sending anyway
+
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_secs, size, dict(response))
+        self._size_bytes  += size
+
+        while self._entries and (self._size_bytes > self.max_bytes or \
+                                 len(self._entries) > self.max_entries):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """ Removes all entries from the cache """
+        self._entries.clear()
+        self._size_bytes = 0
+
+    def stats(self) -> JSON:
+        """ Returns the cache statistics, suitable for a status report """
+        lookups = self.hits + self.misses
+        return {
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "hitRate":   0 if not lookups else round(self.hits / lookups, 3),
+            "evictions": self.evictions,
+            "entries":   len(self._entries),
+            "sizeKB":    self._size_bytes // 1024
+        }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size_bytes -= size
@@ -0,0 +1,70 @@
+
+import threading
+
+from .common import JSON
+
+
+class ShardedCounters:
+    """
+    A set of named counters (or equally, a histogram) that can be added to
+    from many threads at once without losing counts. Each thread adds to its
+    own private shard, so writers never contend on a lock. Reading sums all
+    the shards, which is far less frequent than writing.
+
+    Shards are kept after their thread has gone so no counts are lost.
+    """
+
+    def __init__(self):
+        self._local      = threading.local()
+        self._shards     = []                # One dict of name => count per thread
+        self._shard_lock = threading.Lock()  # Only taken when a thread adds its shard
+
+    def add(self, name: str, amount = 1) -> None:
+        """ Adds the given amount to the named counter """
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._new_shard()
+
+        # Only this thread ever writes to this shard
+        shard[name] = shard.get(name, 0) + amount
+
+    def get(self, name: str):
+        """ Returns the current value of the named counter """
+        return sum(shard.get(name, 0) for shard in self._snapshot_shards())
+
+    def total(self):
+        """ Returns the sum of all counters """
+        return sum(sum(shard.values()) for shard in self._snapshot_shards())
+
+    def snapshot(self) -> JSON:
+        """ Returns a dict of name => value for all counters """
+        totals = {}
+        for shard in self._snapshot_shards():
+            for name, count in shard.items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def _new_shard(self) -> dict:
+        shard = {}
+        with self._shard_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def _snapshot_shards(self) -> "list[dict]":
+        """
+        Returns a copy of each shard. A shard can gain a new key while we copy
+        it, in which case we simply try again.
+        """
+        with self._shard_lock:
+            shards = list(self._shards)
+
+        copies = []
+        for shard in shards:
+            while True:
+                try:
+                    copies.append(dict(shard))
+                    break
+                except RuntimeError:    # dictionary changed size during iteration
+                    pass
+        return copies
@@ -0,0 +1,86 @@
+
+import builtins
+import sys
+import time
+
+
+class StartupProfiler:
+    """
+    Records how long a module takes to start: the time spent importing each
+    top level package, and the time spent in each phase of startup. Only does
+    anything if the module was launched with --profile-startup, in which case
+    the breakdown is printed once the module is ready to process requests.
+
+    There's a single instance of this, created when the SDK is first imported
+    so it can time the imports that follow.
+    """
+
+    def __init__(self):
+        self.enabled          = "--profile-startup" in sys.argv
+        self._started         = time.perf_counter()
+        self._last_mark       = self._started
+        self._phases          = []    # (phase, secs)
+        self._imports         = {}    # top level package => secs, including its own imports
+        self._import_depth    = 0
+        self._original_import = None
+
+        if self.enabled:
+            self._original_import = builtins.__import__
+            builtins.__import__   = self._timed_import
+
+    def mark(self, phase: str) -> None:
+        """ Records that the given phase of startup, which began at the last mark, is done """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last_mark))
+        self._last_mark = now
+
+    def report(self, max_imports: int = 15, probe_timings: dict = None) -> str:
+        """
+        Stops timing imports and returns the startup breakdown as a printable
+        table. probe_timings are SystemInfo's hardware probe timings.
+        """
+        self._stop_timing_imports()
+
+        lines = [ "Startup profile", "  Phases" ]
+        for phase, secs in self._phases:
+            lines.append(f"    {phase:<40} {secs * 1000:9.1f} ms")
+        total = self._last_mark - self._started
+        lines.append(f"    {'Total':<40} {total * 1000:9.1f} ms")
+
+        lines.append("  Slowest imports (each includes the imports it made)")
+        slowest = sorted(self._imports.items(), key=lambda item: item[1], reverse=True)
+        for package, secs in slowest[:max_imports]:
+            lines.append(f"    {package:<40} {secs * 1000:9.1f} ms")
+
+        if probe_timings:
+            lines.append("  Hardware probes (cached = time the original probe took)")
+            for probe, timing in probe_timings.items():
+                source = "cached" if timing.get("cached") else ""
+                lines.append(f"    {probe:<40} {timing.get('ms', 0):9.1f} ms {source}")
+
+        return "\n".join(lines)
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Only time the first, absolute import of a package that isn't being
+        # imported as part of another package we're already timing
+        if level or self._import_depth or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._import_depth += 1
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._import_depth -= 1
+            package = name.partition(".")[0]
+            self._imports[package] = self._imports.get(package, 0) + time.perf_counter() - started
+
+    def _stop_timing_imports(self) -> None:
+        if self._original_import and builtins.__import__ == self._timed_import:
+            builtins.__import__ = self._original_import
+        self._original_import = None
+
+
+startup_profiler = StartupProfiler()
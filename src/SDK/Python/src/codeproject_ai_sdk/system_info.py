@@ -1,26 +1,65 @@
 # Import standard libs
+import functools
 import os
 import platform
 from platform import uname
 import sys
+import time
+
+from .probe_cache import ProbeCache
 
 # These are annoying and often unavoidable
 import warnings
 warnings.simplefilter("ignore", DeprecationWarning)
 
+
+def _cached_probe(restore = None):
+    """
+    Decorator for the SystemInfo probe properties. The result is taken from
+    the on-disk probe cache if it's there, otherwise the probe is run and its
+    result stored in the cache. Negative results (no GPU, no library) are only
+    cached briefly, so installing a driver or runtime is soon noticed. restore
+    is an optional function, called with the SystemInfo object, to redo any
+    side effects of a successful probe when its result comes from the cache
+    instead.
+    """
+    def decorator(probe):
+        name = probe.__name__
+
+        @functools.wraps(probe)
+        def wrapper(self):
+            return self._probe(name, lambda: probe(self), restore)
+        return wrapper
+
+    return decorator
+
+
+def _add_openvino_libs_to_path(system_info) -> None:
+    try:
+        import openvino.utils as utils
+        utils.add_openvino_libs_to_path()
+    except: pass
+
+
 class SystemInfo:
     """
     A collection of methods to get information on the system hardware, identification, OS and
     libraries
     """
 
-    def __init__(self) -> None:
+    def __init__(self, cache_dir: str = None) -> None:
         """ 
         Constructor. 
+        Param: cache_dir - the folder holding the probe cache, shared by all
+                           modules. If None, the system temp folder is used
         """
         # Private fields
         self._osVersion              = None
 
+        self._probe_cache            = ProbeCache(cache_dir)
+        self._probe_results          = {}    # name => value, for this process
+        self._probe_timings          = {}    # name => { "ms": ..., "cached": ... }
+
         self._hasTorchCuda           = None
         self._hasTorchROCm           = None
         self._hasTorchDirectML       = None
@@ -82,14 +121,7 @@ class SystemInfo:
             sys.path.insert(0, "/usr/local/lib/python3.8/dist-packages/")
 
         # Get some (very!) basic CPU info
-        try:
-            import cpuinfo
-            info = cpuinfo.get_cpu_info()
-            self.cpu_brand = info.get('brand_raw')
-            self.cpu_arch  = info.get('arch_string_raw')
-        except:
-            self.cpu_brand = ""
-            self.cpu_arch  = ""
+        self.cpu_brand, self.cpu_arch = self._probe("cpuInfo", self._get_cpu_info)
 
         self.cpu_vendor = self.cpu_brand
         if self.cpu_brand:
@@ -98,7 +130,55 @@ class SystemInfo:
                 self.cpu_arch   = 'arm64'
             elif self.cpu_brand.find("Intel(R)") != -1:
                 self.cpu_vendor = 'Intel'
-                
+
+
+    @property
+    def probe_timings(self) -> dict:
+        """
+        Returns how long (ms) each hardware probe made so far took, and whether
+        its result came from the cache, as name => { "ms": ..., "cached": ... }.
+        For a cached probe, ms is the time the original probe took.
+        """
+        return dict(self._probe_timings)
+
+    def _probe(self, name: str, probe, restore = None) -> any:
+        """
+        Returns the result of the named probe, from this object, the on-disk
+        probe cache, or by running the probe (and caching the result)
+        """
+        if name in self._probe_results:
+            return self._probe_results[name]
+
+        found, value, ms = self._probe_cache.get(name)
+        if found:
+            if isinstance(value, list):    # JSON has no tuples
+                value = tuple(value)
+            if value and restore:
+                restore(self)
+            self._probe_timings[name] = { "ms": ms, "cached": True }
+        else:
+            start_time = time.perf_counter()
+            value      = probe()
+            ms         = (time.perf_counter() - start_time) * 1000
+
+            # eg False, or (None, None) for no CUDA version
+            negative   = not value or (isinstance(value, tuple) and not any(value))
+            max_age    = self._probe_cache.negative_max_age_secs if negative else None
+            self._probe_cache.put(name, value, ms, max_age)
+            self._probe_timings[name] = { "ms": round(ms, 1), "cached": False }
+
+        self._probe_results[name] = value
+        return value
+
+    def _get_cpu_info(self) -> "tuple[str, str]":
+        """ Returns the CPU brand and architecture """
+        try:
+            import cpuinfo
+            info = cpuinfo.get_cpu_info()
+            return info.get('brand_raw'), info.get('arch_string_raw')
+        except:
+            return "", ""
+
 
     @property
     def osVersion(self) -> str:
@@ -127,6 +207,49 @@ class SystemInfo:
 
 
     @property
+    def available_memory_MB(self) -> int:
+        """
+        Returns the amount of RAM (MB) currently available to new allocations,
+        or None if it can't be determined. Not cached: this changes constantly.
+        """
+        try:
+            import psutil
+            return psutil.virtual_memory().available // (1024 * 1024)
+        except: pass
+
+        if self.os == 'Linux':
+            try:
+                with open('/proc/meminfo') as file:
+                    for line in file:
+                        if line.startswith('MemAvailable:'):
+                            return int(line.split()[1]) // 1024  # value is in kB
+            except: pass
+
+        elif self.os == 'Windows':
+            try:
+                import ctypes
+                class MEMORYSTATUSEX(ctypes.Structure):
+                    _fields_ = [
+                        ("dwLength",                ctypes.c_ulong),
+                        ("dwMemoryLoad",            ctypes.c_ulong),
+                        ("ullTotalPhys",            ctypes.c_ulonglong),
+                        ("ullAvailPhys",            ctypes.c_ulonglong),
+                        ("ullTotalPageFile",        ctypes.c_ulonglong),
+                        ("ullAvailPageFile",        ctypes.c_ulonglong),
+                        ("ullTotalVirtual",         ctypes.c_ulonglong),
+                        ("ullAvailVirtual",         ctypes.c_ulonglong),
+                        ("sullAvailExtendedVirtual",ctypes.c_ulonglong),
+                    ]
+                status = MEMORYSTATUSEX()
+                status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+                ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+                return status.ullAvailPhys // (1024 * 1024)
+            except: pass
+
+        return None
+
+    @property
+    @_cached_probe()
     def getCudaVersion(self) -> "tuple[int, int]":
         try:
             import subprocess
@@ -155,6 +278,7 @@ class SystemInfo:
         return self.getCudaVersion is not None
 
     @property
+    @_cached_probe()
     def hasTorchCuda(self) -> bool:
         """ Is CUDA support via PyTorch available? """
 
@@ -171,6 +295,7 @@ class SystemInfo:
         return self._hasTorchCuda
 
     @property
+    @_cached_probe()
     def hasTorchDirectML(self) -> bool:
         """ Is DirectML support via PyTorch available? """
 
@@ -185,6 +310,7 @@ class SystemInfo:
         return self._hasTorchDirectML
 
     @property
+    @_cached_probe()
     def hasTorchROCm(self) -> bool:
         """ Is ROCm (AMD GPU) support via PyTorch available? """
         
@@ -215,6 +341,7 @@ class SystemInfo:
         return self._hasTorchROCm
 
     @property
+    @_cached_probe()
     def hasTorchHalfPrecision(self) -> bool:
         """ Can this (assumed) NVIDIA GPU support half-precision operations? """
 
@@ -258,6 +385,7 @@ class SystemInfo:
         return self._hasTorchHalfPrecision
 
     @property
+    @_cached_probe()
     def hasTensorflowGPU(self) -> bool:
         """ Is GPU support via Tensorflow available? """
 
@@ -270,6 +398,7 @@ class SystemInfo:
         return self._hasTensorflowGPU
 
     @property
+    @_cached_probe()
     def hasONNXRuntime(self) -> bool:
         """ Is the ONNX runtime available? """
         
@@ -283,6 +412,7 @@ class SystemInfo:
         return self._hasONNXRuntime
 
     @property
+    @_cached_probe()
     def hasONNXRuntimeGPU(self) -> bool:
         """ Is the ONNX runtime available and is there a GPU that will support it? """
 
@@ -295,6 +425,7 @@ class SystemInfo:
         return self._hasONNXRuntimeGPU
 
     @property
+    @_cached_probe(restore=_add_openvino_libs_to_path)
     def hasOpenVINO(self) -> bool:
         """ Is OpenVINO available? """
 
@@ -308,6 +439,7 @@ class SystemInfo:
         return self._hasOpenVINO
 
     @property
+    @_cached_probe()
     def hasTorchMPS(self) -> bool:
         """ Are we running on Apple Silicon and is MPS support in PyTorch available? """
 
@@ -321,6 +453,7 @@ class SystemInfo:
         return self._hasTorchMPS
 
     @property
+    @_cached_probe()
     def hasPaddleGPU(self) -> bool:
         """ Is PaddlePaddle available and is there a GPU that supports it? """
 
@@ -333,6 +466,7 @@ class SystemInfo:
         return self._hasPaddleGPU
 
     @property
+    @_cached_probe()
     def hasCoralTPU(self) -> bool:
         """ Is there a Coral.AI TPU connected and are the libraries in place to support it? """
 
@@ -373,6 +507,7 @@ class SystemInfo:
         return self._hasCoralTPU
 
     @property
+    @_cached_probe()
     def hasFastDeployRockNPU(self) -> bool:
         """ Is the Rockchip NPU present (ie. on a Orange Pi) and supported by
             the fastdeploy library? """
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Test the SDK source in this tree rather than any installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
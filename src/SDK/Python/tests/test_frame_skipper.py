@@ -0,0 +1,70 @@
+from PIL import Image, ImageDraw
+
+from codeproject_ai_sdk.frame_skipper import FrameSkipper
+
+
+def make_frame(size=(320, 240), box=None):
+    image = Image.new("RGB", size, (40, 40, 40))
+    if box:
+        ImageDraw.Draw(image).rectangle(box, fill=(250, 250, 250))
+    return image
+
+
+def test_first_frame_is_processed():
+    skipper = FrameSkipper()
+    response, thumbnail = skipper.check("cam1", make_frame())
+    assert response is None
+    assert thumbnail is not None
+
+
+def test_unchanged_frame_reuses_response():
+    skipper = FrameSkipper()
+    _, thumbnail = skipper.check("cam1", make_frame())
+    skipper.update("cam1", thumbnail, { "success": True, "predictions": [], "inferenceMs": 25 })
+
+    response, _ = skipper.check("cam1", make_frame())
+    assert response == { "success": True, "predictions": [], "inferenceMs": 0, "reused": True }
+    assert skipper.stats() == { "framesReused": 1, "framesProcessed": 1, "streams": 1 }
+
+
+def test_changed_frame_is_processed():
+    skipper = FrameSkipper()
+    _, thumbnail = skipper.check("cam1", make_frame())
+    skipper.update("cam1", thumbnail, { "success": True })
+
+    response, _ = skipper.check("cam1", make_frame(box=(100, 80, 200, 160)))
+    assert response is None
+
+
+def test_resized_frame_is_processed():
+    skipper = FrameSkipper()
+    _, thumbnail = skipper.check("cam1", make_frame())
+    skipper.update("cam1", thumbnail, { "success": True })
+
+    response, _ = skipper.check("cam1", make_frame(size=(640, 480)))
+    assert response is None
+
+
+def test_streams_are_tracked_separately():
+    skipper = FrameSkipper()
+    _, thumbnail = skipper.check("cam1", make_frame())
+    skipper.update("cam1", thumbnail, { "success": True })
+
+    response, _ = skipper.check("cam2", make_frame())
+    assert response is None
+
+
+def test_least_recently_used_stream_is_dropped():
+    skipper = FrameSkipper(max_streams=2)
+    for stream in [ "cam1", "cam2", "cam3" ]:
+        _, thumbnail = skipper.check(stream, make_frame())
+        skipper.update(stream, thumbnail, { "success": True })
+
+    assert skipper.stats()["streams"] == 2
+    assert skipper.check("cam1", make_frame())[0] is None
+    assert skipper.check("cam3", make_frame())[0] is not None
+
+
+def test_disabled_or_untagged_requests_are_never_skipped():
+    assert FrameSkipper(threshold=0).check("cam1", make_frame()) == (None, None)
+    assert FrameSkipper().check(None, make_frame()) == (None, None)
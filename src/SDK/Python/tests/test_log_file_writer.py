@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+import os
+
+from codeproject_ai_sdk.log_file_writer import LogFileWriter
+
+
+def write_lines(writer: LogFileWriter, lines: "list[str]") -> None:
+    async def run():
+        for line in lines:
+            writer.write(line)
+            await writer.flush()
+        await writer.close()
+    asyncio.run(run())
+
+
+def make_file(path: str, size: int, mtime: float) -> None:
+    with open(path, "w") as file:
+        file.write("x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_lines_are_buffered_until_flushed(tmp_path):
+    writer = LogFileWriter(str(tmp_path), buffer_size=100, flush_secs=60)
+    writer.write("line 1\n")
+    assert not writer.flush_due()
+    assert os.listdir(tmp_path) == []
+
+    writer.write("x" * 100 + "\n")
+    assert writer.flush_due()
+
+
+def test_file_is_rotated_when_full(tmp_path):
+    writer = LogFileWriter(str(tmp_path), max_file_MB=1)
+    writer.max_file_bytes = 100
+    write_lines(writer, [ "a" * 60 + "\n", "b" * 60 + "\n", "c" * 60 + "\n" ])
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert sorted(os.listdir(tmp_path)) == [ f"log-{today}.1.txt", f"log-{today}.txt" ]
+
+
+def test_rotated_files_are_compressed(tmp_path):
+    writer = LogFileWriter(str(tmp_path), compress=True)
+    writer.max_file_bytes = 100
+    write_lines(writer, [ "a" * 120 + "\n", "b" * 10 + "\n" ])
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert sorted(os.listdir(tmp_path)) == [ f"log-{today}.1.txt", f"log-{today}.txt.gz" ]
+
+
+def test_only_own_closed_files_are_compressed(tmp_path):
+    other = os.path.join(tmp_path, "server.txt")
+    make_file(other, 10, 1000)
+
+    writer = LogFileWriter(str(tmp_path), compress=True)
+    writer._compress_file(other)
+    assert os.path.exists(other)
+
+    async def run():
+        writer.write("line\n")
+        await writer.flush()
+        writer._compress_file(writer._file_path)
+        assert os.path.exists(writer._file_path)
+        await writer.close()
+    asyncio.run(run())
+
+    assert not any(name.endswith(".gz") for name in os.listdir(tmp_path))
+
+
+def test_oldest_logs_are_removed(tmp_path):
+    make_file(os.path.join(tmp_path, "log-2020-01-01.txt"), 600 * 1024, 1000)
+    make_file(os.path.join(tmp_path, "log-2020-01-02.txt.gz"), 600 * 1024, 2000)
+
+    writer = LogFileWriter(str(tmp_path), max_total_MB=1)
+    write_lines(writer, [ "line\n" ])
+
+    files = sorted(os.listdir(tmp_path))
+    assert "log-2020-01-01.txt" not in files
+    assert "log-2020-01-02.txt.gz" in files
+    assert len(files) == 2
+
+
+def test_only_own_logs_are_removed(tmp_path):
+    make_file(os.path.join(tmp_path, "notes.txt"), 2 * 1024 * 1024, 1000)
+    make_file(os.path.join(tmp_path, "log-2020-01-01.jsonl"), 2 * 1024 * 1024, 1000)
+
+    writer = LogFileWriter(str(tmp_path), max_total_MB=1)
+    write_lines(writer, [ "line\n" ])
+
+    files = os.listdir(tmp_path)
+    assert "notes.txt" in files
+    assert "log-2020-01-01.jsonl" in files
+
+
+def test_no_directory_discards_lines():
+    writer = LogFileWriter(None)
+    writer.write("line\n")
+    assert not asyncio.run(writer.flush())
+    assert writer.time_until_flush() is None
@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiohttp")   # module_logging needs it, though these tests make no requests
+
+from codeproject_ai_sdk.module_logging import LogMethod, ModuleLogger
+
+
+def run_logger(tmp_path, entries: "list[dict]", log_method: LogMethod = LogMethod.File,
+               logger: ModuleLogger = None) -> "list[dict]":
+    """ Logs the entries through a running logging loop and returns what gets logged """
+    logged = []
+    if not logger:
+        logger = ModuleLogger("0", str(tmp_path), module_id="Test")
+
+        async def do_log(log_method, data):
+            logged.append(data)
+        logger.do_log = do_log
+
+    async def run():
+        loop_task = asyncio.create_task(logger.logging_loop())
+        while not logger.logging_loop_started:
+            await asyncio.sleep(0.01)
+        for entry in entries:
+            logger.log(log_method, entry)
+        await asyncio.sleep(0.1)
+        logger.cancel_logging()
+        await loop_task
+    asyncio.run(run())
+
+    return logged
+
+
+def test_repeated_entries_are_suppressed(tmp_path):
+    logged = run_logger(tmp_path, [ { "message": "Unable to connect" } ] * 20)
+
+    messages = [ entry["message"] for entry in logged ]
+    assert messages == [ "Unable to connect" ] * 5 + [ "Unable to connect (repeated 15 more times)" ]
+
+
+def test_request_timings_are_never_suppressed(tmp_path):
+    entries = [ {
+        "loglevel":   "information",
+        "request_id": f"request{i}",
+        "timings":    { "handlerMs": i },
+        "message":    "Completed detect (success: True)"
+    } for i in range(20) ]
+
+    logged = run_logger(tmp_path, entries)
+    assert [ entry["request_id"] for entry in logged ] == [ f"request{i}" for i in range(20) ]
+
+
+def read_file_log(tmp_path) -> str:
+    log_dir = os.path.join(tmp_path, "logs", "Test")
+    return "".join(open(os.path.join(log_dir, name)).read() for name in os.listdir(log_dir))
+
+
+@pytest.mark.parametrize("batch_supported", [ True, False ])
+def test_entries_the_server_does_not_take_are_logged_locally(tmp_path, capsys, batch_supported):
+    logger = ModuleLogger("0", str(tmp_path), module_id="Test")
+    logger._batch_supported = batch_supported
+
+    async def fail(*args):
+        return False
+    logger._server_log_batch = fail
+    logger._server_log       = fail
+
+    entries = [ { "message": "Server is restarting" } ] * 3 + [ { "message": "Still here" } ]
+    run_logger(tmp_path, entries, LogMethod.Info | LogMethod.Server, logger)
+
+    output = capsys.readouterr().out
+    assert "Server is restarting (repeated 3 times)" in output
+    assert "Still here" in output
+    assert "Server is restarting (repeated 3 times)" in read_file_log(tmp_path)
+
+
+def test_entries_sent_to_the_server_are_not_logged_locally(tmp_path, capsys):
+    logger = ModuleLogger("0", str(tmp_path), module_id="Test")
+    sent   = []
+
+    async def succeed(batch):
+        sent.extend(batch)
+        return True
+    logger._server_log_batch = succeed
+
+    run_logger(tmp_path, [ { "message": "All good" } ], LogMethod.Info | LogMethod.Server, logger)
+
+    assert [ item["entry"] for item in sent ] == [ "All good" ]
+    assert "All good" not in capsys.readouterr().out
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")   # module_runner needs it, though these tests make no requests
+
+from codeproject_ai_sdk.module_runner import ModuleRunner
+
+
+class StatusRunner(ModuleRunner):
+    """ Just enough of a ModuleRunner to build and send status updates """
+
+    def __init__(self, responses: "list[int]" = None):
+        # Deliberately not calling ModuleRunner.__init__, which sets up the
+        # whole module
+        self._status_max_dict_items   = 4
+        self._status_deltas_supported = True
+        self._last_status_sent        = None
+        self._last_full_status_time   = 0
+        self.responses                = list(responses or [])
+        self.posted                   = []
+
+    async def _post_status(self, payload):
+        self.posted.append(payload)
+        return self.responses.pop(0) if self.responses else 200
+
+
+def send(runner: StatusRunner, status, full: bool = False) -> None:
+    asyncio.run(runner._send_status(status, full))
+
+
+def test_small_dicts_are_left_alone():
+    runner = StatusRunner()
+    status = { "histogram": { "cat": 3, "dog": 1 }, "name": "test" }
+    assert runner._summarise_status(status) == { "histogram": { "cat": 3, "dog": 1 }, "name": "test" }
+
+
+def test_large_count_dicts_are_summarised():
+    runner    = StatusRunner()
+    histogram = { "cat": 5, "dog": 9, "car": 1, "bus": 2, "bike": 7, "person": 3 }
+    status    = runner._summarise_status({ "histogram": histogram })
+    assert status["histogram"] == { "dog": 9, "bike": 7, "cat": 5, "(other)": 6 }
+
+
+def test_large_non_count_dicts_are_left_alone():
+    runner = StatusRunner()
+    models = { name: { "status": "ready" } for name in "abcdef" }
+    assert runner._summarise_status({ "models": models })["models"] == models
+
+
+def test_first_status_is_sent_in_full_then_deltas():
+    runner = StatusRunner()
+    send(runner, { "a": 1, "b": 2 })
+    send(runner, { "a": 1, "b": 3 })
+    send(runner, { "a": 1 })
+
+    assert json.loads(runner.posted[0]["statusData"]) == { "a": 1, "b": 2 }
+    assert json.loads(runner.posted[1]["statusDelta"]) == { "b": 3 }
+    assert json.loads(runner.posted[2]["statusDelta"]) == { "b": None }
+
+
+def test_unchanged_status_sends_nothing():
+    runner = StatusRunner()
+    send(runner, { "a": 1 })
+    send(runner, { "a": 1 })
+    assert len(runner.posted) == 1
+
+
+def test_failed_delta_resyncs_and_keeps_using_deltas():
+    runner = StatusRunner([ 200, 500, 200 ])
+    send(runner, { "a": 1 })
+    send(runner, { "a": 2 })
+    send(runner, { "a": 3 })
+
+    assert "statusData" in runner.posted[2]
+    assert runner._status_deltas_supported
+    assert "statusDelta" in runner.posted[3]
+
+
+def test_delta_the_server_cannot_apply_resyncs_and_keeps_using_deltas():
+    # 409: the server (eg after a restart) has no full status to apply it to
+    runner = StatusRunner([ 200, 409, 200 ])
+    send(runner, { "a": 1 })
+    send(runner, { "a": 2 })
+    send(runner, { "a": 3 })
+
+    assert json.loads(runner.posted[2]["statusData"]) == { "a": 2 }
+    assert runner._status_deltas_supported
+    assert json.loads(runner.posted[3]["statusDelta"]) == { "a": 3 }
+
+
+def test_delta_for_unknown_module_keeps_using_deltas():
+    # 404 for both the delta and the full update: the module isn't known (yet)
+    runner = StatusRunner([ 200, 404, 404 ])
+    send(runner, { "a": 1 })
+    send(runner, { "a": 2 })
+    send(runner, { "a": 3 })
+
+    assert "statusData" in runner.posted[2]
+    assert runner._status_deltas_supported
+    assert "statusDelta" in runner.posted[3]
+
+
+@pytest.mark.parametrize("status_code", [ 400, 404, 405 ])
+def test_rejected_delta_switches_to_full_updates(status_code):
+    # A 404 only counts as rejected if the full update then works
+    runner = StatusRunner([ 200, status_code, 200 ])
+    send(runner, { "a": 1 })
+    send(runner, { "a": 2 })
+    send(runner, { "a": 3 })
+
+    assert not runner._status_deltas_supported
+    assert "statusData" in runner.posted[2]
+    assert "statusData" in runner.posted[3]
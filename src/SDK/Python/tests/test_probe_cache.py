@@ -0,0 +1,46 @@
+import time
+
+from codeproject_ai_sdk.probe_cache import ProbeCache
+from codeproject_ai_sdk.system_info import SystemInfo
+
+
+def test_fingerprint_changes_with_visible_devices(tmp_path, monkeypatch):
+    monkeypatch.delenv("CUDA_VISIBLE_DEVICES", raising=False)
+    all_devices = ProbeCache(str(tmp_path))._make_fingerprint()
+
+    monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "0")
+    assert ProbeCache(str(tmp_path))._make_fingerprint() != all_devices
+
+    monkeypatch.setenv("HIP_VISIBLE_DEVICES", "1")
+    monkeypatch.delenv("CUDA_VISIBLE_DEVICES")
+    assert ProbeCache(str(tmp_path))._make_fingerprint() != all_devices
+
+
+def test_results_are_read_back(tmp_path):
+    ProbeCache(str(tmp_path)).put("probe", True, 12.34)
+    assert ProbeCache(str(tmp_path)).get("probe") == (True, True, 12.3)
+
+
+def test_results_expire_after_their_max_age(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    ProbeCache(str(tmp_path)).put("probe", False, 10, max_age_secs=60)
+    assert ProbeCache(str(tmp_path)).get("probe")[0]
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert not ProbeCache(str(tmp_path)).get("probe")[0]
+
+
+def test_only_negative_probes_are_cached_briefly(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    system_info = SystemInfo(str(tmp_path))
+    system_info._probe("hasGPU", lambda: False)
+    system_info._probe("cudaVersion", lambda: (None, None))
+    system_info._probe("hasLibrary", lambda: True)
+
+    monkeypatch.setattr(time, "time", lambda: now + ProbeCache.negative_max_age_secs + 1)
+    cache = ProbeCache(str(tmp_path))
+    assert not cache.get("hasGPU")[0]
+    assert not cache.get("cudaVersion")[0]
+    assert cache.get("hasLibrary")[:2] == (True, True)
@@ -0,0 +1,71 @@
+import json
+import time
+
+from codeproject_ai_sdk import RequestData
+
+
+def make_request(reqtime_ms=None, reqtimeout_ms=None, values=None) -> RequestData:
+    request = {
+        "reqid":   "1",
+        "payload": {
+            "command": "detect",
+            "values":  [ { "key": key, "value": [ value ] } for key, value in (values or {}).items() ],
+            "files":   []
+        }
+    }
+    if reqtime_ms is not None:
+        request["reqtime"] = reqtime_ms
+    if reqtimeout_ms is not None:
+        request["reqtimeout"] = reqtimeout_ms
+    return RequestData(json.dumps(request))
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def test_no_timing_info_never_expires():
+    request = make_request()
+    assert request.deadline is None
+    assert not request.is_expired()
+
+
+def test_request_within_timeout_is_not_expired():
+    request = make_request(now_ms(), 30000)
+    assert not request.is_expired()
+    assert 29 < request.time_remaining() <= 30
+
+
+def test_request_past_timeout_is_expired():
+    request = make_request(now_ms() - 5000, 1000)
+    assert request.is_expired()
+
+
+def test_margin_counts_towards_expiry():
+    request = make_request(now_ms(), 1000)
+    assert not request.is_expired()
+    assert request.is_expired(margin_secs=2)
+
+
+def test_infinite_server_timeout_never_expires():
+    # The server sends -1 for an infinite ResponseTimeout
+    request = make_request(now_ms() - 60000, -1)
+    assert request.deadline is None
+    assert not request.is_expired()
+
+
+def test_client_timeout_shortens_deadline():
+    request = make_request(now_ms() - 3000, 30000, { "timeout_ms": "2000" })
+    assert request.timeout_secs == 2
+    assert request.is_expired()
+
+
+def test_client_timeout_applies_with_infinite_server_timeout():
+    request = make_request(now_ms(), -1, { "timeout_ms": "2000" })
+    assert request.timeout_secs == 2
+    assert not request.is_expired()
+
+
+def test_longer_client_timeout_is_ignored():
+    request = make_request(now_ms(), 1000, { "timeout_ms": "5000" })
+    assert request.timeout_secs == 1
@@ -0,0 +1,69 @@
+import time
+
+from codeproject_ai_sdk.response_cache import ResponseCache
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResponseCache(0, 30)
+    assert not cache.enabled
+    cache.put("key", { "success": True })
+    assert cache.get("key") is None
+
+
+def test_get_returns_a_copy():
+    cache = ResponseCache(1024 * 1024, 30)
+    cache.put("key", { "success": True, "count": 1 })
+
+    response = cache.get("key")
+    response["requestId"] = "abc"
+    assert cache.get("key") == { "success": True, "count": 1 }
+    assert cache.hits == 2
+
+
+def test_miss_is_counted():
+    cache = ResponseCache(1024 * 1024, 30)
+    assert cache.get("missing") is None
+    assert cache.misses == 1
+
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    cache = ResponseCache(1024 * 1024, 30)
+    now   = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache.put("key", { "success": True })
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 31)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = ResponseCache(1024 * 1024, 30, max_entries=2)
+    cache.put("a", { "value": "a" })
+    cache.put("b", { "value": "b" })
+    cache.get("a")
+    cache.put("c", { "value": "c" })
+
+    assert cache.get("b") is None
+    assert cache.get("a") == { "value": "a" }
+    assert cache.get("c") == { "value": "c" }
+    assert cache.evictions == 1
+
+
+def test_size_budget_evicts_entries():
+    cache = ResponseCache(100, 30)
+    cache.put("a", { "value": "x" * 40 })
+    cache.put("b", { "value": "y" * 40 })
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats()["sizeKB"] == 0
+
+
+def test_oversized_and_unserialisable_responses_are_skipped():
+    cache = ResponseCache(50, 30)
+    cache.put("big",  { "value": "x" * 100 })
+    cache.put("odd",  { "value": object() })
+    cache.put("list", [ 1, 2, 3 ])
+
+    assert cache.stats()["entries"] == 0
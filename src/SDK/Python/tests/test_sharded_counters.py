@@ -0,0 +1,59 @@
+import threading
+
+from codeproject_ai_sdk.sharded_counters import ShardedCounters
+
+
+def test_counts_are_summed():
+    counters = ShardedCounters()
+    counters.add("cat")
+    counters.add("cat")
+    counters.add("dog", 3)
+
+    assert counters.get("cat") == 2
+    assert counters.get("dog") == 3
+    assert counters.get("bus") == 0
+    assert counters.total() == 5
+    assert counters.snapshot() == { "cat": 2, "dog": 3 }
+
+
+def test_no_counts_are_lost_across_threads():
+    counters = ShardedCounters()
+
+    def count(label: str) -> None:
+        for _ in range(10000):
+            counters.add("all")
+            counters.add(label)
+
+    threads = [ threading.Thread(target=count, args=(f"thread{i}",)) for i in range(8) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The threads are gone, but their counts must remain
+    assert counters.get("all") == 80000
+    assert counters.get("thread3") == 10000
+    assert counters.total() == 160000
+
+
+def test_reading_while_writing():
+    counters = ShardedCounters()
+    stop     = threading.Event()
+
+    def count() -> None:
+        index = 0
+        while not stop.is_set():
+            counters.add(f"label{index % 500}")
+            index += 1
+
+    writer = threading.Thread(target=count)
+    writer.start()
+    try:
+        for _ in range(100):
+            snapshot = counters.snapshot()
+            assert all(value > 0 for value in snapshot.values())
+    finally:
+        stop.set()
+        writer.join()
+
+    assert counters.total() == sum(counters.snapshot().values())
@@ -3,13 +3,14 @@ import os
 import sys
 
 # Import CodeProject.AI SDK
-from codeproject_ai_sdk import LogMethod, RequestData, ModuleOptions, ModuleRunner, JSON
+from codeproject_ai_sdk import LogMethod, RequestData, ModuleOptions, ModuleRunner, JSON, ShardedCounters, \
+                               ModelPreloader
 
 # Import necessary modules we've installed 
 from PIL import Image
 
 # Import the method of the module we're wrapping
-from detect import do_detection
+from detect import do_detection, get_detector
 
 # Our adapter
 class YOLOv8_adapter(ModuleRunner):
@@ -25,10 +26,23 @@ class YOLOv8_adapter(ModuleRunner):
         self.std_model_name    = ModuleOptions.getEnvVariable("CPAI_MODULE_YOLODEMO_MODEL_NAME", "yolov8m")
         self.resolution_pixels = int(ModuleOptions.getEnvVariable("CPAI_MODULE_YOLODEMO_RESOLUTION", 640))
         self.accel_device_name = "cuda" if self.can_use_GPU else "cpu"
+
+        # Comma separated custom models to load, along with the standard model,
+        # in the background now rather than on their first request
+        preload_models         = ModuleOptions.getEnvVariable("CPAI_MODULE_YOLODEMO_PRELOAD_MODELS", "")
+
+        # Identical images sent to the same command will get identical results.
+        # Responses are only cached if CPAI_MODULE_RESPONSE_CACHE_MB is set
+        self.cacheable_commands = [ "detect", "custom" ]
        
         # Let's store some stats
-        self._num_items_found = 0
-        self._histogram       = {}
+        # label => count. process() runs on many threads at once, so these
+        # are sharded per thread rather than being a plain dict
+        self._histogram       = ShardedCounters()
+
+        self.preloader        = ModelPreloader(self._preload_model, self._warm_up_model)
+        self.preloader.start([ self.std_model_name ] +
+                             [ name.strip() for name in preload_models.split(",") if name.strip() ])
 
 
     def process(self, data: RequestData) -> JSON:
@@ -63,13 +77,15 @@ class YOLOv8_adapter(ModuleRunner):
             if not os.path.exists(os.path.join(self.models_dir, model_name + ".pt")):
                 return { "success": False, "error": f"Could not find custom model {model_name}" }
 
-            self.log(LogMethod.Info | LogMethod.Server,
-            { 
-                "filename": __file__,
-                "loglevel": "information",
-                "method": sys._getframe().f_code.co_name,
-                "message": f"Detecting using {model_name}"
-            })
+            # Logged per request, so only if someone's listening
+            if self.is_log_enabled("debug"):
+                self.log(LogMethod.Info | LogMethod.Server,
+                { 
+                    "filename": __file__,
+                    "loglevel": "debug",
+                    "method": sys._getframe().f_code.co_name,
+                    "message": f"Detecting using {model_name}"
+                })
 
             response = do_detection(img, threshold, self.models_dir, model_name, 
                                     self.resolution_pixels, self.can_use_GPU, self.accel_device_name,
@@ -84,24 +100,36 @@ class YOLOv8_adapter(ModuleRunner):
 
     def status(self) -> JSON:
         statusData = super().status()
-        statusData["numItemsFound"] = self._num_items_found
-        statusData["histogram"]     = self._histogram
+        statusData["numItemsFound"] = self._histogram.total()
+        statusData["histogram"]     = self._histogram.snapshot()
+        statusData["preload"]       = self.preloader.stats()
+        statusData["ready"]         = self.preloader.ready
         return statusData
 
 
     def update_statistics(self, response):
         super().update_statistics(response)
         if "success" in response and response["success"] and "predictions" in response:
-            predictions = response["predictions"]
-            self._num_items_found += len(predictions) 
-            for prediction in predictions:
-                label = prediction["label"]
-                if label not in self._histogram:
-                    self._histogram[label] = 1
-                else:
-                    self._histogram[label] += 1
+            for prediction in response["predictions"]:
+                self._histogram.add(prediction["label"])
     
 
+    def _preload_model(self, model_name: str) -> bool:
+        detector = get_detector(self.models_dir, model_name, self.resolution_pixels,
+                                self.can_use_GPU, self.accel_device_name, False, False,
+                                self.half_precision)
+        return detector is not None
+
+
+    def _warm_up_model(self, model_name: str) -> bool:
+        # A blank image at the configured resolution gets everything allocated
+        size     = self.resolution_pixels
+        response = do_detection(Image.new("RGB", (size, size)), 1.0, self.models_dir, model_name,
+                                size, self.can_use_GPU, self.accel_device_name,
+                                False, False, self.half_precision)
+        return response["success"]
+
+
     def selftest(self) -> JSON:
         
         file_name = os.path.join("test", "home-office.jpg")
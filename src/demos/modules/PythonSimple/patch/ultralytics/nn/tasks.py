@@ -1,6 +1,7 @@
 # Ultralytics YOLO 🚀, AGPL-3.0 license
 
 import contextlib
+import inspect
 from copy import deepcopy
 from pathlib import Path
 
@@ -610,6 +611,26 @@ def temporary_modules(modules=None):
                 del sys.modules[old]
 
 
+def torch_mmap_load(file):
+    """
+    Loads a checkpoint with torch.load(), memory mapping its tensors where PyTorch supports it (2.1+). The weights are
+    then paged in from the file as they're used rather than copied into process memory up front, and processes loading
+    the same file share those pages. Legacy (pre zip format) checkpoints can't be memory mapped, so are read in full.
+
+    Args:
+        file (str): The file path of the checkpoint.
+
+    Returns:
+        (dict): The loaded checkpoint.
+    """
+    if "mmap" in inspect.signature(torch.load).parameters:
+        try:
+            return torch.load(file, map_location="cpu", mmap=True)
+        except RuntimeError:  # not a zip format checkpoint
+            pass
+    return torch.load(file, map_location="cpu")
+
+
 def torch_safe_load(weight):
     """
     This function attempts to load a PyTorch model with the torch.load() function. If a ModuleNotFoundError is raised,
@@ -634,7 +655,7 @@ def torch_safe_load(weight):
                 "ultralytics.yolo.data": "ultralytics.data",
             }
         ):  # for legacy 8.0 Classify and Pose models
-            return torch.load(file, map_location="cpu"), file  # load
+            return torch_mmap_load(file), file  # load
 
     except ModuleNotFoundError as e:  # e.name is missing module name
         if e.name == "models":
@@ -655,7 +676,7 @@ def torch_safe_load(weight):
         )
         check_requirements(e.name)  # install missing module
 
-        return torch.load(file, map_location="cpu"), file  # load
+        return torch_mmap_load(file), file  # load
 
 
 def attempt_load_weights(weights, device=None, inplace=True, fuse=False):
@@ -90,6 +90,9 @@ namespace CodeProject.AI.Server.Backend
                 return new ServerErrorResponse(msg);
             }
 
+            // Let the module know how long we'll wait so it can skip requests that have expired
+            request.reqtimeout = (long)_settings.ResponseTimeout.TotalMilliseconds;
+
             // Setup a request timeout.
             using var cancellationSource = new CancellationTokenSource(_settings.ResponseTimeout);
             var timeoutToken = cancellationSource.Token;
@@ -1,4 +1,6 @@
-﻿using System.Collections.Generic;
+﻿using System;
+using System.Collections.Generic;
+using System.Text.Json;
 using System.Text.RegularExpressions;
 
 using Microsoft.AspNetCore.Http;
@@ -44,6 +46,61 @@ namespace CodeProject.AI.Server.Controllers
             if (entry == null)
                 return new ServerErrorResponse("No log entry provided");
 
+            WriteLogEntry(entry, category, label, log_level);
+
+            return new ServerResponse
+            {
+                Success = true,
+            };
+        }
+
+        /// <summary>
+        /// Adds a batch of log entries in one request. The entries are passed as a JSON array in
+        /// the 'entries' form field, each item having the same fields as a single log entry.
+        /// </summary>
+        /// <returns>A Response Object.</returns>
+        [HttpPost("batch", Name = "Add Log Entries")]
+        [Produces("application/json")]
+        [ProducesResponseType(StatusCodes.Status200OK)]
+        [ProducesResponseType(StatusCodes.Status400BadRequest)]
+        public ServerResponse AddLogs([FromForm] string? entries)
+        {
+            if (string.IsNullOrWhiteSpace(entries))
+                return new ServerErrorResponse("No log entries provided");
+
+            List<LogBatchEntry>? batch;
+            try
+            {
+                batch = JsonSerializer.Deserialize<List<LogBatchEntry>>(entries);
+            }
+            catch (JsonException)
+            {
+                return new ServerErrorResponse("Unable to read the log entries provided");
+            }
+
+            if (batch is not null)
+            {
+                foreach (LogBatchEntry item in batch)
+                {
+                    if (item.entry is null)
+                        continue;
+
+                    LogLevel? logLevel = null;
+                    if (Enum.TryParse(item.log_level, true, out LogLevel level))
+                        logLevel = level;
+
+                    WriteLogEntry(item.entry, item.category, item.label, logLevel);
+                }
+            }
+
+            return new ServerResponse
+            {
+                Success = true,
+            };
+        }
+
+        private void WriteLogEntry(string entry, string? category, string? label, LogLevel? log_level)
+        {
             // We're using the .NET logger which means we don't have a huge amount of control
             // when it comes to adding extra info. We'll encode category and label info in the
             // leg message itself using special markers: [[...]] for category, {{..}} for label
@@ -70,11 +127,6 @@ namespace CodeProject.AI.Server.Controllers
                 case LogLevel.Critical:    _logger.LogCritical(msg);    break;
                 default:                   _logger.LogInformation(msg); break;
             }
-
-            return new ServerResponse
-            {
-                Success = true,
-            };
         }
 
         /// <summary>
@@ -107,4 +159,34 @@ namespace CodeProject.AI.Server.Controllers
             return response;
         }
     }
+
+#pragma warning disable IDE1006 // Naming Styles
+
+    /// <summary>
+    /// A single entry in a batch of log entries sent to the log/batch endpoint.
+    /// </summary>
+    public class LogBatchEntry
+    {
+        /// <summary>
+        /// Gets or sets the log entry text
+        /// </summary>
+        public string? entry { get; set; }
+
+        /// <summary>
+        /// Gets or sets the category (typically the module name)
+        /// </summary>
+        public string? category { get; set; }
+
+        /// <summary>
+        /// Gets or sets the label
+        /// </summary>
+        public string? label { get; set; }
+
+        /// <summary>
+        /// Gets or sets the log level (eg "information", "error")
+        /// </summary>
+        public string? log_level { get; set; }
+    }
+
+#pragma warning restore IDE1006 // Naming Styles
 }
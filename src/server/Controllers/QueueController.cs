@@ -145,14 +145,20 @@ namespace CodeProject.AI.Server.Controllers
         /// in the module's associated ProcessStatus object 
         /// </summary>
         /// <param name="moduleId">The id of the request the response is for.</param>
-        /// <param name="statusData"></param>
+        /// <param name="statusData">The full status data for the module</param>
+        /// <param name="statusDelta">Only the properties of the status data that have changed
+        /// since the last update. A null property removes that property. If there is no full
+        /// status data to apply this to (eg the server has restarted) then 409 Conflict is
+        /// returned, and the module should send its full status data.</param>
         /// <returns>The Request Object.</returns>
         // TODO: Possible rename this to BackendController and map both /vi/queue and /v1/backend
         //         to maintain backwards compatibility for the modules.
         [HttpPost("updatemodulestatus/{moduleId}", Name = "UpdateModuleStatusData")]
         [ProducesResponseType(StatusCodes.Status200OK)]
         [ProducesResponseType(StatusCodes.Status404NotFound)]
-        public ObjectResult UpdateModuleStatusData(string moduleId, [FromForm] string? statusData)
+        [ProducesResponseType(StatusCodes.Status409Conflict)]
+        public ObjectResult UpdateModuleStatusData(string moduleId, [FromForm] string? statusData,
+                                                   [FromForm] string? statusDelta)
         {
             if (string.IsNullOrWhiteSpace(moduleId))
                 return NotFound("No Module specified");
@@ -169,6 +175,17 @@ namespace CodeProject.AI.Server.Controllers
                 if (statusObject is not null)
                     statusUpdated = _moduleProcessService.UpdateProcessStatusData(moduleId, statusObject);
             }
+            else if (!string.IsNullOrWhiteSpace(statusDelta))
+            {
+                JsonObject? deltaObject = JsonSerializer.Deserialize<JsonObject>(statusDelta);
+                if (deltaObject is not null)
+                {
+                    statusUpdated = _moduleProcessService.MergeProcessStatusData(moduleId, deltaObject,
+                                                                                 out bool needsFullStatus);
+                    if (needsFullStatus)
+                        return Conflict("Full module status data needed");
+                }
+            }
 
             return statusUpdated? Ok("Module status updated") : NotFound("Module status data not updated");
         }
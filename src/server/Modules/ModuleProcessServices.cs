@@ -251,6 +251,48 @@ namespace CodeProject.AI.Server.Modules
             return true;
         }
 
+        /// <summary>
+        /// Merges a partial update into the status information for a module. Each property in
+        /// the delta replaces the property of the same name in the current status data, and a
+        /// property with a null value removes that property. A module must have sent its full
+        /// status data at least once before a delta can be applied.
+        /// </summary>
+        /// <param name="moduleId">The ID of the module</param>
+        /// <param name="statusDelta">The changed properties of the status data bag</param>
+        /// <param name="needsFullStatus">Set to true if the delta couldn't be applied because
+        /// there is no full status data to apply it to (eg the server has restarted)</param>
+        /// <returns>True on success; false otherwise</returns>
+        public bool MergeProcessStatusData(string moduleId, JsonObject? statusDelta,
+                                           out bool needsFullStatus)
+        {
+            needsFullStatus = false;
+
+            if (string.IsNullOrEmpty(moduleId) || statusDelta is null)
+                return false;
+
+            if (!TryGetProcessStatus(moduleId, out ProcessStatus? processStatus))
+                return false;
+
+            lock (processStatus!)
+            {
+                if (processStatus.StatusData is null)
+                {
+                    needsFullStatus = true;
+                    return false;
+                }
+
+                foreach (var property in statusDelta)
+                {
+                    if (property.Value is null)
+                        processStatus.StatusData.Remove(property.Key);
+                    else
+                        processStatus.StatusData[property.Key] = property.Value.DeepClone();
+                }
+            }
+
+            return true;
+        }
+
         /// <summary>
         /// Kills a process
         /// </summary>